@@ -0,0 +1,135 @@
+"""
+Deterministic, offline stand-ins for the benchmark suite (no model download, no network).
+
+- HashingEmbedder: SentenceTransformer-compatible embedder (encode / get_sentence_embedding_dimension).
+  Every word maps to a fixed random vector (seeded from a stable hash of the word) and a text is
+  the sum of its word vectors, so texts sharing words are similar, as with a real model.
+- synthetic_corpus(): reproducible documents built from a Zipf-distributed pseudo-word vocabulary
+  plus per-topic words, generated in batches so 10M-row corpora never sit in memory twice.
+- synthetic_queries() / synthetic_judge_pairs(): matching queries and judge inputs.
+
+Same seed -> same corpus, queries, vectors and judge pairs on every machine.
+"""
+
+import zlib
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "po", "ve", "da", "zu", "he", "fi", "go", "ba", "xe"]
+FIELD_NAMES = [
+    "Patient Date of Birth", "Project Budget Status", "Meeting Date and Time", "Invoice Due Date",
+    "Contract Termination Clause", "Signature", "Approval Authority", "Vendor Tax ID", "Delivery Address",
+    "Policy Number", "Dosage", "Allergies", "Payment Terms", "Governing Law", "Effective Date",
+]
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedder with the SentenceTransformer interface.
+
+    Parameters:
+        dim: embedding dimension
+        buckets: number of distinct word vectors (words hash into buckets)
+        seed: seed of the bucket vectors
+    """
+
+    def __init__(self, dim: int = 384, buckets: int = 1 << 16, seed: int = 0):
+        self.dim = dim
+        self.buckets = buckets
+        self.table = np.random.default_rng(seed).standard_normal((buckets, dim)).astype(np.float32)
+        self._bucket_of: Dict[str, int] = {}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _bucket(self, word: str) -> int:
+        bucket = self._bucket_of.get(word)
+        if bucket is None:
+            bucket = self._bucket_of[word] = zlib.crc32(word.encode("utf-8")) % self.buckets
+        return bucket
+
+    def encode(self, texts, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        ids: List[int] = []
+        starts = np.zeros(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            starts[i] = len(ids)
+            ids.extend(self._bucket(w) for w in text.lower().split())
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if not ids:
+            return out
+        lengths = np.diff(np.append(starts, len(ids)))
+        nonempty = lengths > 0
+        sums = np.add.reduceat(self.table[np.asarray(ids)], starts[nonempty], axis=0)
+        out[nonempty] = sums
+        return out
+
+
+def _vocabulary(size: int, rng: np.random.Generator) -> List[str]:
+    words = set()
+    while len(words) < size:
+        n = int(rng.integers(2, 5))
+        words.add("".join(_SYLLABLES[s] for s in rng.integers(0, len(_SYLLABLES), n)))
+    return sorted(words)
+
+
+def synthetic_corpus(n: int, batch_size: int = 10_000, seed: int = 0, vocab_size: int = 20_000,
+                     n_topics: int = 200, min_words: int = 20, max_words: int = 80) -> Iterator[List[str]]:
+    """Yield batches of documents, `n` in total.
+
+    Words follow a Zipf(1.1) distribution over the vocabulary; about a third of each document
+    comes from its topic's own 50 words, which gives the embeddings cluster structure. Every
+    document also contains a unique identifier ("ref-<row>"), which lexical search can match.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = np.array(_vocabulary(vocab_size, rng))
+    probs = 1.0 / np.arange(1, vocab_size + 1) ** 1.1
+    probs /= probs.sum()
+    topic_words = rng.integers(0, vocab_size, (n_topics, 50))
+    for start in range(0, n, batch_size):
+        count = min(batch_size, n - start)
+        lengths = rng.integers(min_words, max_words + 1, count)
+        total = int(lengths.sum())
+        words = rng.choice(vocab_size, total, p=probs)
+        topics = np.repeat(rng.integers(0, n_topics, count), lengths)
+        on_topic = rng.random(total) < 0.33
+        words[on_topic] = topic_words[topics[on_topic], rng.integers(0, 50, int(on_topic.sum()))]
+        tokens = vocab[words]
+        bounds = np.concatenate([[0], np.cumsum(lengths)])
+        yield [" ".join(tokens[bounds[i]:bounds[i + 1]]) + f" ref-{start + i}" for i in range(count)]
+
+
+def synthetic_queries(docs: List[str], n_queries: int, words: int = 8, seed: int = 1) -> List[str]:
+    """Queries made of `words` random words of random documents (in shuffled order)."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for row in rng.integers(0, len(docs), n_queries):
+        tokens = docs[row].split()
+        picks = rng.choice(len(tokens), min(words, len(tokens)), replace=False)
+        queries.append(" ".join(tokens[p] for p in picks))
+    return queries
+
+
+def synthetic_judge_pairs(n: int, fields: int = 5, seed: int = 2) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(predicted, expected) pairs in the missing_fields schema with partial overlap."""
+    rng = np.random.default_rng(seed)
+    pairs = []
+    for _ in range(n):
+        names = rng.choice(len(FIELD_NAMES), min(fields, len(FIELD_NAMES)), replace=False)
+        expected = {
+            "missing_fields": [{"name": FIELD_NAMES[i], "evidence_span": f"span {i}",
+                                "required_information": "value", "priority": "high", "confidence": 0.9}
+                               for i in names],
+            "summary": "The document is missing key fields.",
+            "remediation_steps": ["Request the missing fields."],
+        }
+        kept = [item for item in expected["missing_fields"] if rng.random() < 0.7]
+        predicted = {
+            "missing_fields": [dict(item, name=item["name"].upper()) for item in kept]
+                              + [{"name": "Unrelated Field", "evidence_span": None}],
+            "summary": "The document is missing several fields.",
+            "remediation_steps": [],
+        }
+        pairs.append((predicted, expected))
+    return pairs
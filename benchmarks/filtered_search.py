@@ -0,0 +1,81 @@
+"""
+Filtered vs unfiltered retrieval latency at different filter selectivities.
+
+Every row gets a "bucket" in [0, 1000); a filter {"bucket": {"$lt": b}} matches about b/1000 of
+the corpus. For each selectivity the report shows:
+- unfiltered: plain retrieve()
+- gather / scan: pre-filtered retrieve(where=...) forced onto each of its two strategies
+  (score only the matching rows vs. score everything and mask), which is how
+  FILTER_SCAN_FRACTION in src/rag/rag_app.py is chosen
+- post-filter: the old approach, over-fetching top_k * overfetch unfiltered hits and filtering
+  them afterwards, with the fraction of queries that came back with fewer than top_k hits
+
+Usage (from the repository root):
+    python benchmarks/filtered_search.py --n 200000 --dim 384 --queries 100
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.rag.rag_app as rag_app  # noqa: E402
+from quantization import MatrixEmbedder, synthetic_vectors  # noqa: E402
+
+SELECTIVITIES = (0.001, 0.01, 0.1, 0.25, 0.5, 0.9)
+
+
+def ms_per_query(fn, queries) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return 1000 * (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.n, args.dim, args.queries)
+    rng = np.random.default_rng(1)
+    buckets = rng.integers(0, 1000, args.n)
+    rag = rag_app.SimpleRAG(embedder=MatrixEmbedder(vectors))
+    rag.index_documents([str(i) for i in range(args.n)], metadata=[{"bucket": int(b)} for b in buckets])
+    queries = [str(args.n + i) for i in range(args.queries)]
+    top_k = args.top_k
+
+    unfiltered = ms_per_query(lambda q: rag.retrieve(q, top_k), queries)
+    print(f"n={args.n} dim={args.dim} top_k={top_k} unfiltered: {unfiltered:.3f} ms/query")
+    print(f"{'match':>7} {'gather ms':>10} {'scan ms':>9} {'post ms':>9} {'post short':>11}")
+    default_fraction = rag_app.FILTER_SCAN_FRACTION
+    for selectivity in SELECTIVITIES:
+        where = {"bucket": {"$lt": int(selectivity * 1000)}}
+        rag_app.FILTER_SCAN_FRACTION = 1.0
+        gather = ms_per_query(lambda q: rag.retrieve(q, top_k, where=where), queries)
+        rag_app.FILTER_SCAN_FRACTION = 0.0
+        scan = ms_per_query(lambda q: rag.retrieve(q, top_k, where=where), queries)
+        rag_app.FILTER_SCAN_FRACTION = default_fraction
+
+        short = 0
+
+        def post_filter(q):
+            nonlocal short
+            hits = [h for h in rag.retrieve(q, top_k * args.overfetch)
+                    if buckets[h[0]] < selectivity * 1000][:top_k]
+            short += len(hits) < top_k
+
+        post = ms_per_query(post_filter, queries)
+        print(f"{selectivity:>7.1%} {gather:>10.3f} {scan:>9.3f} {post:>9.3f} {short / len(queries):>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
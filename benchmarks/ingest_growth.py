@@ -0,0 +1,97 @@
+"""
+Ingestion benchmark: np.vstack-per-batch (previous add_documents behaviour) vs EmbeddingStore.
+
+Each mode runs in its own subprocess so peak RSS (ru_maxrss) is measured independently.
+Embeddings are random unit vectors; the embedder is deliberately left out so only the
+storage cost is measured.
+
+Usage (from the repository root):
+    python benchmarks/ingest_growth.py --n 1000000 --batch 100 --dim 384
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag.store import EmbeddingStore  # noqa: E402
+
+
+def _batches(n: int, batch: int, dim: int):
+    rng = np.random.default_rng(0)
+    block = rng.standard_normal((batch, dim)).astype(np.float32)
+    block /= np.linalg.norm(block, axis=1, keepdims=True)
+    for _ in range(n // batch):
+        yield block
+
+
+def run_vstack(n: int, batch: int, dim: int) -> int:
+    embeddings = np.zeros((0, dim), dtype=np.float32)
+    for rows in _batches(n, batch, dim):
+        if embeddings.size == 0:
+            embeddings = rows.copy()
+        else:
+            embeddings = np.vstack([embeddings, rows])
+    return embeddings.shape[0]
+
+
+def run_store(n: int, batch: int, dim: int) -> int:
+    store = EmbeddingStore(dim)
+    for rows in _batches(n, batch, dim):
+        store.append(rows)
+    return store.matrix.shape[0]
+
+
+MODES = {"vstack": run_vstack, "store": run_store}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _child(mode: str, n: int, batch: int, dim: int):
+    start = time.perf_counter()
+    rows = MODES[mode](n, batch, dim)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": mode, "rows": rows, "seconds": elapsed,
+                      "rows_per_sec": rows / elapsed if elapsed else 0.0,
+                      "peak_rss_mb": _peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1_000_000, help="total documents to ingest")
+    parser.add_argument("--batch", type=int, default=100, help="documents per add_documents call")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension (MiniLM: 384)")
+    parser.add_argument("--modes", default="vstack,store")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.n, args.batch, args.dim)
+        return
+
+    results = []
+    for mode in args.modes.split(","):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode,
+             "--n", str(args.n), "--batch", str(args.batch), "--dim", str(args.dim)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(out))
+    for r in results:
+        print(f"{r['mode']:>8}: {r['rows']} rows in {r['seconds']:.2f}s "
+              f"({r['rows_per_sec']:.0f} rows/s), peak RSS {r['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
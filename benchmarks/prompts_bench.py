@@ -0,0 +1,113 @@
+"""
+Prompts module microbenchmark: import cost and prompt-build time.
+
+Import time is measured in fresh interpreters (median of --runs), together with the number of
+bytes the import writes to stdout. Build time is measured per PROMPT_BUILDERS variant.
+With --baseline-rev, the same measurements run against src/prompting/prompts.py from that git
+revision, so the effect of a change can be compared side by side.
+
+Usage (from the repository root):
+    python benchmarks/prompts_bench.py --baseline-rev HEAD~1
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_DOCS = {
+    "short": "Invoice #123 for services rendered. Total due: $500.",
+    "medium": "Patient Name: John Doe. The patient reports chest pain and shortness of breath. " * 4,
+    "long": "To: Team. The project is on track and the team completed the mockups. " * 20,
+}
+
+IMPORT_SNIPPET = textwrap.dedent("""
+    import io, sys, time, contextlib, importlib.util
+    buf = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(buf):
+        spec = importlib.util.spec_from_file_location("prompts_under_test", sys.argv[1])
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    print(time.perf_counter() - start, len(buf.getvalue()))
+""")
+
+BUILD_SNIPPET = textwrap.dedent("""
+    import io, sys, json, timeit, contextlib, importlib.util
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec = importlib.util.spec_from_file_location("prompts_under_test", sys.argv[1])
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    docs = json.loads(sys.argv[2])
+    names = {"general": "build_prompt", "zero_shot": "build_zero_shot_prompt",
+             "one_shot": "build_one_shot_prompt", "multi_shot": "build_multi_shot_prompt",
+             "dynamic": "build_dynamic_prompt", "cot": "build_cot_prompt"}
+    out = {}
+    for variant, fn_name in names.items():
+        fn = getattr(module, fn_name, None)
+        if fn is None:
+            continue
+        for label, doc in docs.items():
+            try:
+                runs = timeit.repeat(lambda: fn(doc), number=2000, repeat=5)
+                out[f"{variant}/{label}"] = min(runs) / 2000 * 1e6
+            except Exception as e:
+                out[f"{variant}/{label}"] = f"error: {type(e).__name__}"
+    print(json.dumps(out))
+""")
+
+
+def _measure(path: str, runs: int):
+    import json
+    samples, stdout_bytes = [], 0
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET, path],
+                             capture_output=True, text=True, cwd=ROOT)
+        if out.returncode != 0:
+            return {"import_error": out.stderr.strip().splitlines()[-1]}, {}
+        seconds, nbytes = out.stdout.split()
+        samples.append(float(seconds))
+        stdout_bytes = int(nbytes)
+    build = subprocess.run([sys.executable, "-c", BUILD_SNIPPET, path, json.dumps(SAMPLE_DOCS)],
+                           capture_output=True, text=True, cwd=ROOT, check=True)
+    return ({"import_ms": 1000 * statistics.median(samples), "import_stdout_bytes": stdout_bytes},
+            json.loads(build.stdout))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline-rev", default=None, help="git revision to compare against")
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    targets = {"current": os.path.join(ROOT, "src", "prompting", "prompts.py")}
+    tmp = None
+    if args.baseline_rev:
+        source = subprocess.run(["git", "show", f"{args.baseline_rev}:src/prompting/prompts.py"],
+                                capture_output=True, text=True, cwd=ROOT, check=True).stdout
+        tmp = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False)
+        tmp.write(source)
+        tmp.close()
+        targets = {args.baseline_rev: tmp.name, **targets}
+
+    try:
+        results = {label: _measure(path, args.runs) for label, path in targets.items()}
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    for label, (imports, builds) in results.items():
+        print(f"== {label}")
+        for key, value in imports.items():
+            print(f"  {key:<24} {value:.2f}" if isinstance(value, float) else f"  {key:<24} {value}")
+        for key, value in builds.items():
+            print(f"  build {key:<18} {value:.2f} us" if isinstance(value, float) else f"  build {key:<18} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Storage-mode report: memory and recall@k of float32 / float16 / int8 SimpleRAG indexes.
+
+The corpus is a synthetic mixture of Gaussian clusters on the unit sphere (closer to real
+sentence embeddings than uniform noise). Queries are perturbed corpus rows. recall@k is
+measured against exact float32 search, with and without the full-precision re-scoring pass.
+
+Usage (from the repository root):
+    python benchmarks/quantization.py --n 200000 --dim 384 --queries 200 --top-k 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag.rag_app import SimpleRAG  # noqa: E402
+
+
+class MatrixEmbedder:
+    """Embedder over a precomputed matrix: the text "<i>" encodes to row i."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        return self.vectors[[int(t) for t in texts]]
+
+
+def synthetic_vectors(n: int, dim: int, n_queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), dim)).astype(np.float32)
+    docs = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    picks = rng.integers(0, n, n_queries)
+    queries = docs[picks] + 0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    return np.vstack([docs, queries])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.n, args.dim, args.queries)
+    embedder = MatrixEmbedder(vectors)
+    docs = [str(i) for i in range(args.n)]
+    queries = [str(args.n + i) for i in range(args.queries)]
+
+    # the reference for recall is always exact float32 search
+    reference = SimpleRAG(embedder=embedder)
+    reference.index_documents(docs)
+    exact = [{i for i, _, _ in hits} for hits in reference.retrieve_batch(queries, args.top_k)]
+    del reference
+
+    configs = [("float32", 0), ("float16", 0), ("float16", args.rescore_factor),
+               ("int8", 0), ("int8", args.rescore_factor)]
+    print(f"{'storage':>8} {'rescore':>7} {'RAM MB':>8} {'disk MB':>8} {'recall@k':>9} {'ms/query':>9}")
+    for storage, factor in configs:
+        rag = SimpleRAG(embedder=embedder, storage=storage, rescore_factor=factor)
+        rag.index_documents(docs)
+        start = time.perf_counter()
+        results = rag.retrieve_batch(queries, args.top_k)
+        elapsed = time.perf_counter() - start
+        recalls = [len(want & {i for i, _, _ in got}) / len(want) for want, got in zip(exact, results)]
+        usage = rag.memory_usage()
+        print(f"{storage:>8} {factor:>7} {usage['index_bytes'] / 2**20:>8.1f} "
+              f"{usage['full_precision_bytes'] / 2**20:>8.1f} {np.mean(recalls):>9.3f} "
+              f"{1000 * elapsed / len(queries):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Exact single-process search vs ShardedIndex at different shard counts.
+
+For each configuration the report shows:
+- qps (1 thread): sequential retrieve() calls
+- qps (N threads): retrieve() from --clients concurrent threads, i.e. request load
+- batch qps: one retrieve_batch() over all queries
+- same: whether every result list (rows and scores) equals the exact single-process search
+
+Throughput should grow with the shard count up to the number of physical cores. Each worker
+uses one BLAS thread, so the exact baseline is also shown with its default BLAS threading.
+
+Usage (from the repository root):
+    python benchmarks/sharded_search.py --n 1000000 --dim 384 --queries 200 --shards 1,2,4,8
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag.rag_app import SimpleRAG  # noqa: E402
+from src.rag.sharded import ShardedIndex  # noqa: E402
+from quantization import MatrixEmbedder, synthetic_vectors  # noqa: E402
+
+
+def measure(rag: SimpleRAG, queries, top_k: int, clients: int):
+    rag.retrieve(queries[0], top_k)
+    start = time.perf_counter()
+    single = [rag.retrieve(q, top_k) for q in queries]
+    sequential = len(queries) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(lambda q: rag.retrieve(q, top_k), queries))
+    concurrent = len(queries) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    batch = rag.retrieve_batch(queries, top_k)
+    batched = len(queries) / (time.perf_counter() - start)
+    return sequential, concurrent, batched, single + batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--shards", default="1,2,4,8")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent retrieve() threads")
+    parser.add_argument("--storage", default="float32", choices=["float32", "float16", "int8"])
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.n, args.dim, args.queries)
+    embedder = MatrixEmbedder(vectors)
+    docs = [str(i) for i in range(args.n)]
+    queries = [str(args.n + i) for i in range(args.queries)]
+
+    print(f"n={args.n} dim={args.dim} storage={args.storage} top_k={args.top_k} cores={os.cpu_count()}")
+    print(f"{'index':<12} {'qps (1 thread)':>15} {f'qps ({args.clients} threads)':>17} {'batch qps':>10} {'same':>5}")
+    rag = SimpleRAG(embedder=embedder, storage=args.storage)
+    rag.index_documents(docs)
+    sequential, concurrent, batched, reference = measure(rag, queries, args.top_k, args.clients)
+    print(f"{'exact':<12} {sequential:>15.1f} {concurrent:>17.1f} {batched:>10.1f} {'-':>5}")
+    for n_shards in (int(s) for s in args.shards.split(",")):
+        index = ShardedIndex(n_shards=n_shards, min_rows=0)
+        rag.index = index
+        index.build(rag.store)
+        sequential, concurrent, batched, results = measure(rag, queries, args.top_k, args.clients)
+        same = [[hit[:2] for hit in r] for r in results] == [[hit[:2] for hit in r] for r in reference]
+        print(f"{f'{n_shards} shards':<12} {sequential:>15.1f} {concurrent:>17.1f} {batched:>10.1f} {str(same):>5}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Time to first finding: streamed vs. buffered generation against a local stub server.
+
+The stub serves a canned investigation report at a fixed token rate, either as one JSON body
+(the :generate endpoint used by gemini_generate) or as server-sent events (the
+:streamGenerate endpoint used by generate_stream). The report shows, for each mode, when the
+first missing_fields entry was available and when the whole report was, and checks that the
+streamed entries equal the final report's entries and pass the schema check.
+
+Usage (from the repository root):
+    python benchmarks/streaming.py --fields 8 --tokens-per-sec 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag.generation import GeminiClient  # noqa: E402
+from src.rag.streaming import MissingFieldsParser, stream_findings  # noqa: E402
+from fakes import FIELD_NAMES  # noqa: E402
+
+
+def canned_report(n_fields: int) -> str:
+    entries = [{
+        "name": FIELD_NAMES[i % len(FIELD_NAMES)],
+        "why_missing": f"The document never states the {FIELD_NAMES[i % len(FIELD_NAMES)].lower()}.",
+        "evidence_span": None if i % 3 == 0 else f"Section {i}: \"quoted\" text {{with braces}}",
+        "required_information": "insufficient_information" if i % 4 == 0 else "The exact value.",
+        "priority": ("high", "medium", "low")[i % 3],
+        "confidence": 0.0 if i % 4 == 0 else 0.9,
+    } for i in range(n_fields)]
+    report = {"missing_fields": entries, "summary": "Several required fields are missing.",
+              "remediation_steps": ["Request the missing fields from the author."]}
+    return "```json\n" + json.dumps(report, indent=2) + "\n```"
+
+
+def make_handler(text: str, tokens_per_sec: float):
+    # roughly one token per 4 characters
+    pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if ":streamGenerate" in self.path:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for piece in pieces:
+                    time.sleep(1.0 / tokens_per_sec)
+                    event = f"data: {json.dumps({'candidates': [{'content': piece}]})}\n\n".encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            time.sleep(len(pieces) / tokens_per_sec)
+            body = json.dumps({"candidates": [{"content": text}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fields", type=int, default=8, help="missing_fields entries in the canned report")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    args = parser.parse_args()
+
+    text = canned_report(args.fields)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(text, args.tokens_per_sec))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = GeminiClient(api_key="stub", base_url=f"http://127.0.0.1:{server.server_port}")
+
+    start = time.perf_counter()
+    buffered = MissingFieldsParser()
+    buffered.feed(client.generate(text))
+    full = time.perf_counter() - start
+    print(f"buffered: first finding {full:.2f}s, full report {full:.2f}s")
+
+    start = time.perf_counter()
+    streamed = MissingFieldsParser()
+    first = None
+    for _ in stream_findings(client.generate_stream(text), streamed):
+        if first is None:
+            first = time.perf_counter() - start
+    full = time.perf_counter() - start
+    print(f"streamed: first finding {first:.2f}s, full report {full:.2f}s")
+
+    entries = [f.entry for f in streamed.findings]
+    problems = sum(len(f.problems) for f in streamed.findings)
+    print(f"entries: {len(entries)}, equal to final report: {entries == streamed.report()['missing_fields']}, "
+          f"schema problems: {problems}, text identical: {streamed.text == buffered.text}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
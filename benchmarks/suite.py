@@ -0,0 +1,227 @@
+"""
+Offline benchmark suite for the RAG and judging hot paths.
+
+Runs with no network and no model download: documents come from benchmarks/fakes.py
+(synthetic_corpus) and are embedded with the deterministic HashingEmbedder. Measured:
+- rag[<n>]: indexing throughput (add_documents in batches), single-query retrieve() p50/p99
+  latency, retrieve_batch() QPS, peak RSS and index bytes. Each corpus size runs in its own
+  subprocess so peak RSS is per size.
+- judge: judge_compare and judge_batch records/sec.
+- prompts: build time of every PROMPT_BUILDERS variant for short/medium/long documents.
+
+Results are written as JSON ({"meta": ..., "metrics": {name: {value, unit, better}}}).
+--compare prints the change against a previous results file and flags regressions beyond
+--threshold; with --fail-on-regression the exit status is 1 when any are found.
+
+Usage (from the repository root):
+    python benchmarks/suite.py --sizes 10000,100000 --output bench-main.json
+    python benchmarks/suite.py --sizes 10000,100000 --output bench-new.json --compare bench-main.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import timeit
+from typing import Any, Dict, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fakes import HashingEmbedder, synthetic_corpus, synthetic_judge_pairs, synthetic_queries  # noqa: E402
+
+Metrics = Dict[str, Dict[str, Any]]
+
+
+def metric(value: float, unit: str, better: str) -> Dict[str, Any]:
+    return {"value": float(value), "unit": unit, "better": better}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+
+def bench_rag(n: int, dim: int, batch_size: int, n_queries: int, top_k: int, storage: str,
+              lexical: bool) -> Metrics:
+    from src.rag.lexical import BM25Index
+    from src.rag.rag_app import SimpleRAG
+
+    rag = SimpleRAG(embedder=HashingEmbedder(dim), storage=storage, lexical=BM25Index() if lexical else None)
+    sample: List[str] = []
+    indexing = 0.0
+    for batch in synthetic_corpus(n, batch_size):
+        start = time.perf_counter()
+        rag.add_documents(batch)
+        indexing += time.perf_counter() - start
+        if len(sample) < 10_000:
+            sample.extend(batch[:10_000 - len(sample)])
+    queries = synthetic_queries(sample, n_queries)
+
+    for q in queries[:5]:
+        rag.retrieve(q, top_k)
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        rag.retrieve(q, top_k)
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    rag.retrieve_batch(queries, top_k)
+    batch_seconds = time.perf_counter() - start
+
+    out = {
+        "index_docs_per_sec": metric(n / indexing, "docs/s", "higher"),
+        "query_p50_ms": metric(1000 * np.percentile(latencies, 50), "ms", "lower"),
+        "query_p99_ms": metric(1000 * np.percentile(latencies, 99), "ms", "lower"),
+        "batch_qps": metric(len(queries) / batch_seconds, "queries/s", "higher"),
+        "index_mb": metric(rag.memory_usage()["index_bytes"] / 2 ** 20, "MB", "lower"),
+        "peak_rss_mb": metric(peak_rss_mb(), "MB", "lower"),
+    }
+    if lexical:
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            rag.retrieve(q, top_k, mode="lexical")
+            latencies.append(time.perf_counter() - start)
+        out["lexical_p50_ms"] = metric(1000 * np.percentile(latencies, 50), "ms", "lower")
+        out["lexical_mb"] = metric(rag.lexical.nbytes / 2 ** 20, "MB", "lower")
+    return out
+
+
+def bench_judge(n_pairs: int) -> Metrics:
+    from src.rag.judge import judge_batch, judge_compare
+
+    pairs = synthetic_judge_pairs(n_pairs)
+    # both variants keep their verdicts (dropping them would skip the GC cost of holding them);
+    # runs alternate and the best of each is kept, so neither pays for warm-up or a noisy neighbour
+    single = batch = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        verdicts = [judge_compare(predicted, expected) for predicted, expected in pairs]
+        single = min(single, time.perf_counter() - start)
+        del verdicts
+        start = time.perf_counter()
+        verdicts = judge_batch(pairs)
+        batch = min(batch, time.perf_counter() - start)
+        del verdicts
+    return {
+        "compare_records_per_sec": metric(n_pairs / single, "records/s", "higher"),
+        "batch_records_per_sec": metric(n_pairs / batch, "records/s", "higher"),
+    }
+
+
+def bench_prompts() -> Metrics:
+    from src.prompting.prompts import PROMPT_BUILDERS
+
+    corpus = next(synthetic_corpus(200, seed=3))
+    docs = {"short": corpus[0][:200], "medium": " ".join(corpus[:10]), "long": " ".join(corpus[:100])}
+    out = {}
+    for variant, build in PROMPT_BUILDERS.items():
+        for label, doc in docs.items():
+            seconds = min(timeit.repeat(lambda: build(doc), number=500, repeat=5)) / 500
+            out[f"{variant}.{label}_us"] = metric(1e6 * seconds, "us", "lower")
+    return out
+
+
+def run_rag_subprocess(n: int, args: argparse.Namespace) -> Metrics:
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker-rag", str(n), "--dim", str(args.dim),
+           "--batch-size", str(args.batch_size), "--queries", str(args.queries), "--top-k", str(args.top_k),
+           "--storage", args.storage]
+    if args.lexical:
+        cmd.append("--lexical")
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Metrics, baseline: Metrics, threshold: float) -> List[str]:
+    """Print current vs baseline for every shared metric; return the names that regressed."""
+    regressions = []
+    print(f"{'metric':<44} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(set(current) & set(baseline)):
+        old, new = baseline[name]["value"], current[name]["value"]
+        change = (new - old) / old if old else 0.0
+        worse = change < -threshold if current[name]["better"] == "higher" else change > threshold
+        if worse:
+            regressions.append(name)
+        flag = "  REGRESSION" if worse else ""
+        print(f"{name:<44} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000", help="comma-separated corpus sizes, e.g. 10000,1000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=10_000, help="documents per add_documents call")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--storage", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--lexical", action="store_true", help="also build and time the BM25 index")
+    parser.add_argument("--judge-pairs", type=int, default=20_000)
+    parser.add_argument("--skip", default="", help="comma-separated sections to skip: rag,judge,prompts")
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--worker-rag", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_rag is not None:
+        print(json.dumps(bench_rag(args.worker_rag, args.dim, args.batch_size, args.queries, args.top_k,
+                                   args.storage, args.lexical)))
+        return
+
+    skip = set(filter(None, args.skip.split(",")))
+    metrics: Metrics = {}
+    if "rag" not in skip:
+        for n in (int(s) for s in args.sizes.split(",")):
+            for name, value in run_rag_subprocess(n, args).items():
+                metrics[f"rag[{n}].{name}"] = value
+    if "judge" not in skip:
+        metrics.update((f"judge.{k}", v) for k, v in bench_judge(args.judge_pairs).items())
+    if "prompts" not in skip:
+        metrics.update((f"prompts.{k}", v) for k, v in bench_prompts().items())
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k != "worker_rag"},
+        },
+        "metrics": metrics,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["metrics"]
+        regressions = compare(metrics, baseline, args.threshold)
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+    else:
+        for name, m in metrics.items():
+            print(f"{name:<44} {m['value']:>12.3f} {m['unit']}")
+
+
+if __name__ == "__main__":
+    main()
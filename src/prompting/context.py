@@ -0,0 +1,248 @@
+"""
+Token-budgeted context packing for long documents.
+
+ContextPacker fits a document into a token budget before it is inserted into a prompt:
+- documents within the budget are passed through unchanged;
+- longer documents are split into overlapping token windows (src/rag/ingest.py chunk_text), each
+  small enough to fit the budget on its own (windows with many punctuation tokens are split
+  further), the windows are ranked by SimpleRAG retrieval against the investigation query, and the best ones
+  are packed up to the budget. Packed chunks are emitted in document order, each headed by its
+  character offsets, and their Chunk provenance is kept so evidence spans can be traced back.
+
+map_reduce_investigate() is the alternative for very large documents: every window group is
+investigated in parallel and the per-chunk missing_fields are merged.
+
+Usage:
+from src.prompting.context import ContextPacker, map_reduce_investigate
+from src.prompting.prompts import build_zero_shot_prompt
+
+packer = ContextPacker(token_budget=3000, embedder=rag.embedder)
+prompt = build_zero_shot_prompt(filing_text, packer=packer)
+
+report = map_reduce_investigate(filing_text, client.generate, packer)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from src.prompting.tokens import count_tokens, truncate_tokens
+from src.rag.ingest import Chunk, chunk_text
+
+# What the investigator looks for; chunks most similar to this are packed first.
+DEFAULT_CONTEXT_QUERY = (
+    "required fields, identifiers, names, dates, deadlines, amounts, totals, budgets, "
+    "signatures, approvals, obligations, terms and conditions, missing or incomplete information"
+)
+
+
+class PackedContext(NamedTuple):
+    """Result of ContextPacker.pack().
+
+    text: what goes into the prompt
+    chunks: provenance of the packed chunks in document order (one Chunk covering the whole
+        document when it was not split)
+    total_tokens / packed_tokens: token counts of the original document and of `text`
+    """
+    text: str
+    chunks: List[Chunk]
+    total_tokens: int
+    packed_tokens: int
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.chunks) != 1 or self.packed_tokens < self.total_tokens
+
+
+def _chunk_header(chunk: Chunk) -> str:
+    return f"[chars {chunk.start}-{chunk.end}]\n"
+
+
+# every offsets header counts the same: "[", "chars", start, "-", end, "]"
+_HEADER_TOKENS = count_tokens(_chunk_header(Chunk("", 0, 0)))
+
+
+def locate_evidence(document_text: str, evidence_span: Optional[str],
+                    chunks: List[Chunk] = None) -> Optional[Chunk]:
+    """Character offsets of an evidence span in the original document (None if not found).
+
+    With `chunks`, only those regions are searched (the ones the model actually saw).
+    """
+    if not evidence_span:
+        return None
+    regions = chunks or [Chunk("document", 0, len(document_text))]
+    for region in regions:
+        pos = document_text.find(evidence_span, region.start, region.end)
+        if pos >= 0:
+            return Chunk(region.source, pos, pos + len(evidence_span))
+    return None
+
+
+class ContextPacker:
+    """Fits documents into a token budget using retrieval over their chunks.
+
+    Parameters:
+        token_budget: maximum tokens of document context (see src/prompting/tokens.py)
+        embedder: embedder to reuse (e.g. rag.embedder); default loads the SimpleRAG default model
+        cache: optional EmbeddingCache (repeated chunks and the query are not re-encoded)
+        window, overlap: chunk size and overlap in whitespace tokens; the window is reduced to what
+            fits the budget
+        query: text the chunks are ranked against
+        source: source id recorded in chunk provenance
+    """
+
+    def __init__(self, token_budget: int = 3000, embedder=None, cache=None, window: int = 300,
+                 overlap: int = 50, query: str = DEFAULT_CONTEXT_QUERY, source: str = "document"):
+        # imported here so that importing the prompting package never loads the embedding stack
+        from src.rag.rag_app import load_embedder
+
+        if token_budget <= _HEADER_TOKENS:
+            raise ValueError(f"token_budget must be larger than {_HEADER_TOKENS} (the chunk offsets header)")
+        self.token_budget = token_budget
+        self.embedder = embedder or load_embedder()
+        self.cache = cache
+        self.window = window
+        self.overlap = overlap
+        self.query = query
+        self.source = source
+
+    def chunks(self, document_text: str) -> List[Chunk]:
+        """Provenance of every window of the document, in document order.
+
+        Every rendered window fits the token budget on its own. A whitespace token counts as at
+        least one token, so the window is capped at the budget minus the header; windows that
+        still count more (punctuation) are split into consecutive pieces.
+        """
+        window = min(self.window, self.token_budget - _HEADER_TOKENS)
+        overlap = min(self.overlap, window // 2)
+        chunks: List[Chunk] = []
+        for start, end, _ in chunk_text(document_text, window, overlap, unit="token"):
+            chunks.extend(self._fit(document_text, Chunk(self.source, start, end)))
+        return chunks
+
+    def _fit(self, document_text: str, chunk: Chunk) -> List[Chunk]:
+        """chunk split at token boundaries into pieces whose rendered text fits the budget."""
+        room = self.token_budget - _HEADER_TOKENS
+        pieces: List[Chunk] = []
+        start = chunk.start
+        while True:
+            text = document_text[start:chunk.end]
+            if count_tokens(text) <= room:
+                pieces.append(Chunk(chunk.source, start, chunk.end))
+                return pieces
+            end = start + len(truncate_tokens(text, room))
+            pieces.append(Chunk(chunk.source, start, end))
+            rest = document_text[end:chunk.end]
+            start = end + len(rest) - len(rest.lstrip())
+
+    def render(self, document_text: str, chunks: List[Chunk]) -> str:
+        """Chunks in document order, each headed by its character offsets."""
+        return "\n\n".join(_chunk_header(c) + document_text[c.start:c.end] for c in chunks)
+
+    def pack(self, document_text: str, query: str = None) -> PackedContext:
+        total = count_tokens(document_text)
+        if total <= self.token_budget:
+            return PackedContext(document_text, [Chunk(self.source, 0, len(document_text))], total, total)
+
+        from src.rag.rag_app import SimpleRAG
+
+        chunks = self.chunks(document_text)
+        rag = SimpleRAG(embedder=self.embedder, cache=self.cache)
+        rag.add_documents([document_text[c.start:c.end] for c in chunks], provenance=chunks)
+        ranked = rag.retrieve(query or self.query, top_k=len(chunks))
+
+        selected: List[Chunk] = []
+        used = 0
+        for row, _, text in ranked:
+            chunk = rag.source_of(row)
+            # the offsets header and separator count against the budget too
+            tokens = count_tokens(_chunk_header(chunk) + text)
+            if used + tokens > self.token_budget:
+                continue
+            selected.append(chunk)
+            used += tokens
+        selected.sort(key=lambda c: c.start)
+        text = self.render(document_text, selected)
+        return PackedContext(text, selected, total, count_tokens(text))
+
+    def __call__(self, document_text: str) -> str:
+        """Packed prompt text; this is what the prompt builders call."""
+        return self.pack(document_text).text
+
+    def groups(self, document_text: str) -> List[List[Chunk]]:
+        """Consecutive chunks grouped so that every rendered group fits the token budget."""
+        groups: List[List[Chunk]] = []
+        current: List[Chunk] = []
+        used = 0
+        for chunk in self.chunks(document_text):
+            tokens = count_tokens(_chunk_header(chunk) + document_text[chunk.start:chunk.end])
+            if current and used + tokens > self.token_budget:
+                groups.append(current)
+                current, used = [], 0
+            current.append(chunk)
+            used += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+
+def merge_predictions(predictions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-chunk outputs: missing_fields deduplicated by name (highest confidence wins),
+    summaries joined and remediation steps deduplicated, both in chunk order."""
+    fields: Dict[str, Dict[str, Any]] = {}
+    summaries: List[str] = []
+    steps: Dict[str, None] = {}
+    for prediction in predictions:
+        for item in prediction.get("missing_fields", []):
+            name = str(item.get("name", "")).strip().lower()
+            kept = fields.get(name)
+            if kept is None or (item.get("confidence") or 0.0) > (kept.get("confidence") or 0.0):
+                fields[name] = item
+        summary = prediction.get("summary")
+        if summary and summary not in summaries:
+            summaries.append(summary)
+        steps.update((step, None) for step in prediction.get("remediation_steps", []))
+    return {
+        "missing_fields": list(fields.values()),
+        "summary": " ".join(summaries),
+        "remediation_steps": list(steps),
+    }
+
+
+def map_reduce_investigate(document_text: str, generate: Callable[[str], str], packer: ContextPacker,
+                           builder: Callable[[str], str] = None, max_concurrency: int = 8) -> Dict[str, Any]:
+    """Investigate every chunk group of a long document in parallel and merge the results.
+
+    Parameters:
+        generate: prompt -> text function (e.g. GeminiClient.generate)
+        packer: supplies the token budget and chunking; its embedder is not used here
+        builder: document_text -> prompt (default: build_zero_shot_prompt)
+        max_concurrency: generation calls in flight at once
+
+    Each merged missing_fields entry gains "source_chunk": [start, end], the character offsets of
+    the chunk group it came from. Groups whose output cannot be parsed are skipped; ValueError is
+    raised when none can.
+    """
+    from src.rag.evaluate import parse_prediction
+
+    if builder is None:
+        from src.prompting.prompts import build_zero_shot_prompt as builder
+
+    groups = packer.groups(document_text)
+    prompts = [builder(packer.render(document_text, group)) for group in groups]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts)))) as pool:
+        outputs = list(pool.map(generate, prompts))
+
+    predictions: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    for group, raw in zip(groups, outputs):
+        try:
+            prediction = parse_prediction(raw)
+        except ValueError as e:
+            errors.append(f"chars {group[0].start}-{group[-1].end}: {e}")
+            continue
+        for item in prediction.get("missing_fields", []):
+            item["source_chunk"] = [group[0].start, group[-1].end]
+        predictions.append(prediction)
+    if not predictions:
+        raise ValueError(f"No chunk produced a parseable prediction: {errors[:3]}")
+    return merge_predictions(predictions)
@@ -0,0 +1,84 @@
+"""
+Embedding-based few-shot example selection.
+
+ExampleStore loads examples ({"document": ..., "json_output": {...}}) from files, embeds their
+documents once with the SimpleRAG embedder and keeps them in a SimpleRAG vector index. select()
+finds the nearest examples for a document with a single similarity lookup and keeps the example
+section within a token budget.
+
+Example files: .json (one example object or a list of them) or .jsonl (one example per line);
+a directory loads every .json/.jsonl file inside it.
+
+Usage:
+from src.prompting.examples import ExampleStore
+from src.prompting.prompts import build_dynamic_prompt
+
+store = ExampleStore.from_files(["examples/"], embedder=rag.embedder)
+prompt = build_dynamic_prompt(document_text, example_store=store, example_token_budget=800)
+"""
+
+from typing import Any, Dict, Iterable, List
+
+from src.prompting.prompts import EXAMPLE_LIBRARY, format_example
+from src.prompting.tokens import count_tokens
+from src.rag.ingest import read_json_objects
+
+
+class ExampleStore:
+    """Vector index over few-shot examples.
+
+    Parameters:
+        examples: list of {"document": str, "json_output": dict}
+        embedder: embedder to reuse (e.g. rag.embedder); default loads the SimpleRAG default model
+        cache: optional EmbeddingCache, so example embeddings survive restarts
+    """
+
+    def __init__(self, examples: List[Dict[str, Any]], embedder=None, cache=None):
+        # imported here so that importing the prompting package never loads the embedding stack
+        from src.rag.rag_app import SimpleRAG
+
+        for i, example in enumerate(examples):
+            if "document" not in example or "json_output" not in example:
+                raise ValueError(f"Example {i} needs 'document' and 'json_output' keys")
+        self.examples = examples
+        # serialized once here, never per prompt
+        self.blocks = [format_example(example) for example in examples]
+        self.block_tokens = [count_tokens(block) for block in self.blocks]
+        self.rag = SimpleRAG(embedder=embedder, cache=cache)
+        self.rag.index_documents([example["document"] for example in examples])
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str], **kwargs) -> "ExampleStore":
+        examples: List[Dict[str, Any]] = []
+        for path in paths:
+            examples.extend(read_json_objects(path))
+        return cls(examples, **kwargs)
+
+    @classmethod
+    def from_library(cls, library: Dict[str, Dict[str, Any]] = None, **kwargs) -> "ExampleStore":
+        """Store over the built-in EXAMPLE_LIBRARY (or another name -> example mapping)."""
+        return cls(list((library or EXAMPLE_LIBRARY).values()), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    def select(self, document_text: str, num_examples: int, token_budget: int = None) -> List[str]:
+        """Formatted blocks of the nearest examples, most similar first.
+
+        With token_budget, examples are taken in similarity order and any example that would push
+        the section over the budget is skipped, so one long example cannot crowd out the rest.
+        """
+        if num_examples <= 0 or not self.examples:
+            return []
+        # look a little past num_examples so skipped (too long) examples can be replaced
+        candidates = self.rag.retrieve(document_text, top_k=min(len(self.examples), 4 * num_examples))
+        selected: List[str] = []
+        used = 0
+        for i, _, _ in candidates:
+            if token_budget is not None and used + self.block_tokens[i] > token_budget:
+                continue
+            selected.append(self.blocks[i])
+            used += self.block_tokens[i]
+            if len(selected) == num_examples:
+                break
+        return selected
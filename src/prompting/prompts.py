@@ -1,18 +1,37 @@
 """
 Prompts for Silent Investigator
 - System prompt defines role, task, format, context (RTFC)
-- User prompt templates (general and zero-shot)
+- User prompt templates: general, zero-shot, one-shot, multi-shot (few-shot), dynamic and
+  chain-of-thought (CoT)
+- PROMPT_BUILDERS is the single registry of every prompt variant (name -> builder function)
+
+Importing this module does no work beyond defining constants: the few-shot example blocks are
+serialized once on first use and cached, and templates with literal JSON braces are split
+around their {document_text} slot once, so building a prompt is a string concatenation.
+Every builder is timed as the "prompt" stage when src/rag/metrics.py is enabled.
 
 Usage:
-from src.prompting.prompts import SYSTEM_PROMPT, build_prompt, build_zero_shot_prompt
+from src.prompting.prompts import SYSTEM_PROMPT, PROMPT_BUILDERS, build_prompt
 
 # For a general prompt
 prompt = build_prompt(document_text)
 
-# For a zero-shot specific prompt
-zero_shot_prompt = build_zero_shot_prompt(document_text)
+# Any variant by name: general, zero_shot, one_shot, multi_shot, dynamic, cot
+prompt = PROMPT_BUILDERS["multi_shot"](document_text)
+
+# Embedding-based example selection: see src/prompting/examples.py (ExampleStore)
+
+# Long documents: every builder takes packer=ContextPacker(token_budget=...) (src/prompting/context.py),
+# which keeps only the most relevant chunks within the budget
 """
 
+import json
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.prompting.tokens import count_tokens
+from src.rag import metrics
+
 # System prompt using RTFC (Role, Task, Format, Context)
 SYSTEM_PROMPT = (
     "You are Silent Investigator — an automated document investigator.\n"
@@ -25,6 +44,10 @@ SYSTEM_PROMPT = (
     "Context: Use ONLY the provided document_text. Do NOT invent facts or fabricate sources. If the document does not contain enough information to decide, mark the relevant item as 'insufficient_information' in required_information and set confidence to 0.0.\n"
 )
 
+# Schema of one missing_fields entry, as described in SYSTEM_PROMPT (see src/rag/streaming.py)
+MISSING_FIELD_KEYS = ("name", "why_missing", "evidence_span", "required_information", "priority", "confidence")
+PRIORITIES = ("low", "medium", "high")
+
 # General user prompt template
 USER_PROMPT_TEMPLATE = (
     "Document:\n{document_text}\n\n"
@@ -56,55 +79,6 @@ ZERO_SHOT_USER_PROMPT_TEMPLATE = (
     "Return up to {max_items} items."
 )
 
-
-def build_prompt(document_text: str, max_items: int = 10) -> str:
-    """Builds the general prompt string."""
-    return USER_PROMPT_TEMPLATE.format(document_text=document_text, max_items=max_items)
-
-def build_zero_shot_prompt(document_text: str, max_items: int = 10) -> str:
-    """Builds the final prompt string for zero-shot evaluation."""
-    return ZERO_SHOT_USER_PROMPT_TEMPLATE.format(document_text=document_text, max_items=max_items)
-
-
-# Example JSON schema (for implementers/tests):
-# {
-#   "missing_fields": [
-#       {
-#           "name": "Patient Age",
-#           "why_missing": "No age or DOB is present in header or body.",
-#           "evidence_span": "Patient: John Doe\nSymptoms: cough...",  # or null
-#           "required_information": "Numeric age or date of birth",
-#           "priority": "high",
-#           "confidence": 0.92
-#       }
-#   ],
-#   "summary": "The document lacks patient identifiers and consent information.",
-#   "remediation_steps": ["Request DOB from source", "Verify patient consent section"]
-# }
-"""
-Prompts for Silent Investigator
-- System prompt defines role, task, format, context (RTFC)
-- User prompt templates (general, zero-shot, and one-shot)
-
-Usage:
-from src.prompting.prompts import build_prompt, build_zero_shot_prompt, build_one_shot_prompt
-
-# Choose the appropriate function based on your needs
-prompt = build_one_shot_prompt(document_text)
-"""
-
-# System prompt using RTFC (Role, Task, Format, Context)
-SYSTEM_PROMPT = (
-    "You are Silent Investigator — an automated document investigator.\n"
-    "Role: Expert analyst that inspects documents for missing, incomplete, or inconsistent information.\n"
-    "Task: Given a document, identify any missing required fields or facts, explain why each item is missing, point to evidence spans in the text (if any), estimate confidence, and recommend concrete remediation steps.\n"
-    "Format: Return ONLY a JSON object (no surrounding commentary) with the following keys:\n"
-    "  - missing_fields: list of objects with {name, why_missing, evidence_span, required_information, priority, confidence} \n"
-    "  - summary: short plain-text summary of the overall issues (1-2 sentences)\n"
-    "  - remediation_steps: ordered list of concrete next steps to fix gaps\n"
-    "Context: Use ONLY the provided document_text. Do NOT invent facts or fabricate sources. If the document does not contain enough information to decide, mark the relevant item as 'insufficient_information' in required_information and set confidence to 0.0.\n"
-)
-
 # One-shot user prompt: provides one complete example
 ONE_SHOT_USER_PROMPT_TEMPLATE = (
     "ONE-SHOT INSTRUCTION: Analyze the document provided in the 'Your Task' section by following the single example provided below.\n\n"
@@ -131,39 +105,6 @@ ONE_SHOT_USER_PROMPT_TEMPLATE = (
     "JSON Output:\n"
 )
 
-
-def build_one_shot_prompt(document_text: str) -> str:
-    """Builds the final prompt string using a one-shot example."""
-    return ONE_SHOT_USER_PROMPT_TEMPLATE.format(document_text=document_text)
-
-# Previous functions for zero-shot and general prompts can also be kept for comparison
-# ZERO_SHOT_USER_PROMPT_TEMPLATE = (...)
-# def build_zero_shot_prompt(...)
-"""
-Prompts for Silent Investigator
-- System prompt defines the AI's core role and rules.
-- User prompt templates are provided for zero-shot, one-shot, and multi-shot (few-shot) prompting.
-
-Usage:
-from src.prompting.prompts import build_zero_shot_prompt, build_one_shot_prompt, build_multi_shot_prompt
-
-# Choose the function that best fits the complexity of your task.
-# For complex tasks, multi-shot is often the most reliable.
-prompt = build_multi_shot_prompt(document_text)
-"""
-
-# System prompt using RTFC (Role, Task, Format, Context)
-SYSTEM_PROMPT = (
-    "You are Silent Investigator — an automated document investigator.\n"
-    "Role: Expert analyst that inspects documents for missing, incomplete, or inconsistent information.\n"
-    "Task: Given a document, identify any missing required fields or facts, explain why each item is missing, point to evidence spans in the text (if any), estimate confidence, and recommend concrete remediation steps.\n"
-    "Format: Return ONLY a JSON object (no surrounding commentary) with the following keys:\n"
-    "  - missing_fields: list of objects with {name, why_missing, evidence_span, required_information, priority, confidence} \n"
-    "  - summary: short plain-text summary of the overall issues (1-2 sentences)\n"
-    "  - remediation_steps: ordered list of concrete next steps to fix gaps\n"
-    "Context: Use ONLY the provided document_text. Do NOT invent facts or fabricate sources. If the document does not contain enough information to decide, mark the relevant item as 'insufficient_information' in required_information and set confidence to 0.0.\n"
-)
-
 # Multi-shot user prompt: provides multiple, varied examples
 MULTI_SHOT_USER_PROMPT_TEMPLATE = (
     "MULTI-SHOT INSTRUCTION: Analyze the document in the 'Your Task' section by learning from the multiple examples provided below. Notice how the task applies to different contexts.\n\n"
@@ -208,10 +149,88 @@ MULTI_SHOT_USER_PROMPT_TEMPLATE = (
     "JSON Output:\n"
 )
 
-def build_multi_shot_prompt(document_text: str) -> str:
+# Chain-of-Thought (CoT) User Prompt: Teaches the model to "think step-by-step"
+COT_USER_PROMPT_TEMPLATE = (
+    "INSTRUCTION: Analyze the document in the 'Your Task' section. First, follow the chain of thought from the example to reason about the document. Second, produce the final JSON output.\n\n"
+    "### Example ###\n"
+    "Document:\n"
+    "To: Project Leads\n"
+    "From: Sarah Director\n"
+    "Subject: Q3 Project Review\n\n"
+    "Hi Team,\n"
+    "Just a reminder that the Q3 project review is next Friday. Please come prepared to discuss your team's progress against the goals we set out in July. We need to ensure we are on track.\n\n"
+    "JSON Output:\n"
+    "{\n"
+    '  "chain_of_thought": "1. **Goal:** The user wants me to act as an investigator and find missing information in the document.\\n2. **Analyze Document:** The document is a project review reminder email. It mentions a meeting, a topic (Q3 progress), and a timeline (next Friday, referencing July goals).\\n3. **Identify Key Entities:** The key entities are the meeting, the project, and the timeline.\\n4. **Scan for Missing Information:** While the email sets a date (next Friday), it is ambiguous. It lacks a specific calendar date (e.g., Aug 29, 2025) and a precise time (e.g., 10:00 AM PST). Stakeholders do not know exactly when to meet.\\n5. **Formulate the Finding:** The critical missing pieces are the specific date and time of the meeting.\\n6. **Construct JSON:** I will create a `missing_fields` entry for `Meeting Date and Time`, explain why it is missing, provide the evidence span, and suggest remediation.",\n'
+    '  "final_json": {\n'
+    '    "missing_fields": [\n'
+    '      {\n'
+    '        "name": "Meeting Date and Time",\n'
+    '        "why_missing": "The reminder mentions `next Friday` which is ambiguous and lacks a specific calendar date and time for the meeting.",\n'
+    '        "evidence_span": "the Q3 project review is next Friday",\n'
+    '        "required_information": "A specific date (e.g., 2025-08-29) and time (e.g., 10:00 AM PST) for the review.",\n'
+    '        "priority": "high",\n'
+    '        "confidence": 0.99\n'
+    '      }\n'
+    '    ],\n'
+    '    "summary": "The project review announcement is missing a specific date and time.",\n'
+    '    "remediation_steps": ["Reply to the sender asking for the exact calendar date and time of the meeting."]\n'
+    '  }\n'
+    "}\n\n"
+    "### Your Task ###\n"
+    "Document:\n{document_text}\n\n"
+    "JSON Output:\n"
+)
+
+
+@lru_cache(maxsize=None)
+def _split_template(template: str) -> Tuple[str, str]:
+    """Split a template around its {document_text} slot (templates with literal JSON braces
+    cannot go through str.format)."""
+    head, _, tail = template.partition("{document_text}")
+    return head, tail
+
+
+def _fill(template: str, document_text: str) -> str:
+    head, tail = _split_template(template)
+    return head + document_text + tail
+
+
+@metrics.timed("prompt")
+def build_prompt(document_text: str, max_items: int = 10, packer=None) -> str:
+    """Builds the general prompt string."""
+    if packer is not None:
+        document_text = packer(document_text)
+    return USER_PROMPT_TEMPLATE.format(document_text=document_text, max_items=max_items)
+
+@metrics.timed("prompt")
+def build_zero_shot_prompt(document_text: str, max_items: int = 10, packer=None) -> str:
+    """Builds the final prompt string for zero-shot evaluation."""
+    if packer is not None:
+        document_text = packer(document_text)
+    return ZERO_SHOT_USER_PROMPT_TEMPLATE.format(document_text=document_text, max_items=max_items)
+
+@metrics.timed("prompt")
+def build_one_shot_prompt(document_text: str, packer=None) -> str:
+    """Builds the final prompt string using a one-shot example."""
+    if packer is not None:
+        document_text = packer(document_text)
+    return _fill(ONE_SHOT_USER_PROMPT_TEMPLATE, document_text)
+
+@metrics.timed("prompt")
+def build_multi_shot_prompt(document_text: str, packer=None) -> str:
     """Builds the final prompt string using multiple examples (few-shot)."""
-    return MULTI_SHOT_USER_PROMPT_TEMPLATE.format(document_text=document_text)
-import json
+    if packer is not None:
+        document_text = packer(document_text)
+    return _fill(MULTI_SHOT_USER_PROMPT_TEMPLATE, document_text)
+
+@metrics.timed("prompt")
+def build_cot_prompt(document_text: str, packer=None) -> str:
+    """Builds a prompt that encourages Chain-of-Thought reasoning."""
+    if packer is not None:
+        document_text = packer(document_text)
+    return _fill(COT_USER_PROMPT_TEMPLATE, document_text)
+
 
 # --- Example Library ---
 # In a real application, this could be a database of high-quality examples.
@@ -252,31 +271,69 @@ EXAMPLE_LIBRARY = {
     }
 }
 
-def get_relevant_examples(document_text: str, num_examples: int) -> str:
+
+def format_example(example: Dict) -> str:
+    """Document + serialized JSON output of one few-shot example, as shown in prompts."""
+    return (
+        f"Document:\n{example['document']}\n\n"
+        f"JSON Output:\n{json.dumps(example['json_output'], indent=2)}\n\n"
+    )
+
+
+@lru_cache(maxsize=None)
+def _example_block(key: str) -> str:
+    """format_example() of a library example (json.dumps runs once per example)."""
+    return format_example(EXAMPLE_LIBRARY[key])
+
+
+def _number_examples(blocks: List[str]) -> str:
+    return "".join(f"### Example {i+1} ###\n" + block for i, block in enumerate(blocks))
+
+
+def _within_budget(blocks: List[str], token_budget: Optional[int]) -> List[str]:
+    """Keep blocks in order, skipping any that would push the section over token_budget."""
+    if token_budget is None:
+        return blocks
+    kept, used = [], 0
+    for block in blocks:
+        tokens = count_tokens(block)
+        if used + tokens <= token_budget:
+            kept.append(block)
+            used += tokens
+    return kept
+
+
+def get_relevant_examples(document_text: str, num_examples: int, token_budget: int = None) -> str:
     """Selects relevant examples from the library based on document content."""
-    examples_str = ""
+    if num_examples <= 0:
+        return ""
     # Simple logic to detect context
-    if "patient" in document_text.lower() or "medical" in document_text.lower():
-        selected_examples = [EXAMPLE_LIBRARY["medical"]]
-    elif "project" in document_text.lower() or "team" in document_text.lower():
-        selected_examples = [EXAMPLE_LIBRARY["business"]]
+    text = document_text.lower()
+    if "patient" in text or "medical" in text:
+        selected_keys = ["medical"]
+    elif "project" in text or "team" in text:
+        selected_keys = ["business"]
     else:
         # Default to a mix if context is unclear
-        selected_examples = list(EXAMPLE_LIBRARY.values())
+        selected_keys = list(EXAMPLE_LIBRARY)
 
     # Format the selected examples
-    for i, example in enumerate(selected_examples[:num_examples]):
-        examples_str += f"### Example {i+1} ###\n"
-        examples_str += f"Document:\n{example['document']}\n\n"
-        examples_str += f"JSON Output:\n{json.dumps(example['json_output'], indent=2)}\n\n"
-    
-    return examples_str
+    blocks = [_example_block(key) for key in selected_keys[:num_examples]]
+    return _number_examples(_within_budget(blocks, token_budget))
 
-def build_dynamic_prompt(document_text: str) -> str:
+@metrics.timed("prompt")
+def build_dynamic_prompt(document_text: str, example_store=None, example_token_budget: int = None,
+                         packer=None) -> str:
     """
     Builds a prompt dynamically by choosing the best strategy (zero, one, or multi-shot)
     and selecting the most relevant examples at runtime.
+
+    With an example_store (src.prompting.examples.ExampleStore) the nearest examples by embedding
+    similarity are used instead of the keyword match against EXAMPLE_LIBRARY.
+    example_token_budget caps the tokens of the example section in both cases.
     """
+    if packer is not None:
+        document_text = packer(document_text)
     prompt_strategy = ""
     num_examples = 0
     
@@ -301,7 +358,11 @@ def build_dynamic_prompt(document_text: str) -> str:
         "analyze the document in the 'Your Task' section and return the structured JSON."
     )
     
-    examples_section = get_relevant_examples(document_text, num_examples)
+    if example_store is not None:
+        examples_section = _number_examples(
+            example_store.select(document_text, num_examples, example_token_budget))
+    else:
+        examples_section = get_relevant_examples(document_text, num_examples, example_token_budget)
     
     task_section = f"### Your Task ###\nDocument:\n{document_text}\n\nJSON Output:\n"
 
@@ -310,56 +371,46 @@ def build_dynamic_prompt(document_text: str) -> str:
     
     return final_prompt
 
-# --- Example Usage ---
-short_doc = "Invoice #123 for services rendered. Total due: $500."
-long_doc = "Patient Name: John Doe. Age: 45. The patient reports chest pain and shortness of breath. The primary care physician was Dr. Evans. Plan is to run a cardiac enzyme panel and a chest X-ray. Follow-up scheduled for next week."
-
-print("--- DYNAMIC PROMPT FOR SHORT DOCUMENT (Chooses ZERO-SHOT) ---")
-print(build_dynamic_prompt(short_doc))
-print("\n" + "="*50 + "\n")
-print("--- DYNAMIC PROMPT FOR LONG MEDICAL DOCUMENT (Chooses MULTI-SHOT with relevant example) ---")
-print(build_dynamic_prompt(long_doc))
-import json
 
-# Chain-of-Thought (CoT) User Prompt: Teaches the model to "think step-by-step"
-COT_USER_PROMPT_TEMPLATE = (
-    "INSTRUCTION: Analyze the document in the 'Your Task' section. First, follow the chain of thought from the example to reason about the document. Second, produce the final JSON output.\n\n"
-    "### Example ###\n"
-    "Document:\n"
-    "To: Project Leads\n"
-    "From: Sarah Director\n"
-    "Subject: Q3 Project Review\n\n"
-    "Hi Team,\n"
-    "Just a reminder that the Q3 project review is next Friday. Please come prepared to discuss your team's progress against the goals we set out in July. We need to ensure we are on track.\n\n"
-    "JSON Output:\n"
-    "{\n"
-    '  "chain_of_thought": "1. **Goal:** The user wants me to act as an investigator and find missing information in the document.\\n2. **Analyze Document:** The document is a project review reminder email. It mentions a meeting, a topic (Q3 progress), and a timeline (next Friday, referencing July goals).\\n3. **Identify Key Entities:** The key entities are the meeting, the project, and the timeline.\\n4. **Scan for Missing Information:** While the email sets a date (next Friday), it is ambiguous. It lacks a specific calendar date (e.g., Aug 29, 2025) and a precise time (e.g., 10:00 AM PST). Stakeholders do not know exactly when to meet.\\n5. **Formulate the Finding:** The critical missing pieces are the specific date and time of the meeting.\\n6. **Construct JSON:** I will create a `missing_fields` entry for `Meeting Date and Time`, explain why it is missing, provide the evidence span, and suggest remediation.",\n'
-    '  "final_json": {\n'
-    '    "missing_fields": [\n'
-    '      {\n'
-    '        "name": "Meeting Date and Time",\n'
-    '        "why_missing": "The reminder mentions `next Friday` which is ambiguous and lacks a specific calendar date and time for the meeting.",\n'
-    '        "evidence_span": "the Q3 project review is next Friday",\n'
-    '        "required_information": "A specific date (e.g., 2025-08-29) and time (e.g., 10:00 AM PST) for the review.",\n'
-    '        "priority": "high",\n'
-    '        "confidence": 0.99\n'
-    '      }\n'
-    '    ],\n'
-    '    "summary": "The project review announcement is missing a specific date and time.",\n'
-    '    "remediation_steps": ["Reply to the sender asking for the exact calendar date and time of the meeting."]\n'
-    '  }\n'
-    "}\n\n"
-    "### Your Task ###\n"
-    "Document:\n{document_text}\n\n"
-    "JSON Output:\n"
-)
+# Single registry of every prompt variant: name -> builder(document_text) -> prompt string
+PROMPT_BUILDERS: Dict[str, Callable[[str], str]] = {
+    "general": build_prompt,
+    "zero_shot": build_zero_shot_prompt,
+    "one_shot": build_one_shot_prompt,
+    "multi_shot": build_multi_shot_prompt,
+    "dynamic": build_dynamic_prompt,
+    "cot": build_cot_prompt,
+}
 
-def build_cot_prompt(document_text: str) -> str:
-    """Builds a prompt that encourages Chain-of-Thought reasoning."""
-    return COT_USER_PROMPT_TEMPLATE.format(document_text=document_text)
 
-# --- Example Usage ---
-my_document = "Please approve the attached PO for the new server hardware. We need it to scale the main application. The vendor is TechCorp."
+# Example JSON schema (for implementers/tests):
+# {
+#   "missing_fields": [
+#       {
+#           "name": "Patient Age",
+#           "why_missing": "No age or DOB is present in header or body.",
+#           "evidence_span": "Patient: John Doe\nSymptoms: cough...",  # or null
+#           "required_information": "Numeric age or date of birth",
+#           "priority": "high",
+#           "confidence": 0.92
+#       }
+#   ],
+#   "summary": "The document lacks patient identifiers and consent information.",
+#   "remediation_steps": ["Request DOB from source", "Verify patient consent section"]
+# }
 
-print("--- CHAIN-OF-THOUGHT PROMPT ---")
-print(build_cot_prompt(my_document))
\ No newline at end of file
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    short_doc = "Invoice #123 for services rendered. Total due: $500."
+    long_doc = "Patient Name: John Doe. Age: 45. The patient reports chest pain and shortness of breath. The primary care physician was Dr. Evans. Plan is to run a cardiac enzyme panel and a chest X-ray. Follow-up scheduled for next week."
+    my_document = "Please approve the attached PO for the new server hardware. We need it to scale the main application. The vendor is TechCorp."
+
+    print("--- DYNAMIC PROMPT FOR SHORT DOCUMENT (Chooses ZERO-SHOT) ---")
+    print(build_dynamic_prompt(short_doc))
+    print("\n" + "="*50 + "\n")
+    print("--- DYNAMIC PROMPT FOR LONG MEDICAL DOCUMENT (Chooses MULTI-SHOT with relevant example) ---")
+    print(build_dynamic_prompt(long_doc))
+    print("\n" + "="*50 + "\n")
+    print("--- CHAIN-OF-THOUGHT PROMPT ---")
+    print(build_cot_prompt(my_document))
@@ -0,0 +1,26 @@
+"""
+Token counting for prompt budgets.
+
+count_tokens() approximates model tokens without loading a tokenizer: every word and every
+punctuation mark counts as one token. Subword tokenizers split rare words further, so keep a
+safety margin when a budget is close to a hard model limit.
+"""
+
+import re
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate number of model tokens in text."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text with at most max_tokens tokens (as counted by count_tokens)."""
+    if max_tokens <= 0:
+        return ""
+    for i, match in enumerate(_TOKEN_RE.finditer(text), 1):
+        if i == max_tokens:
+            return text[:match.end()]
+    return text
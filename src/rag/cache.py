@@ -0,0 +1,320 @@
+"""
+Caches used by the RAG pipeline.
+- LRUCache: bounded in-process tier (OrderedDict, least-recently-used eviction).
+- SQLiteStore: optional on-disk tier with size-based eviction of the least recently used rows
+  and optional TTL expiry.
+- EmbeddingCache: embeddings keyed by (model name, hash of the normalized text); only cache
+  misses are sent to the embedder, in a single batch.
+- ResponseCache: generated text keyed by a hash of (model, prompt, temperature, maxOutputTokens).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from src.rag import metrics
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU mapping with a maximum number of items."""
+
+    def __init__(self, max_items: int = 100_000):
+        self.max_items = max_items
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteStore:
+    """Key -> bytes store in a single SQLite file.
+
+    When the total stored size exceeds `max_bytes`, the least recently accessed rows are evicted.
+    With `ttl` (seconds), rows older than ttl are treated as missing and deleted on lookup.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1 << 30, ttl: float = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        if not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            expired = []
+            # stay under SQLite's default host-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value, size, created FROM entries WHERE key IN ({marks})", chunk
+                )
+                for key, value, size, created in rows.fetchall():
+                    if self.ttl is not None and now - created > self.ttl:
+                        expired.append((key, size))
+                    else:
+                        found[key] = value
+            for key, size in expired:
+                self._conn.execute("DELETE FROM entries WHERE key=?", (key,))
+                self._total -= size
+            if found:
+                self._conn.executemany("UPDATE entries SET accessed=? WHERE key=?", [(now, k) for k in found])
+            if found or expired:
+                self._conn.commit()
+        return found
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, bytes]):
+        if not items:
+            return
+        with self._lock:
+            now = time.time()
+            for key, value in items.items():
+                old = self._conn.execute("SELECT size FROM entries WHERE key=?", (key,)).fetchone()
+                if old:
+                    self._total -= old[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries(key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value), now, now),
+                )
+                self._total += len(value)
+            self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, value: bytes):
+        self.put_many({key: value})
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed LIMIT 256").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key=?", (key,))
+                self._total -= size
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def normalize_text(text: str) -> str:
+    """Normalization applied before hashing, so whitespace/Unicode variants share one entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by (model name, sha256 of the normalized text).
+
+    Parameters:
+        max_items: capacity of the in-process LRU tier
+        path: optional SQLite file for the on-disk tier (shared across runs)
+        max_disk_bytes: size cap of the on-disk tier
+
+    Counters (`hits`, `disk_hits`, `misses`) show how much encoding was avoided. They count
+    distinct texts per encode() call: a text repeated within one call is encoded once and counts
+    once, as a hit only if it was cached before the call.
+    """
+
+    def __init__(self, max_items: int = 100_000, path: str = None, max_disk_bytes: int = 1 << 30):
+        self.memory = LRUCache(max_items)
+        self.disk = SQLiteStore(path, max_disk_bytes) if path else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def encode(self, embedder, texts: List[str], model_name: str) -> np.ndarray:
+        """Return raw embeddings for `texts`, encoding only cache misses (in one embedder call)."""
+        keys = [self.key(model_name, t) for t in texts]
+        # first text of every distinct key
+        unique: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            unique.setdefault(k, t)
+        vectors: Dict[str, np.ndarray] = {}
+        for k in unique:
+            vec = self.memory.get(k)
+            if vec is not None:
+                vectors[k] = vec
+
+        disk_hits = 0
+        pending = [k for k in unique if k not in vectors]
+        if self.disk is not None and pending:
+            for k, blob in self.disk.get_many(pending).items():
+                # a writable copy that owns its memory (frombuffer is a read-only view of the blob)
+                vec = np.frombuffer(blob, dtype=np.float32).copy()
+                vectors[k] = vec
+                self.memory.put(k, vec)
+                disk_hits += 1
+
+        miss_texts = {k: t for k, t in unique.items() if k not in vectors}
+        hits = len(unique) - len(miss_texts)
+        with self._lock:
+            self.hits += hits
+            self.disk_hits += disk_hits
+            self.misses += len(miss_texts)
+        metrics.cache_access("embedding", hits, len(miss_texts))
+
+        if miss_texts:
+            encoded = np.asarray(embedder.encode(list(miss_texts.values()), convert_to_numpy=True), dtype=np.float32)
+            for k, vec in zip(miss_texts, encoded):
+                # copy the row: a view would keep the whole `encoded` batch alive in the LRU
+                vec = vec.copy()
+                vectors[k] = vec
+                self.memory.put(k, vec)
+            if self.disk is not None:
+                self.disk.put_many({k: vectors[k].tobytes() for k in miss_texts})
+
+        if not keys:
+            return np.zeros((0, embedder.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.stack([vectors[k] for k in keys])
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "memory_items": len(self.memory),
+            "disk_bytes": self.disk.total_bytes if self.disk is not None else 0,
+        }
+
+
+GENERATION_ERROR_PREFIX = "[GENERATION ERROR]"
+
+
+class ResponseCache:
+    """Cache of generated responses keyed by sha256 of (model, prompt, temperature, maxOutputTokens).
+
+    Parameters:
+        max_items: capacity of the in-process LRU tier
+        path: optional SQLite file for the persistent tier
+        max_disk_bytes: size cap of the persistent tier (least recently used rows are evicted)
+        ttl: optional lifetime in seconds for both tiers
+
+    Only successful responses are stored; '[GENERATION ERROR] ...' strings are never cached.
+    Each entry keeps the latency of the original call, so `latency_saved` is the generation
+    time avoided by hits since the last reset_stats().
+    """
+
+    def __init__(self, max_items: int = 10_000, path: str = None, max_disk_bytes: int = 256 << 20,
+                 ttl: float = None):
+        self.ttl = ttl
+        self.memory = LRUCache(max_items)
+        self.disk = SQLiteStore(path, max_disk_bytes, ttl=ttl) if path else None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def key(model: str, prompt: str, temperature: float, max_output_tokens: int) -> str:
+        payload = json.dumps([model, prompt, temperature, max_output_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        key = self.key(model, prompt, temperature, max_output_tokens)
+        entry = self.memory.get(key)
+        if entry is not None and self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            entry = None
+        if entry is None and self.disk is not None:
+            blob = self.disk.get(key)
+            if blob is not None:
+                entry = json.loads(blob.decode("utf-8"))
+                self.memory.put(key, entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.latency_saved += entry["latency"]
+        metrics.cache_access("response", int(entry is not None), int(entry is None))
+        return entry["text"] if entry is not None else None
+
+    def put(self, model: str, prompt: str, temperature: float, max_output_tokens: int, text: str,
+            latency: float):
+        if text.startswith(GENERATION_ERROR_PREFIX):
+            return
+        key = self.key(model, prompt, temperature, max_output_tokens)
+        entry = {"text": text, "latency": latency, "created": time.time()}
+        self.memory.put(key, entry)
+        if self.disk is not None:
+            self.disk.put(key, json.dumps(entry).encode("utf-8"))
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "latency_saved_s": self.latency_saved,
+            "memory_items": len(self.memory),
+            "disk_bytes": self.disk.total_bytes if self.disk is not None else 0,
+        }
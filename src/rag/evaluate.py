@@ -0,0 +1,255 @@
+"""
+Streaming evaluation runner: dataset JSONL -> prompt -> generation -> judge_compare -> results JSONL.
+
+- The dataset is read line by line; each record needs an id ("id" or "request_id", else the line
+  number), a document ("document", "document_text" or "body", or --text-field) and optionally an
+  "expected" object in the missing_fields schema. Records without "expected" are generated but
+  not scored.
+- Generation runs with bounded concurrency on a thread pool; judging runs in a process pool and
+  is timed in the workers, so --metrics still reports the "judge" stage.
+- Every finished record is appended to the output JSONL immediately. Re-running with the same
+  output file skips records that are already there, so a crash never repeats finished work.
+
+Usage:
+python -m src.rag.evaluate --dataset requests.jsonl --output eval_results.jsonl --variant zero_shot
+"""
+
+import argparse
+import json
+import os
+import time
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
+
+from src.prompting.prompts import PROMPT_BUILDERS
+from src.rag import metrics
+from src.rag.judge import judge_compare
+
+TEXT_FIELDS = ("document", "document_text", "body")
+SCORE_BUCKETS = (0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+def iter_records(path: str, text_field: str = None) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """Yield (record_id, document_text, expected_or_None) one line at a time."""
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record_id = str(record.get("id", record.get("request_id", lineno)))
+            fields = (text_field,) if text_field else TEXT_FIELDS
+            text = next((record[k] for k in fields if k in record), None)
+            if text is None:
+                raise ValueError(f"{path}:{lineno} has none of the document fields {fields}")
+            yield record_id, text, record.get("expected")
+
+
+def parse_prediction(text: str) -> Dict[str, Any]:
+    """Parse the model output into the missing_fields schema (unwraps CoT 'final_json')."""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end <= start:
+            raise ValueError("no JSON object in model output")
+        data = json.loads(text[start:end + 1])
+    if isinstance(data, dict) and isinstance(data.get("final_json"), dict):
+        data = data["final_json"]
+    if not isinstance(data, dict):
+        raise ValueError("model output is not a JSON object")
+    return data
+
+
+def _prepare_output(path: str) -> Set[str]:
+    """Return ids already in the output file, dropping a trailing partially written line."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    for line in data.decode("utf-8").splitlines():
+        try:
+            done.add(json.loads(line)["id"])
+        except (ValueError, KeyError):
+            continue
+    return done
+
+
+def _generate_one(generate: Callable[[str], str], builder: Callable[[str], str],
+                  record_id: str, text: str, expected: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    raw = generate(builder(text))
+    result = {"id": record_id, "latency_s": time.perf_counter() - start, "raw_response": raw,
+              "prediction": None, "error": None, "expected": expected}
+    try:
+        result["prediction"] = parse_prediction(raw)
+    except ValueError as e:
+        result["error"] = f"unparseable prediction: {e}"
+    return result
+
+
+def _judge_one(prediction: Dict[str, Any], expected: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    """judge_compare in a judge worker, with its duration (the worker's metrics never reach the parent)."""
+    start = time.perf_counter()
+    verdict = judge_compare(prediction, expected)
+    return verdict, time.perf_counter() - start
+
+
+def summarize(path: str) -> Dict[str, Any]:
+    """Aggregate pass rate and score distribution over every record in a results file."""
+    scores: List[float] = []
+    passed = records = errors = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            records += 1
+            errors += row.get("error") is not None
+            if row.get("score") is not None:
+                scores.append(row["score"])
+                passed += bool(row.get("pass"))
+    buckets = {f"<={b}": 0 for b in SCORE_BUCKETS}
+    for score in scores:
+        bucket = next(b for b in SCORE_BUCKETS if score <= b)
+        buckets[f"<={bucket}"] += 1
+    ordered = sorted(scores)
+    return {
+        "records": records,
+        "scored": len(scores),
+        "errors": errors,
+        "pass_rate": passed / len(scores) if scores else 0.0,
+        "mean_score": sum(scores) / len(scores) if scores else 0.0,
+        "median_score": ordered[len(ordered) // 2] if ordered else 0.0,
+        "score_distribution": buckets,
+    }
+
+
+def run_evaluation(dataset_path: str, output_path: str, generate: Callable[[str], str] = None,
+                   variant: str = "general", max_concurrency: int = 8, judge_workers: int = None,
+                   text_field: str = None, resume: bool = True, packer=None) -> Dict[str, Any]:
+    """Evaluate every dataset record and stream per-record results to `output_path`.
+
+    Parameters:
+        generate: prompt -> text function (default: GeminiClient().generate)
+        variant: key of PROMPT_BUILDERS used to build prompts
+        max_concurrency: generation requests in flight at once
+        judge_workers: processes scoring with judge_compare (default: os.cpu_count())
+        resume: keep and skip records already present in output_path (False overwrites it)
+        packer: optional ContextPacker (src/prompting/context.py) fitting long documents to a token budget
+
+    Returns the summary of the whole output file plus this run's throughput.
+    """
+    if generate is None:
+        from src.rag.generation import GeminiClient
+        generate = GeminiClient().generate
+    builder = PROMPT_BUILDERS[variant]
+    if packer is not None:
+        builder = partial(builder, packer=packer)
+    done = _prepare_output(output_path) if resume else set()
+
+    started = time.perf_counter()
+    processed = skipped = 0
+    generating: Set[Any] = set()
+    judging: Dict[Any, Dict[str, Any]] = {}
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=judge_workers) as judge_pool:
+
+        def write(result: Dict[str, Any]):
+            nonlocal processed
+            result.pop("expected", None)
+            result["variant"] = variant
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            processed += 1
+
+        def drain(limit: int):
+            while len(generating) + len(judging) > limit:
+                finished, _ = wait(list(generating) + list(judging), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    if fut in generating:
+                        generating.discard(fut)
+                        result = fut.result()
+                        if result["expected"] is not None and result["prediction"] is not None:
+                            judging[judge_pool.submit(_judge_one, result["prediction"], result["expected"])] = result
+                        else:
+                            result["score"] = result["pass"] = None
+                            write(result)
+                    else:
+                        result = judging.pop(fut)
+                        verdict, seconds = fut.result()
+                        metrics.record_stage("judge", seconds, function="judge_compare")
+                        for key in ("score", "pass", "points", "max_points"):
+                            result[key] = verdict[key]
+                        write(result)
+
+        # start the judge workers before any generation thread exists, so forked workers never
+        # inherit locks held by those threads
+        judge_pool.submit(int).result()
+        with ThreadPoolExecutor(max_workers=max_concurrency) as gen_pool:
+            for record_id, text, expected in iter_records(dataset_path, text_field):
+                if record_id in done:
+                    skipped += 1
+                    continue
+                generating.add(gen_pool.submit(_generate_one, generate, builder, record_id, text, expected))
+                drain(2 * max_concurrency)
+            drain(0)
+
+    elapsed = time.perf_counter() - started
+    summary = summarize(output_path)
+    summary.update(processed=processed, skipped=skipped, seconds=elapsed,
+                   records_per_sec=processed / elapsed if elapsed > 0 else 0.0)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate prompt variants against a JSONL dataset.")
+    parser.add_argument("--dataset", required=True, help="input JSONL (e.g. requests.jsonl)")
+    parser.add_argument("--output", required=True, help="results JSONL (appended to; resumable)")
+    parser.add_argument("--variant", default="general", choices=sorted(PROMPT_BUILDERS))
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--judge-workers", type=int, default=None)
+    parser.add_argument("--text-field", default=None, help="record field holding the document")
+    parser.add_argument("--model", default="text-bison-001")
+    parser.add_argument("--cache", default=None, help="optional SQLite path for the response cache")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output file")
+    parser.add_argument("--context-budget", type=int, default=None,
+                        help="pack documents longer than this many tokens (retrieval over chunks)")
+    parser.add_argument("--metrics", default=None,
+                        help="record per-stage metrics and write a JSON snapshot here (.prom: Prometheus text)")
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+
+    from src.rag.cache import ResponseCache
+    from src.rag.generation import GeminiClient
+    cache = ResponseCache(path=args.cache) if args.cache else None
+    client = GeminiClient(model=args.model, pool_size=max(16, args.max_concurrency), cache=cache)
+    packer = None
+    if args.context_budget:
+        from src.prompting.context import ContextPacker
+        packer = ContextPacker(token_budget=args.context_budget)
+
+    summary = run_evaluation(args.dataset, args.output, generate=client.generate, variant=args.variant,
+                             max_concurrency=args.max_concurrency, judge_workers=args.judge_workers,
+                             text_field=args.text_field, resume=not args.no_resume, packer=packer)
+    print(json.dumps(summary, indent=2))
+    print(json.dumps({"generation": client.stats.summary(),
+                      "cache": cache.stats() if cache is not None else None}, indent=2))
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            if args.metrics.endswith(".prom"):
+                f.write(metrics.to_prometheus())
+            else:
+                json.dump(metrics.snapshot(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Proactive gap analysis: check the index for evidence of every "expected information" item.
+
+A checklist names a topic and the items a complete picture of it should contain:
+    {"topic": "Company X Q3 performance",
+     "where": {"client": "x"}, "namespace": "filings",          # optional, as in retrieve()
+     "expected": [
+         {"name": "Revenue", "queries": ["quarterly revenue", "total Q3 sales"],
+          "priority": "high", "required_information": "The Q3 revenue figure",
+          "threshold": 0.55, "min_hits": 2},                     # optional per-item overrides
+         "Known risks"                                            # a bare string is its own query
+     ]}
+
+GapAnalyzer.analyze(checklists):
+- collects the query phrasings of every item of every checklist, deduplicates them (after text
+  normalization) and encodes them in one embedder call through an EmbeddingCache, so phrasings
+  shared by topics, or seen in an earlier run with a disk cache, are not encoded again;
+- scores them against the corpus `block_size` phrasings at a time (one matrix multiply per block,
+  SimpleRAG.retrieve_vectors), with blocks running on a thread pool;
+- an item is covered when at least `min_hits` distinct documents reach its evidence threshold
+  with any of its phrasings; otherwise it is a silent gap;
+- builds one report per topic (in parallel) in the missing_fields schema of SYSTEM_PROMPT, plus
+  the topic and the evidence behind every covered item.
+
+Usage:
+python -m src.rag.gaps --index saved_index --checklists checklists.json --cache gaps.sqlite
+"""
+
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+import numpy as np
+
+from src.prompting.prompts import PRIORITIES
+from src.rag import metrics
+from src.rag.cache import normalize_text
+from src.rag.ingest import read_json_objects
+
+# evidence_span holds the start of the closest document
+SNIPPET_CHARS = 240
+_PRIORITY_RANK = {p: rank for rank, p in enumerate(reversed(PRIORITIES))}
+
+
+class ExpectedItem(NamedTuple):
+    name: str
+    queries: List[str]
+    priority: str
+    required_information: str
+    threshold: float
+    min_hits: int
+
+
+class Checklist(NamedTuple):
+    topic: str
+    items: List[ExpectedItem]
+    where: Dict[str, Any]
+    namespace: str
+
+
+def load_checklists(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Checklists from .json (one object or a list), .jsonl (one per line) files or directories of them."""
+    checklists: List[Dict[str, Any]] = []
+    for path in paths:
+        checklists.extend(read_json_objects(path))
+    return checklists
+
+
+def _filter_key(checklist: Checklist) -> str:
+    return json.dumps([checklist.where, checklist.namespace], sort_keys=True, default=str)
+
+
+def _snippet(text: str) -> str:
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS].rstrip() + "..."
+
+
+class GapAnalyzer:
+    """Batched evidence check of expected-information checklists against a SimpleRAG index.
+
+    Parameters:
+        rag: the indexed corpus
+        cache: EmbeddingCache for the query phrasings (default: rag.cache); give it a `path` so
+            the embeddings are kept across runs
+        threshold: default evidence threshold (cosine similarity between a phrasing and a document)
+        min_hits: default number of distinct documents that must reach the threshold
+        top_k: documents retrieved per phrasing (raised to the largest min_hits if needed)
+        block_size: phrasings scored per matrix multiply
+        max_workers: threads for scoring blocks and building topic reports
+    """
+
+    def __init__(self, rag, cache=None, threshold: float = 0.5, min_hits: int = 1, top_k: int = 5,
+                 block_size: int = 1024, max_workers: int = 8):
+        self.rag = rag
+        self.cache = cache if cache is not None else rag.cache
+        self.threshold = threshold
+        self.min_hits = min_hits
+        self.top_k = top_k
+        self.block_size = block_size
+        self.max_workers = max_workers
+
+    def _parse(self, i: int, checklist: Dict[str, Any]) -> Checklist:
+        if "topic" not in checklist or "expected" not in checklist:
+            raise ValueError(f"Checklist {i} needs 'topic' and 'expected' keys")
+        topic = checklist["topic"]
+        items = []
+        for spec in checklist["expected"]:
+            if isinstance(spec, str):
+                spec = {"name": spec}
+            if "name" not in spec:
+                raise ValueError(f"Checklist {topic!r}: every expected item needs a 'name'")
+            name = spec["name"]
+            priority = spec.get("priority", "medium")
+            if priority not in PRIORITIES:
+                raise ValueError(f"Checklist {topic!r}, item {name!r}: priority must be one of {PRIORITIES}")
+            items.append(ExpectedItem(
+                name=name,
+                queries=list(spec.get("queries") or [name]),
+                priority=priority,
+                required_information=spec.get("required_information", f"{name} for {topic}"),
+                threshold=float(spec.get("threshold", self.threshold)),
+                min_hits=int(spec.get("min_hits", self.min_hits)),
+            ))
+        return Checklist(topic, items, checklist.get("where"), checklist.get("namespace"))
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Normalized embeddings of the phrasings, as SimpleRAG encodes queries."""
+        with metrics.stage("embed", batch_size=len(texts)):
+            if self.cache is not None:
+                raw = self.cache.encode(self.rag.embedder, texts, self.rag.model_name)
+            else:
+                raw = self.rag.embedder.encode(texts, convert_to_numpy=True)
+        raw = np.asarray(raw, dtype=np.float32)
+        return raw / (np.linalg.norm(raw, axis=1, keepdims=True) + 1e-12)
+
+    def analyze(self, checklists: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One report per checklist, in input order (see the module docstring)."""
+        parsed = [self._parse(i, checklist) for i, checklist in enumerate(checklists)]
+        # every distinct phrasing is encoded once and searched once per distinct filter
+        text_row: Dict[str, int] = {}
+        texts: List[str] = []
+        filters: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        filter_rows: Dict[str, Dict[int, None]] = {}
+        for checklist in parsed:
+            fkey = _filter_key(checklist)
+            filters.setdefault(fkey, (checklist.where, checklist.namespace))
+            rows = filter_rows.setdefault(fkey, {})
+            for item in checklist.items:
+                for query in item.queries:
+                    key = normalize_text(query)
+                    if key not in text_row:
+                        text_row[key] = len(texts)
+                        texts.append(query)
+                    rows[text_row[key]] = None
+        if not texts:
+            return [self._report(checklist, {}) for checklist in parsed]
+        vectors = self._encode(texts)
+        keys = list(text_row)
+        top_k = max([self.top_k] + [item.min_hits for c in parsed for item in c.items])
+
+        # (filter key, normalized phrasing) -> [(doc id, score, text)]
+        hits: Dict[Tuple[str, str], List[Tuple[Any, float, str]]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            blocks = []
+            for fkey, rows in filter_rows.items():
+                rows = list(rows)
+                where, namespace = filters[fkey]
+                for start in range(0, len(rows), self.block_size):
+                    block = rows[start:start + self.block_size]
+                    future = pool.submit(self.rag.retrieve_vectors, vectors[block], top_k, self.block_size,
+                                         where, namespace, True)
+                    blocks.append((fkey, block, future))
+            for fkey, block, future in blocks:
+                for row, result in zip(block, future.result()):
+                    hits[(fkey, keys[row])] = result
+            return list(pool.map(lambda checklist: self._report(checklist, hits), parsed))
+
+    def _report(self, checklist: Checklist, hits: Dict[Tuple[str, str], List[Tuple[Any, float, str]]]) -> Dict[str, Any]:
+        fkey = _filter_key(checklist)
+        missing, covered = [], []
+        for item in checklist.items:
+            # best score per document over all phrasings of the item
+            best: Dict[Any, Tuple[float, str]] = {}
+            for query in item.queries:
+                for doc_id, score, text in hits.get((fkey, normalize_text(query)), []):
+                    if doc_id not in best or score > best[doc_id][0]:
+                        best[doc_id] = (score, text)
+            ranked = sorted(best.items(), key=lambda kv: -kv[1][0])
+            supporting = [(doc_id, score, text) for doc_id, (score, text) in ranked if score >= item.threshold]
+            if len(supporting) >= item.min_hits:
+                covered.append({
+                    "name": item.name,
+                    "score": supporting[0][1],
+                    "evidence": [{"id": doc_id, "score": score, "text": _snippet(text)}
+                                 for doc_id, score, text in supporting[:max(item.min_hits, 1)]],
+                })
+            else:
+                missing.append(self._gap(checklist, item, ranked, len(supporting)))
+        missing.sort(key=lambda entry: (_PRIORITY_RANK[entry["priority"]], -entry["confidence"]))
+        total = len(checklist.items)
+        if missing:
+            summary = (f"{len(missing)} of {total} expected items for {checklist.topic!r} have no "
+                       f"sufficient evidence in the indexed documents.")
+        else:
+            summary = f"All {total} expected items for {checklist.topic!r} have evidence in the indexed documents."
+        return {
+            "topic": checklist.topic,
+            "missing_fields": missing,
+            "summary": summary,
+            "remediation_steps": [f"Add or locate documentation of: {entry['required_information']}."
+                                  for entry in missing],
+            "covered": covered,
+        }
+
+    @staticmethod
+    def _gap(checklist: Checklist, item: ExpectedItem, ranked: List[Tuple[Any, Tuple[float, str]]],
+             n_supporting: int) -> Dict[str, Any]:
+        """missing_fields entry for an item without enough evidence."""
+        best = ranked[0][1][0] if ranked else 0.0
+        if n_supporting:
+            why = (f"Only {n_supporting} document(s) reach the evidence threshold {item.threshold:.2f}; "
+                   f"{item.min_hits} are required.")
+            confidence = 1.0 - n_supporting / item.min_hits
+        else:
+            why = (f"No indexed document matches any phrasing of this item for {checklist.topic!r} "
+                   f"(best similarity {best:.2f}, evidence threshold {item.threshold:.2f}).")
+            confidence = (item.threshold - best) / item.threshold if item.threshold > 0 else 1.0
+        return {
+            "name": item.name,
+            "why_missing": why,
+            "evidence_span": _snippet(ranked[0][1][1]) if ranked else None,
+            "required_information": item.required_information,
+            "priority": item.priority,
+            "confidence": round(min(1.0, max(0.0, confidence)), 3),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report silent gaps: expected items without evidence in an index.")
+    parser.add_argument("--index", required=True, help="index directory written by SimpleRAG.save()")
+    parser.add_argument("--checklists", required=True, nargs="+", help=".json/.jsonl files or directories")
+    parser.add_argument("--cache", default=None, help="SQLite path for phrasing embeddings (kept across runs)")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--min-hits", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--output", default=None, help="write the reports here (default: stdout)")
+    args = parser.parse_args()
+
+    from src.rag.cache import EmbeddingCache
+    from src.rag.rag_app import SimpleRAG
+    rag = SimpleRAG.load(args.index)
+    cache = EmbeddingCache(path=args.cache) if args.cache else None
+    analyzer = GapAnalyzer(rag, cache=cache, threshold=args.threshold, min_hits=args.min_hits,
+                           top_k=args.top_k, block_size=args.block_size, max_workers=args.workers)
+    reports = analyzer.analyze(load_checklists(args.checklists))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    else:
+        print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
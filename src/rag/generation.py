@@ -0,0 +1,316 @@
+"""
+Pooled, concurrent generation client for the Gemini/Google Generative API.
+- One persistent requests.Session with a sized HTTP connection pool (keep-alive reuse).
+- generate_many(): bounded thread-pool concurrency, results returned in input order.
+- Token-bucket rate limiting, retries with exponential backoff + full jitter on 429/5xx and
+  connection errors (Retry-After is honoured), per-request latency statistics.
+- Optional ResponseCache (src/rag/cache.py) so repeated prompts skip the HTTP call.
+- Every HTTP attempt is timed as the "http" stage when src/rag/metrics.py is enabled.
+- generate_stream() yields text as it arrives (server-sent events or a chunked body); see
+  src/rag/streaming.py for emitting missing_fields entries from the stream.
+
+`base_url` can point at a local stub server for testing.
+
+Notes:
+- Do NOT hardcode any API keys. The key is read from GEMINI_API_KEY unless passed explicitly.
+- Endpoint/response shapes follow the skeleton in rag_app.gemini_generate; verify them against
+  the current Google Generative AI docs.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.rag import metrics
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta2"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` requests per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class LatencyStats:
+    """Per-request latency samples plus request/retry/error counters."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(round(q / 100.0 * (len(samples) - 1))))]
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            total = sum(self.latencies)
+            count = len(self.latencies)
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "mean_s": total / count if count else 0.0,
+            "p50_s": self.percentile(50),
+            "p95_s": self.percentile(95),
+            "p99_s": self.percentile(99),
+        }
+
+
+def parse_generation_response(data: Dict[str, Any]) -> str:
+    """Extract generated text; the exact shape depends on the API version."""
+    # Commonly generated text is under data['candidates'][0]['content'] or data['output'][0]['content']
+    if "candidates" in data and isinstance(data["candidates"], list) and data["candidates"]:
+        return data["candidates"][0].get("content", "")
+    if "output" in data and isinstance(data["output"], list) and data["output"]:
+        # sometimes content is nested differently
+        first = data["output"][0]
+        if isinstance(first, dict) and "content" in first:
+            return first["content"]
+    # fallback: return full json string
+    return json.dumps(data)
+
+
+def iter_stream_text(resp: requests.Response) -> Iterator[str]:
+    """Text pieces of a streamed response, as they arrive.
+
+    Server-sent events ("data: {...}" lines, blank line between events) are parsed like full
+    responses, one piece per event, up to an optional "data: [DONE]"; any other body is passed
+    through chunk by chunk.
+    """
+    resp.encoding = resp.encoding or "utf-8"
+    if not resp.headers.get("Content-Type", "").startswith("text/event-stream"):
+        for chunk in resp.iter_content(chunk_size=None, decode_unicode=True):
+            if chunk:
+                yield chunk
+        return
+    data: List[str] = []
+    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+        if line.startswith("data:"):
+            data.append(line[6:] if line.startswith("data: ") else line[5:])
+            continue
+        if line or not data:
+            # other fields (event:, id:, comments) carry no text
+            continue
+        payload, data = "\n".join(data), []
+        if payload == "[DONE]":
+            return
+        yield parse_generation_response(json.loads(payload))
+    if data and "\n".join(data) != "[DONE]":
+        yield parse_generation_response(json.loads("\n".join(data)))
+
+
+class GeminiClient:
+    """Reusable generation client.
+
+    Parameters:
+        api_key: optional, if None will read from environment variable GEMINI_API_KEY
+        model: target model name (default example `text-bison-001`)
+        base_url: API root; point it at a local stub server in tests
+        timeout: per-attempt HTTP timeout in seconds
+        max_retries: retries after the first attempt on 429/5xx and connection errors
+        backoff_base, backoff_max: exponential backoff parameters (seconds), full jitter applied
+        rate_limit: optional max requests/second across all threads
+        pool_size: HTTP connections kept alive (should be >= the concurrency you use)
+        temperature, max_output_tokens: generation parameters sent with every request
+        cache: optional ResponseCache; successful responses are stored and reused
+    """
+
+    def __init__(self, api_key: str = None, model: str = "text-bison-001", base_url: str = DEFAULT_BASE_URL,
+                 timeout: float = 30, max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 rate_limit: float = None, pool_size: int = 16, temperature: float = 0.2,
+                 max_output_tokens: int = 512, cache=None):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not self.api_key:
+            raise RuntimeError("GEMINI_API_KEY not set in environment. Set it and retry.")
+        self.model = model
+        self.endpoint = f"{base_url.rstrip('/')}/models/{model}:generate"
+        self.stream_endpoint = f"{base_url.rstrip('/')}/models/{model}:streamGenerate?alt=sse"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+        self.limiter = RateLimiter(rate_limit, burst=max(1, int(rate_limit))) if rate_limit else None
+        self.stats = LatencyStats()
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            # If using API key in header (Bearer) — adjust if your setup requires different auth.
+            "Authorization": f"Bearer {self.api_key}",
+        })
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _request(self, endpoint: str, body: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """POST with retries; raises on non-retryable or exhausted errors.
+
+        With stream=True the response is returned as soon as its headers arrive (the "http"
+        stage then covers only that part) and the caller must close it.
+        """
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            retry_after = None
+            try:
+                with metrics.stage("http", model=self.model, attempt=attempt):
+                    resp = self.session.post(endpoint, json=body, timeout=self.timeout, stream=stream)
+                metrics.inc("http_responses_total", status=resp.status_code)
+                if resp.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                    if resp.status_code >= 400:
+                        resp.close()
+                    resp.raise_for_status()
+                    return resp
+                retry_after = resp.headers.get("Retry-After")
+                resp.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            time.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+            self.stats.add_retry()
+            metrics.inc("http_retries_total")
+
+    def _post(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """POST with retries. Returns the decoded JSON; raises on non-retryable or exhausted errors."""
+        return self._request(self.endpoint, body).json()
+
+    def _body(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "prompt": {"text": prompt},
+            "temperature": self.temperature,
+            "maxOutputTokens": self.max_output_tokens,
+        }
+
+    def generate(self, prompt: str) -> str:
+        """Generate text for one prompt. Errors are returned as '[GENERATION ERROR] ...' strings."""
+        body = self._body(prompt)
+        if self.cache is not None:
+            cached = self.cache.get(self.model, prompt, self.temperature, self.max_output_tokens)
+            if cached is not None:
+                return cached
+        start = time.perf_counter()
+        try:
+            text = parse_generation_response(self._post(body))
+            latency = time.perf_counter() - start
+            self.stats.record(latency, True)
+            if self.cache is not None:
+                self.cache.put(self.model, prompt, self.temperature, self.max_output_tokens, text, latency)
+            return text
+        except Exception as e:
+            # surface the error so the caller can see what went wrong
+            self.stats.record(time.perf_counter() - start, False)
+            metrics.inc("generation_errors_total")
+            return f"[GENERATION ERROR] {str(e)}"
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """Yield the generated text piece by piece as the server sends it (see iter_stream_text).
+
+        Connection errors and 429/5xx before the response starts are retried as in generate();
+        errors after that are raised, since part of the text has already been yielded. A cached
+        response is yielded in one piece, and a completely received response is cached.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(self.model, prompt, self.temperature, self.max_output_tokens)
+            if cached is not None:
+                yield cached
+                return
+        start = time.perf_counter()
+        pieces: List[str] = []
+        try:
+            with self._request(self.stream_endpoint, self._body(prompt), stream=True) as resp:
+                for piece in iter_stream_text(resp):
+                    if not pieces:
+                        metrics.observe("first_chunk_seconds", time.perf_counter() - start)
+                    pieces.append(piece)
+                    yield piece
+        except GeneratorExit:
+            # the caller stopped reading: neither an error nor a complete response to cache
+            raise
+        except Exception:
+            self.stats.record(time.perf_counter() - start, False)
+            metrics.inc("generation_errors_total")
+            raise
+        latency = time.perf_counter() - start
+        self.stats.record(latency, True)
+        if self.cache is not None:
+            self.cache.put(self.model, prompt, self.temperature, self.max_output_tokens, "".join(pieces), latency)
+
+    def generate_many(self, prompts: List[str], max_concurrency: int = 8) -> List[str]:
+        """Generate for many prompts concurrently; results are in the same order as `prompts`."""
+        if not prompts:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts)))) as pool:
+            return list(pool.map(self.generate, prompts))
+
+    def close(self):
+        self.session.close()
+
+
+_clients: Dict[tuple, GeminiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str = None, model: str = "text-bison-001") -> GeminiClient:
+    """Shared client per (api key, model), so repeated calls reuse the same connection pool."""
+    key = (api_key or os.getenv("GEMINI_API_KEY"), model)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = GeminiClient(api_key=key[0], model=model)
+        return _clients[key]
@@ -0,0 +1,214 @@
+"""
+Vector index backends for SimpleRAG.
+- ExactIndex: brute-force cosine scan over every document (the default).
+- IVFIndex: inverted-file index with spherical k-means coarse clustering.
+  `nprobe` is the recall/latency knob: more probed lists -> higher recall, slower queries.
+- ShardedIndex (src/rag/sharded.py): exact search split over worker processes that share the
+  matrix through shared memory.
+
+Notes:
+- Embeddings are expected to be L2-normalized, so dot product == cosine similarity.
+- `embeddings` may be a float ndarray or an EmbeddingStore (src/rag/store.py); backends only use
+  `.shape`, `.dot(x)` and row indexing, so compact (float16/int8) stores are scored in place.
+- Every backend selects the top_k with np.argpartition (O(n)) instead of a full argsort.
+"""
+
+from typing import Dict, List, Tuple
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k highest scores, ordered by descending score."""
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise top_k_indices for a (n_queries, n_docs) score matrix."""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """Fraction of the exact top-k ids that the approximate search also returned."""
+    exact = set(int(i) for i in np.ravel(exact_ids))
+    if not exact:
+        return 1.0
+    found = set(int(i) for i in np.ravel(approx_ids))
+    return len(exact & found) / len(exact)
+
+
+def _group(assign: np.ndarray, n_lists: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows ordered by list (stable) and the bounds of every list in that order."""
+    order = np.argsort(assign, kind="stable")
+    return order, np.searchsorted(assign[order], np.arange(n_lists + 1))
+
+
+class ExactIndex:
+    """Brute-force search: scores the query against every row."""
+
+    def build(self, embeddings: np.ndarray):
+        pass
+
+    def add(self, embeddings: np.ndarray, start: int):
+        pass
+
+    def search(self, embeddings: np.ndarray, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (indices, scores) of the top_k rows for a single normalized query vector."""
+        sims = embeddings.dot(query)
+        idx = top_k_indices(sims, top_k)
+        return idx, sims[idx]
+
+    def search_batch(self, embeddings: np.ndarray, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores all queries with one GEMM. Returns (indices, scores), each of shape (n_queries, k)."""
+        sims = embeddings.dot(queries.T).T
+        idx = top_k_rows(sims, top_k)
+        return idx, np.take_along_axis(sims, idx, axis=1)
+
+
+class IVFIndex:
+    """Approximate search with an inverted file over k-means centroids.
+
+    Parameters:
+        n_lists: number of coarse clusters (default: ~sqrt(n_docs) at build time)
+        nprobe: number of clusters scanned per query (recall/latency knob)
+        n_iter: k-means iterations used when training the centroids
+        max_train: maximum number of rows sampled to train the centroids
+        seed: RNG seed so builds are reproducible
+        block_rows: rows scored against the centroids at a time, so assigning a large corpus
+            never materializes an (n_docs, n_lists) score matrix
+    """
+
+    def __init__(self, n_lists: int = None, nprobe: int = 8, n_iter: int = 10,
+                 max_train: int = 100_000, seed: int = 0, block_rows: int = 16_384):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.max_train = max_train
+        self.seed = seed
+        self.block_rows = block_rows
+        self.centroids: np.ndarray = None
+        self.lists: List[np.ndarray] = []
+
+    def _train(self, embeddings: np.ndarray) -> np.ndarray:
+        n = embeddings.shape[0]
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+        rng = np.random.default_rng(self.seed)
+        if n > self.max_train:
+            sample = embeddings[np.sort(rng.choice(n, self.max_train, replace=False))]
+        else:
+            sample = embeddings[:n]
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].astype(np.float32)
+        for _ in range(self.n_iter):
+            # sum the members of each list as contiguous slices of the sample sorted by list
+            order, bounds = _group(self._nearest(sample, centroids), n_lists)
+            members = sample[order]
+            for c in np.flatnonzero(bounds[1:] > bounds[:-1]):
+                centroids[c] = members[bounds[c]:bounds[c + 1]].sum(axis=0)
+            # spherical k-means: keep centroids on the unit sphere
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+        return centroids
+
+    def _nearest(self, embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Index of the closest centroid of every row, scored `block_rows` rows at a time."""
+        n = embeddings.shape[0]
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, self.block_rows):
+            stop = min(start + self.block_rows, n)
+            assign[start:stop] = np.argmax(np.asarray(embeddings[start:stop]) @ centroids.T, axis=1)
+        return assign
+
+    def _assign(self, embeddings: np.ndarray) -> np.ndarray:
+        return self._nearest(embeddings, self.centroids)
+
+    def build(self, embeddings: np.ndarray):
+        """Train centroids and (re)build the inverted lists for all rows."""
+        if embeddings.shape[0] == 0:
+            self.centroids = None
+            self.lists = []
+            return
+        self.centroids = self._train(embeddings)
+        order, bounds = _group(self._assign(embeddings), len(self.centroids))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+
+    def add(self, embeddings: np.ndarray, start: int):
+        """Assign new rows (global ids start..start+len-1) to their nearest list."""
+        if self.centroids is None:
+            # nothing trained yet; the caller passes only the new rows, which start at 0 here
+            self.build(embeddings)
+            return
+        assign = self._assign(embeddings)
+        ids = np.arange(start, start + embeddings.shape[0])
+        for c in np.unique(assign):
+            self.lists[c] = np.concatenate([self.lists[c], ids[assign == c]])
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Centroids and inverted lists for storage.write_index (none before the first build).
+
+        The lists are stored as one row array plus offsets (CSR style): list c is
+        ivf_rows[ivf_indptr[c]:ivf_indptr[c + 1]].
+        """
+        if self.centroids is None:
+            return {}
+        sizes = [len(rows) for rows in self.lists]
+        return {
+            "ivf_centroids": self.centroids,
+            "ivf_rows": np.concatenate(self.lists).astype(np.int64, copy=False),
+            "ivf_indptr": np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+        }
+
+    def restore(self, arrays: Dict[str, np.ndarray], n_rows: int) -> bool:
+        """Reuse arrays written by to_arrays() instead of retraining; the lists may stay memory-mapped.
+
+        Returns False (leaving the index untouched) when there are none, or they do not cover
+        exactly `n_rows` rows or do not match an explicit n_lists; the caller then calls build().
+        """
+        centroids, rows, indptr = (arrays.get(name) for name in ("ivf_centroids", "ivf_rows", "ivf_indptr"))
+        if centroids is None or rows is None or indptr is None:
+            return False
+        if len(rows) != n_rows or len(indptr) != len(centroids) + 1:
+            return False
+        if self.n_lists is not None and self.n_lists != min(len(centroids), n_rows):
+            return False
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.lists = [rows[indptr[c]:indptr[c + 1]] for c in range(len(centroids))]
+        return True
+
+    def search(self, embeddings: np.ndarray, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (indices, scores) of the approximate top_k rows for a single normalized query vector."""
+        if self.centroids is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        probe = top_k_indices(self.centroids @ query, self.nprobe)
+        candidates = np.concatenate([self.lists[c] for c in probe])
+        sims = embeddings[candidates] @ query
+        best = top_k_indices(sims, top_k)
+        return candidates[best], sims[best]
+
+    def search_batch(self, embeddings: np.ndarray, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-query IVF search; rows shorter than k (small probed lists) are padded with -1 / -inf."""
+        k = min(top_k, embeddings.shape[0])
+        all_idx = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        all_sims = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            idx, sims = self.search(embeddings, query, k)
+            all_idx[row, :len(idx)] = idx
+            all_sims[row, :len(sims)] = sims
+        return all_idx, all_sims
@@ -0,0 +1,269 @@
+"""
+Streaming ingestion into SimpleRAG.
+- iter_files(): lazily yields (source_id, text) from .txt files (one document per file) and
+  .jsonl files (one document per line).
+- read_json_objects(): JSON objects from a .json/.jsonl file or a directory of them (few-shot
+  examples, gap checklists).
+- ProvenanceColumns: the Chunk of every indexed row in three columns (source code, start, end),
+  so provenance costs 16 bytes per row and is saved with the index.
+- chunk_text(): character- or token-window chunking with overlap; every chunk keeps its character
+  offsets into the source document.
+- ingest(): chunks documents from any iterator, encodes them in bounded batches and appends them
+  to the index, so peak memory depends on batch_size (train_size for the first batch into an empty
+  index) and the largest document, not on corpus size.
+
+Usage:
+from src.rag.ingest import ingest, iter_files
+
+stats = ingest(rag, iter_files(["corpus/a.txt", "corpus/b.jsonl"]), window=800, overlap=100)
+print(stats.as_dict())
+hits = rag.retrieve("termination clause")
+print(rag.source_of(hits[0][0]))  # Chunk(source='corpus/a.txt', start=..., end=...)
+"""
+
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+
+from src.rag.store import grow_array
+
+_TOKEN_RE = re.compile(r"\S+")
+
+
+class Chunk(NamedTuple):
+    """Provenance of an indexed chunk: source document id and character offsets [start, end)."""
+    source: str
+    start: int
+    end: int
+
+
+class ProvenanceColumns:
+    """Chunk provenance of every row: an int32 code into `sources` (-1: none) and int64 offsets.
+
+    The columns may be read-only memory maps after SimpleRAG.load(); the first append copies them.
+    """
+
+    def __init__(self, codes: np.ndarray = None, starts: np.ndarray = None, ends: np.ndarray = None,
+                 sources: List[str] = None):
+        self._codes = np.zeros(0, dtype=np.int32) if codes is None else codes
+        self._starts = np.zeros(0, dtype=np.int64) if starts is None else starts
+        self._ends = np.zeros(0, dtype=np.int64) if ends is None else ends
+        self.count = len(self._codes)
+        self.sources = list(sources or [])
+        self._lookup = {source: i for i, source in enumerate(self.sources)}
+
+    @classmethod
+    def empty(cls, count: int) -> "ProvenanceColumns":
+        """Columns for `count` rows without provenance."""
+        return cls(np.full(count, -1, dtype=np.int32), np.zeros(count, dtype=np.int64),
+                   np.zeros(count, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def encode(self, refs: Optional[List[Any]], n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Columns for n new rows; refs are Chunk / (source, start, end) or None (refs=None: no provenance)."""
+        codes = np.full(n, -1, dtype=np.int32)
+        starts = np.zeros(n, dtype=np.int64)
+        ends = np.zeros(n, dtype=np.int64)
+        for i, ref in enumerate(refs or ()):
+            if ref is None:
+                continue
+            if not isinstance(ref, tuple) or len(ref) != 3:
+                raise ValueError(f"Provenance must be Chunk(source, start, end) or None, got {ref!r}")
+            source = str(ref[0])
+            code = self._lookup.get(source)
+            if code is None:
+                code = self._lookup[source] = len(self.sources)
+                self.sources.append(source)
+            codes[i], starts[i], ends[i] = code, int(ref[1]), int(ref[2])
+        return codes, starts, ends
+
+    def extend(self, encoded: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        codes, starts, ends = encoded
+        n = self.count + len(codes)
+        self._codes = grow_array(self._codes, n, -1)
+        self._starts = grow_array(self._starts, n, 0)
+        self._ends = grow_array(self._ends, n, 0)
+        self._codes[self.count:n], self._starts[self.count:n], self._ends[self.count:n] = codes, starts, ends
+        self.count = n
+
+    def get(self, row: Optional[int]) -> Optional[Chunk]:
+        """Chunk of a row (None for rows without provenance, or row=None)."""
+        if row is None or row >= self.count:
+            return None
+        code = int(self._codes[row])
+        if code < 0:
+            return None
+        return Chunk(self.sources[code], int(self._starts[row]), int(self._ends[row]))
+
+    def take(self, rows: np.ndarray) -> "ProvenanceColumns":
+        """New columns holding only `rows`, in order (used by compaction)."""
+        return ProvenanceColumns(self._codes[:self.count][rows], self._starts[:self.count][rows],
+                                 self._ends[:self.count][rows], self.sources)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays for storage.write_index (none when no row has provenance)."""
+        if not self.sources:
+            return {}
+        return {
+            "prov_source": self._codes[:self.count],
+            "prov_start": self._starts[:self.count],
+            "prov_end": self._ends[:self.count],
+            "prov_sources": np.array(self.sources, dtype=str),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], count: int) -> "ProvenanceColumns":
+        """Columns written by to_arrays(); rows without any (older indexes) get no provenance."""
+        if arrays.get("prov_source") is None:
+            return cls.empty(count)
+        return cls(arrays["prov_source"], arrays["prov_start"], arrays["prov_end"],
+                   [str(source) for source in arrays["prov_sources"]])
+
+
+def iter_files(paths: Iterable[str], text_field: str = "text", id_field: str = "id") -> Iterator[Tuple[str, str]]:
+    """Yield (source_id, text) for each document in .txt / .jsonl files, one file at a time.
+
+    .txt: the whole file is one document and its path is the source id.
+    .jsonl: each line is a JSON object; `text_field` is the document, `id_field` (if present) the
+    source id, otherwise "<path>:<line number>".
+    """
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".jsonl":
+            with open(path, encoding="utf-8") as f:
+                for lineno, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    yield str(record.get(id_field, f"{path}:{lineno}")), record[text_field]
+        elif ext == ".txt":
+            with open(path, encoding="utf-8") as f:
+                yield path, f.read()
+        else:
+            raise ValueError(f"Unsupported file type for ingestion: {path} (expected .txt or .jsonl)")
+
+
+def read_json_objects(path: str) -> List[Dict[str, Any]]:
+    """Objects of a .json file (one object or a list), a .jsonl file (one per line) or, for a
+    directory, of every .json/.jsonl file inside it in name order."""
+    if os.path.isdir(path):
+        objects = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith((".json", ".jsonl")):
+                objects.extend(read_json_objects(os.path.join(path, name)))
+        return objects
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def chunk_text(text: str, window: int = 1000, overlap: int = 200, unit: str = "char") -> Iterator[Tuple[int, int, str]]:
+    """Split text into overlapping windows. Yields (start, end, chunk) with character offsets.
+
+    unit="char": windows of `window` characters.
+    unit="token": windows of `window` whitespace-delimited tokens (offsets still in characters).
+    """
+    if overlap >= window:
+        raise ValueError("overlap must be smaller than window")
+    step = window - overlap
+    if unit == "char":
+        if not text:
+            return
+        for start in range(0, len(text), step):
+            end = min(start + window, len(text))
+            yield start, end, text[start:end]
+            if end == len(text):
+                break
+    elif unit == "token":
+        spans = [m.span() for m in _TOKEN_RE.finditer(text)]
+        for first in range(0, len(spans), step):
+            last = min(first + window, len(spans))
+            start, end = spans[first][0], spans[last - 1][1]
+            yield start, end, text[start:end]
+            if last == len(spans):
+                break
+    else:
+        raise ValueError(f"Unknown chunk unit {unit!r}; expected 'char' or 'token'")
+
+
+class IngestStats:
+    """Progress/throughput counters for an ingest() run."""
+
+    def __init__(self):
+        self.docs = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "docs": self.docs,
+            "chunks": self.chunks,
+            "seconds": self.seconds,
+            "docs_per_sec": self.docs_per_sec,
+            "chunks_per_sec": self.chunks_per_sec,
+        }
+
+
+def ingest(rag, documents: Iterable[Union[str, Tuple[str, str]]], window: int = 1000, overlap: int = 200,
+           unit: str = "char", batch_size: int = 256, train_size: int = 8192, rebuild_index: bool = True,
+           progress: Callable[[IngestStats], None] = None) -> IngestStats:
+    """Chunk, encode and append documents to `rag` incrementally.
+
+    Parameters:
+        rag: SimpleRAG instance to append to (existing documents are kept)
+        documents: iterator of (source_id, text) pairs or plain strings (source id "doc-<n>")
+        window, overlap, unit: chunking parameters, see chunk_text()
+        batch_size: chunks per encoder call / add_documents call
+        train_size: chunks in the first batch when `rag` is empty; those rows fix the int8 scale
+            of compact storage and train an approximate index, so they should be representative
+        rebuild_index: call rag.rebuild_index() at the end, so an approximate index (IVFIndex)
+            is retrained on the whole corpus instead of only the first batch
+        progress: optional callback invoked with the running IngestStats after every batch
+    """
+    stats = IngestStats()
+    texts: List[str] = []
+    refs: List[Chunk] = []
+    limit = max(batch_size, train_size) if not rag.docs else batch_size
+
+    def flush():
+        nonlocal limit
+        rag.add_documents(texts, provenance=refs)
+        limit = batch_size
+        stats.chunks += len(texts)
+        texts.clear()
+        refs.clear()
+        if progress is not None:
+            progress(stats)
+
+    for n, item in enumerate(documents):
+        source, text = item if isinstance(item, tuple) else (f"doc-{n}", item)
+        for start, end, chunk in chunk_text(text, window, overlap, unit):
+            texts.append(chunk)
+            refs.append(Chunk(source, start, end))
+            if len(texts) >= limit:
+                flush()
+        stats.docs += 1
+    if texts:
+        flush()
+    if rebuild_index:
+        rag.rebuild_index()
+    return stats
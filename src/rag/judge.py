@@ -1,5 +1,7 @@
 import json
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Iterable, Tuple, List
+
+from src.rag import metrics
 
 # A human-readable judge prompt (if you wanted to call an LLM to judge).
 # Parameters considered while writing this prompt:
@@ -22,13 +24,19 @@ Scoring rules (used by the automated judge):
 Normalize by the maximum possible points.
 """
 
-def _get_names(j: Dict[str, Any]) -> List[str]:
-    return [f.get("name", "").lower() for f in j.get("missing_fields", [])]
+def _prepare(j: Dict[str, Any]) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+    """Lowercase every name once; index each name to its first item (what a linear scan would find)."""
+    items = j.get("missing_fields", [])
+    names = [f.get("name", "").lower() for f in items]
+    index: Dict[str, Dict[str, Any]] = {}
+    for name, item in zip(names, items):
+        index.setdefault(name, item)
+    return names, index
 
-def judge_compare(predicted: Dict[str, Any], expected: Dict[str, Any]) -> Dict[str, Any]:
-    """Deterministic judge that returns score, pass, and details."""
-    exp_names = _get_names(expected)
-    pred_names = _get_names(predicted)
+def _score(predicted: Dict[str, Any], expected: Dict[str, Any],
+           exp_prepared: Tuple[List[str], Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    exp_names, exp_index = exp_prepared
+    _, pred_index = _prepare(predicted)
 
     max_points = len(exp_names) * 1.0 + 0.2  # 1.0 per expected item (0.6+0.2) + 0.2 for summary/remediation.
     points = 0.0
@@ -36,13 +44,12 @@ def judge_compare(predicted: Dict[str, Any], expected: Dict[str, Any]) -> Dict[s
 
     for name in exp_names:
         item_detail = {"name": name, "matched_name": False, "evidence_partial": False, "points": 0.0}
-        if name in pred_names:
+        if name in pred_index:
             item_detail["matched_name"] = True
             item_detail["points"] += 0.6
             # check evidence substring overlap as simple heuristic
-            # find expected evidence
-            exp_item = next((it for it in expected["missing_fields"] if it["name"].lower() == name), None)
-            pred_item = next((it for it in predicted.get("missing_fields", []) if it["name"].lower() == name), None)
+            exp_item = exp_index[name]
+            pred_item = pred_index[name]
             if exp_item and pred_item:
                 exp_e = (exp_item.get("evidence_span") or "").lower()
                 pred_e = (pred_item.get("evidence_span") or "").lower()
@@ -55,15 +62,44 @@ def judge_compare(predicted: Dict[str, Any], expected: Dict[str, Any]) -> Dict[s
     # summary/remediation simple check
     summary_bonus = 0.0
     if expected.get("summary") and predicted.get("summary"):
-        if expected["summary"].split()[0:3] == predicted["summary"].split()[0:3]:
+        exp_words = expected["summary"].split()
+        pred_words = predicted["summary"].split()
+        if exp_words[0:3] == pred_words[0:3]:
             summary_bonus = 0.2
         else:
             # small credit if they share any word
-            if set(expected["summary"].split()) & set(predicted["summary"].split()):
+            if set(exp_words) & set(pred_words):
                 summary_bonus = 0.1
     points += summary_bonus
 
     score = min(1.0, points / max_points) if max_points > 0 else 1.0
     passed = score >= 0.8
 
-    return {"score": score, "pass": passed, "points": points, "max_points": max_points, "details": details}
\ No newline at end of file
+    return {"score": score, "pass": passed, "points": points, "max_points": max_points, "details": details}
+
+@metrics.timed("judge")
+def judge_compare(predicted: Dict[str, Any], expected: Dict[str, Any]) -> Dict[str, Any]:
+    """Deterministic judge that returns score, pass, and details.
+
+    Names are lowercased once and indexed per record, so scoring is linear in the number of
+    missing_fields instead of O(n*m).
+    """
+    return _score(predicted, expected, _prepare(expected))
+
+@metrics.timed("judge_batch")
+def judge_batch(pairs: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Score many (predicted, expected) pairs; same results as calling judge_compare on each.
+
+    When consecutive pairs share the same expected object (e.g. one reference scored against
+    several predictions), it is indexed only once. Nothing is memoized beyond the previous pair,
+    so a batch of distinct references costs no more than judge_compare in a loop.
+    """
+    last_expected, last_prepared = None, None
+    results = []
+    append, prepare, score = results.append, _prepare, _score  # local names: this loop is the hot path
+    for predicted, expected in pairs:
+        if expected is not last_expected:
+            last_expected, last_prepared = expected, prepare(expected)
+        append(score(predicted, expected, last_prepared))
+    metrics.observe("batch_size", len(results), stage="judge_batch")
+    return results
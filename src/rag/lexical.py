@@ -0,0 +1,189 @@
+"""
+Lexical (BM25) inverted index for SimpleRAG.
+
+Exact identifiers (invoice numbers, drug names, clause IDs) are matched poorly by sentence
+embeddings; BM25 over the same rows catches them. SimpleRAG uses it for lexical-only search,
+hybrid search (reciprocal rank fusion with the dense results) and as a cheap candidate generator
+so dense scoring runs on a shortlist only.
+
+Postings are kept compact, CSR style: one int32 array of row ids and one of term frequencies,
+sliced per term by `indptr`. add() only appends to a pending list; on the next search the pending
+postings become a new segment, and segments are merged LSM style (the newest two whenever the
+older is less than `merge_factor` times larger). Segment sizes therefore shrink geometrically,
+there are O(log n) of them, and every posting is rewritten O(log n) times in total, so streaming
+adds interleaved with searches stay cheap. Searches score every segment.
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+import numpy as np
+
+from src.rag.index import top_k_indices
+from src.rag.store import grow_array
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens ("INV-2024-001" -> ["inv", "2024", "001"])."""
+    return _WORD_RE.findall(text.lower())
+
+
+class _Segment(NamedTuple):
+    """Postings of a contiguous range of rows; terms added after it was built have no slice."""
+    indptr: np.ndarray
+    rows: np.ndarray
+    tfs: np.ndarray
+
+    @classmethod
+    def build(cls, terms: np.ndarray, rows: np.ndarray, tfs: np.ndarray, n_terms: int) -> "_Segment":
+        # stable: rows stay ascending within each term
+        order = np.argsort(terms, kind="stable")
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=n_terms))])
+        return cls(indptr, rows[order], tfs[order])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def terms(self) -> np.ndarray:
+        """Term id of every posting."""
+        return np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        if term_id + 1 >= len(self.indptr):
+            return self.rows[:0], self.tfs[:0]
+        lo, hi = self.indptr[term_id], self.indptr[term_id + 1]
+        return self.rows[lo:hi], self.tfs[lo:hi]
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.rows.nbytes + self.tfs.nbytes
+
+
+def _concat(segments: List[_Segment], n_terms: int) -> _Segment:
+    """One segment with the postings of `segments` (given oldest first)."""
+    return _Segment.build(np.concatenate([seg.terms() for seg in segments]),
+                          np.concatenate([seg.rows for seg in segments]),
+                          np.concatenate([seg.tfs for seg in segments]), n_terms)
+
+
+class BM25Index:
+    """Okapi BM25 over rows 0..n-1.
+
+    Parameters:
+        k1: term-frequency saturation
+        b: document-length normalization
+        merge_factor: size ratio kept between consecutive segments (see the module docstring)
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, merge_factor: int = 4):
+        self.k1 = k1
+        self.b = b
+        self.merge_factor = merge_factor
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.vocab: Dict[str, int] = {}
+        # oldest first; every segment holds rows after those of the previous one
+        self._segments: List[_Segment] = []
+        self._doc_len = np.zeros(0, dtype=np.int32)
+        self._n_rows = 0
+        self._total_len = 0
+        self._pending_terms: List[int] = []
+        self._pending_rows: List[int] = []
+        self._pending_tfs: List[int] = []
+        self._pending_len: List[int] = []
+
+    def __len__(self) -> int:
+        return self._n_rows + len(self._pending_len)
+
+    def add(self, texts: Iterable[str], start: int):
+        """Index texts as rows start, start+1, ... (rows must be appended in order)."""
+        if start != len(self):
+            raise ValueError(f"BM25Index rows must be appended in order: expected start={len(self)}, got {start}")
+        for row, text in enumerate(texts, start):
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                term_id = self.vocab.setdefault(term, len(self.vocab))
+                self._pending_terms.append(term_id)
+                self._pending_rows.append(row)
+                self._pending_tfs.append(tf)
+            self._pending_len.append(sum(counts.values()))
+
+    def _merge(self):
+        """Turn the pending postings into a segment (concurrent searches may trigger it)."""
+        with self._lock:
+            if self._pending_len:
+                self._merge_pending()
+
+    def _merge_pending(self):
+        n_terms = len(self.vocab)
+        self._segments.append(_Segment.build(np.asarray(self._pending_terms, dtype=np.int64),
+                                             np.asarray(self._pending_rows, dtype=np.int32),
+                                             np.asarray(self._pending_tfs, dtype=np.int32), n_terms))
+        while len(self._segments) > 1 and len(self._segments[-2]) < self.merge_factor * len(self._segments[-1]):
+            self._segments[-2:] = [_concat(self._segments[-2:], n_terms)]
+        n = self._n_rows + len(self._pending_len)
+        self._doc_len = grow_array(self._doc_len, n, 0)
+        self._doc_len[self._n_rows:n] = self._pending_len
+        self._n_rows = n
+        self._total_len += sum(self._pending_len)
+        self._pending_terms, self._pending_rows, self._pending_tfs, self._pending_len = [], [], [], []
+
+    def take(self, rows: np.ndarray) -> "BM25Index":
+        """New index over only `rows` (renumbered 0..len(rows)-1), remapped without re-tokenizing."""
+        self._merge()
+        remap = np.full(self._n_rows, -1, dtype=np.int64)
+        remap[rows] = np.arange(len(rows))
+        out = BM25Index(self.k1, self.b, self.merge_factor)
+        out.vocab = dict(self.vocab)
+        out._doc_len = self._doc_len[rows]
+        out._n_rows = len(rows)
+        out._total_len = int(out._doc_len.sum())
+        if self._segments:
+            merged = _concat(self._segments, len(self.vocab))
+            kept = remap[merged.rows] >= 0
+            out._segments = [_Segment.build(merged.terms()[kept], remap[merged.rows[kept]].astype(np.int32),
+                                            merged.tfs[kept], len(self.vocab))]
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        self._merge()
+        return sum(seg.nbytes for seg in self._segments) + self._doc_len[:self._n_rows].nbytes
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row for the query (0 for rows sharing no term with it)."""
+        self._merge()
+        n = self._n_rows
+        out = np.zeros(n, dtype=np.float32)
+        if n == 0:
+            return out
+        avg_len = max(self._total_len / n, 1e-9)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            postings = [seg.postings(term_id) for seg in self._segments]
+            df = sum(len(rows) for rows, _ in postings)
+            if not df:
+                continue
+            idf = np.log1p((n - df + 0.5) / (df + 0.5))
+            for rows, tf in postings:
+                tf = tf.astype(np.float32)
+                norm = self.k1 * (1.0 - self.b + self.b * self._doc_len[rows] / avg_len)
+                # each row appears once per term (and in one segment), so fancy-index accumulation is safe
+                out[rows] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return out
+
+    def search(self, query: str, top_k: int, mask: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of the top_k rows with a positive score, limited to `mask` when given."""
+        sims = self.scores(query)
+        if mask is not None:
+            sims[~mask] = 0.0
+        hits = np.flatnonzero(sims > 0)
+        best = top_k_indices(sims[hits], top_k)
+        return hits[best], sims[hits[best]]
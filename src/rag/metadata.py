@@ -0,0 +1,278 @@
+"""
+Columnar document metadata, namespaces and filter compilation for SimpleRAG.
+
+Each metadata key is one column over all rows:
+- numeric (int / float / date / datetime): float64 array, NaN where a row has no value.
+  Dates and datetimes are stored as POSIX timestamps (naive values are taken as UTC), so range
+  filters on them work like numbers.
+- category (str / bool): int32 codes into a list of distinct values, -1 where a row has no value.
+  Categories are saved in the JSON index header, so values must be JSON scalars (str, int,
+  float, bool); lists, tuples, dicts and other objects are rejected with ValueError.
+The namespace of a row is the category column NAMESPACE_FIELD.
+
+Filters are dicts in the MongoDB style and compile to one boolean mask over all rows:
+    {"client": "acme"}                                equality
+    {"year": {"$gte": 2020, "$lt": 2024}}             range (all conditions must hold)
+    {"status": {"$in": ["open", "pending"]}}          membership ($nin for the opposite)
+    {"signed": {"$exists": False}}                    presence of a value
+    {"$or": [{...}, {...}]}, {"$and": [...]}, {"$not": {...}}
+Top-level keys are combined with AND. Rows without a value never match $eq/$in/range operators
+and always match $ne/$nin.
+"""
+
+import datetime as _dt
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from src.rag.store import grow_array
+
+DEFAULT_NAMESPACE = "default"
+NAMESPACE_FIELD = "_namespace"
+
+FIELD_OPERATORS = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$exists")
+_RANGE_OPERATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def _is_numeric(value: Any) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating, _dt.date)) and not isinstance(value, bool)
+
+
+def _is_json_scalar(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool))
+
+
+def _as_number(value: Any) -> float:
+    if isinstance(value, _dt.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=_dt.timezone.utc)
+        return value.timestamp()
+    if isinstance(value, _dt.date):
+        return _dt.datetime(value.year, value.month, value.day, tzinfo=_dt.timezone.utc).timestamp()
+    if not _is_numeric(value):
+        raise ValueError(f"Expected a number, date or datetime for a numeric column, got {value!r}")
+    return float(value)
+
+
+class _NumericColumn:
+    kind = "numeric"
+
+    def __init__(self, data: np.ndarray):
+        self._buf = np.asarray(data, dtype=np.float64)
+        self.count = len(data)
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._buf[:self.count]
+
+    def encode(self, values: List[Any]) -> np.ndarray:
+        return np.array([np.nan if v is None else _as_number(v) for v in values], dtype=np.float64)
+
+    def extend(self, encoded: np.ndarray):
+        self._buf = grow_array(self._buf, self.count + len(encoded), np.nan)
+        self._buf[self.count:self.count + len(encoded)] = encoded
+        self.count += len(encoded)
+
+    def value(self, row: int) -> Optional[float]:
+        v = self._buf[row]
+        return None if np.isnan(v) else float(v)
+
+    def compare(self, op: str, operand: Any) -> np.ndarray:
+        data = self.data
+        if op == "$exists":
+            return ~np.isnan(data) if operand else np.isnan(data)
+        if op in ("$in", "$nin"):
+            found = np.isin(data, [_as_number(v) for v in operand])
+            return found if op == "$in" else ~found
+        if op in ("$eq", "$ne"):
+            equal = data == _as_number(operand)
+            return equal if op == "$eq" else ~equal
+        return _RANGE_OPERATORS[op](data, _as_number(operand))
+
+    def take(self, rows: np.ndarray) -> "_NumericColumn":
+        return _NumericColumn(self.data[rows])
+
+    def spec(self) -> Dict[str, Any]:
+        return {"kind": self.kind}
+
+
+class _CategoryColumn:
+    kind = "category"
+
+    def __init__(self, codes: np.ndarray, categories: List[Any]):
+        self._buf = np.asarray(codes, dtype=np.int32)
+        self.count = len(codes)
+        self.categories = list(categories)
+        self.lookup = {v: i for i, v in enumerate(self.categories)}
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._buf[:self.count]
+
+    def code(self, value: Any) -> int:
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+    def encode(self, values: List[Any]) -> np.ndarray:
+        # checked before any value gets a code: categories are saved in the JSON header
+        for v in values:
+            if v is not None and not _is_json_scalar(v):
+                raise ValueError(f"Category values must be str, int, float or bool, got {v!r}")
+        return np.array([-1 if v is None else self.code(v) for v in values], dtype=np.int32)
+
+    def extend(self, encoded: np.ndarray):
+        self._buf = grow_array(self._buf, self.count + len(encoded), -1)
+        self._buf[self.count:self.count + len(encoded)] = encoded
+        self.count += len(encoded)
+
+    def value(self, row: int) -> Any:
+        code = self._buf[row]
+        return None if code < 0 else self.categories[code]
+
+    def compare(self, op: str, operand: Any) -> np.ndarray:
+        codes = self.data
+        if op == "$exists":
+            return codes >= 0 if operand else codes < 0
+        if op in ("$in", "$nin"):
+            wanted = [self.lookup[v] for v in operand if v in self.lookup]
+            found = np.isin(codes, wanted)
+            return found if op == "$in" else ~found
+        if op in ("$eq", "$ne"):
+            code = self.lookup.get(operand)
+            equal = codes == code if code is not None else np.zeros(self.count, dtype=bool)
+            return equal if op == "$eq" else ~equal
+        # range over categories: evaluate once per distinct value, then look rows up by code
+        try:
+            table = np.array([_RANGE_OPERATORS[op](v, operand) for v in self.categories] + [False], dtype=bool)
+        except TypeError as e:
+            raise ValueError(f"Cannot apply {op} with {operand!r} to this column: {e}")
+        return table[codes]
+
+    def take(self, rows: np.ndarray) -> "_CategoryColumn":
+        return _CategoryColumn(self.data[rows], self.categories)
+
+    def spec(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "categories": self.categories}
+
+
+class MetadataColumns:
+    """Per-row metadata dicts stored column by column."""
+
+    def __init__(self):
+        self.columns: Dict[str, Any] = {}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, records: List[Optional[Dict[str, Any]]]):
+        """Append one metadata dict (or None) per new row.
+
+        Raises ValueError (leaving every column unchanged) if a value does not fit its column's kind.
+        """
+        names = dict.fromkeys(self.columns)
+        for record in records:
+            if record:
+                names.update(dict.fromkeys(record))
+        pending = []
+        for name in names:
+            values = [record.get(name) if record else None for record in records]
+            column = self.columns.get(name)
+            if column is None:
+                first = next((v for v in values if v is not None), None)
+                if first is None:
+                    continue
+                if _is_numeric(first):
+                    column = _NumericColumn(np.full(self.count, np.nan))
+                else:
+                    column = _CategoryColumn(np.full(self.count, -1), [])
+            try:
+                pending.append((name, column, column.encode(values)))
+            except ValueError as e:
+                raise ValueError(f"Metadata field {name!r}: {e}")
+        for name, column, encoded in pending:
+            self.columns[name] = column
+            column.extend(encoded)
+        self.count += len(records)
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Metadata of one row (numeric columns come back as floats; missing keys are left out)."""
+        out = {}
+        for name, column in self.columns.items():
+            value = column.value(row)
+            if value is not None:
+                out[name] = value
+        return out
+
+    def values(self, name: str) -> List[Any]:
+        """Distinct values of a category column (e.g. the namespaces)."""
+        column = self.columns.get(name)
+        return list(column.categories) if isinstance(column, _CategoryColumn) else []
+
+    def mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Compile a filter (see the module docstring) to a boolean mask over all rows."""
+        out = np.ones(self.count, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for sub in condition:
+                    out &= self.mask(sub)
+            elif key == "$or":
+                any_match = np.zeros(self.count, dtype=bool)
+                for sub in condition:
+                    any_match |= self.mask(sub)
+                out &= any_match
+            elif key == "$not":
+                out &= ~self.mask(condition)
+            elif key.startswith("$"):
+                raise ValueError(f"Unknown filter operator {key!r}")
+            else:
+                out &= self._field_mask(key, condition)
+        return out
+
+    def _field_mask(self, name: str, condition: Any) -> np.ndarray:
+        ops = condition if isinstance(condition, dict) else {"$eq": condition}
+        column = self.columns.get(name)
+        out = np.ones(self.count, dtype=bool)
+        for op, operand in ops.items():
+            if op not in FIELD_OPERATORS:
+                raise ValueError(f"Unknown filter operator {op!r} for field {name!r}")
+            if column is not None:
+                out &= column.compare(op, operand)
+            elif not (op in ("$ne", "$nin") or (op == "$exists" and not operand)):
+                # no row has this field
+                out[:] = False
+        return out
+
+    def take(self, rows: np.ndarray) -> "MetadataColumns":
+        """New columns holding only `rows`, in order (used by compaction)."""
+        columns = MetadataColumns()
+        columns.count = len(rows)
+        columns.columns = {name: column.take(rows) for name, column in self.columns.items()}
+        return columns
+
+    def to_arrays(self) -> Tuple[List[Dict[str, Any]], Dict[str, np.ndarray]]:
+        """(spec, arrays) for storage.write_index: column specs go in the header, data in .npy files."""
+        spec, arrays = [], {}
+        for i, (name, column) in enumerate(self.columns.items()):
+            spec.append(dict(column.spec(), name=name, array=f"meta_{i}"))
+            arrays[f"meta_{i}"] = column.data
+        return spec, arrays
+
+    @classmethod
+    def from_arrays(cls, spec: Iterable[Dict[str, Any]], arrays: Dict[str, np.ndarray], count: int) -> "MetadataColumns":
+        columns = cls()
+        columns.count = count
+        for entry in spec:
+            data = arrays[entry["array"]]  # may be a read-only memory map; the first append copies it
+            if entry["kind"] == "numeric":
+                columns.columns[entry["name"]] = _NumericColumn(data)
+            else:
+                columns.columns[entry["name"]] = _CategoryColumn(data, entry["categories"])
+        return columns
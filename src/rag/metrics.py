@@ -0,0 +1,281 @@
+"""
+Per-stage timing and counters for the pipeline. Disabled by default.
+
+Instrumented stages (histogram `stage_seconds{stage=...}`):
+- "embed": SimpleRAG._embed (with the batch size; EmbeddingCache hits/misses are counted too)
+- "search": SimpleRAG.retrieve / retrieve_batch, after the query is embedded
+- "prompt": every prompt builder in src/prompting/prompts.py
+- "http": each POST attempt in GeminiClient (behind gemini_generate); ResponseCache hits/misses
+  and retries are counted
+- "judge": judge_compare, one sample per record ("judge_batch": judge_batch, one per batch)
+
+While disabled every hook is a single attribute check. Usage:
+    from src.rag import metrics
+    metrics.enable()
+    ...run the pipeline...
+    print(metrics.to_prometheus())          # Prometheus text exposition format
+    json.dump(metrics.snapshot(), f)        # or a JSON snapshot
+    metrics.add_tracer(lambda span: ...)    # called with a Span after every stage
+
+Latency histograms keep count and sum exactly; p50/p95/p99 come from the most recent
+`window` samples. The registry is per process: work done in a process pool is timed in the
+worker and recorded in the parent with record_stage() (as src/rag/evaluate.py does for judging).
+"""
+
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Span(NamedTuple):
+    """One finished stage, as passed to tracers."""
+    stage: str
+    start: float  # time.time() when the stage started
+    seconds: float
+    attributes: Dict[str, Any]
+    error: Optional[BaseException]
+
+
+class Histogram:
+    """Count and sum of all observations plus a window of recent samples for quantiles."""
+
+    def __init__(self, window: int = 4096):
+        self.count = 0
+        self.sum = 0.0
+        self.samples: "deque[float]" = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        samples = sorted(self.samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+
+    def summary(self) -> Dict[str, float]:
+        out = {"count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else 0.0}
+        for q in QUANTILES:
+            out[f"p{int(q * 100)}"] = self.quantile(q)
+        return out
+
+
+def _key(name: str, labels: Dict[str, Any]) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Stage:
+    """Context manager timing one stage (only created while the registry is enabled)."""
+
+    __slots__ = ("registry", "name", "attributes", "start", "wall")
+
+    def __init__(self, registry: "Registry", name: str, attributes: Dict[str, Any]):
+        self.registry = registry
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> "_Stage":
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.record_stage(self.name, time.perf_counter() - self.start, self.wall, exc, **self.attributes)
+        return False
+
+
+class Registry:
+    """Counters, histograms and tracers. Use the module-level functions for the shared registry."""
+
+    def __init__(self, window: int = 4096):
+        self.enabled = False
+        self.window = window
+        self.counters: Dict[LabelKey, float] = {}
+        self.histograms: Dict[LabelKey, Histogram] = {}
+        self.tracers: List[Callable[[Span], None]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(self.window)
+            hist.observe(value)
+
+    def stage(self, name: str, batch_size: int = None, **attributes):
+        """Time a block as stage `name`; batch_size (if given) is recorded in `batch_size{stage=...}`.
+
+        Extra keyword attributes are passed to tracers only (they never become metric labels).
+        """
+        if not self.enabled:
+            return nullcontext()
+        if batch_size is not None:
+            self.observe("batch_size", batch_size, stage=name)
+            attributes["batch_size"] = batch_size
+        return _Stage(self, name, attributes)
+
+    def record_stage(self, name: str, seconds: float, wall: float = None, exc: BaseException = None,
+                     **attributes):
+        """Record a stage that was timed elsewhere (e.g. in a worker process); wall defaults to now - seconds."""
+        if not self.enabled:
+            return
+        self.observe("stage_seconds", seconds, stage=name)
+        if exc is not None:
+            self.inc("stage_errors_total", stage=name)
+        if self.tracers:
+            span = Span(name, time.time() - seconds if wall is None else wall, seconds, attributes, exc)
+            for tracer in list(self.tracers):
+                tracer(span)
+
+    def cache_access(self, cache: str, hits: int, misses: int):
+        """Count cache lookups; hit rates appear in snapshot()."""
+        if not self.enabled:
+            return
+        if hits:
+            self.inc("cache_requests_total", hits, cache=cache, result="hit")
+        if misses:
+            self.inc("cache_requests_total", misses, cache=cache, result="miss")
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def cache_hit_rates(self) -> Dict[str, float]:
+        totals: Dict[str, List[float]] = {}
+        for (name, labels), value in self.counters.items():
+            if name != "cache_requests_total":
+                continue
+            label = dict(labels)
+            hits_total = totals.setdefault(label["cache"], [0.0, 0.0])
+            hits_total[0] += value if label["result"] == "hit" else 0
+            hits_total[1] += value
+        return {cache: hits / total for cache, (hits, total) in totals.items() if total}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable view of every counter and histogram."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [dict(hist.summary(), name=name, labels=dict(labels))
+                          for (name, labels), hist in sorted(self.histograms.items())]
+            hit_rates = self.cache_hit_rates()
+        return {"enabled": self.enabled, "counters": counters, "histograms": histograms,
+                "cache_hit_rate": hit_rates}
+
+    def to_prometheus(self, prefix: str = "pipeline") -> str:
+        """Prometheus text exposition format; histograms are exported as summaries."""
+        lines: List[str] = []
+        typed = set()
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{prefix}_{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{_labels(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                metric = f"{prefix}_{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} summary")
+                for q in QUANTILES:
+                    lines.append(f"{metric}{_labels(labels + (('quantile', str(q)),))} {hist.quantile(q)}")
+                lines.append(f"{metric}_sum{_labels(labels)} {hist.sum}")
+                lines.append(f"{metric}_count{_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+
+
+def enable():
+    REGISTRY.enabled = True
+
+
+def disable():
+    REGISTRY.enabled = False
+
+
+def enabled() -> bool:
+    return REGISTRY.enabled
+
+
+def reset():
+    REGISTRY.reset()
+
+
+def stage(name: str, batch_size: int = None, **attributes):
+    return REGISTRY.stage(name, batch_size, **attributes)
+
+
+def inc(name: str, value: float = 1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+def record_stage(name: str, seconds: float, wall: float = None, exc: BaseException = None, **attributes):
+    REGISTRY.record_stage(name, seconds, wall, exc, **attributes)
+
+
+def cache_access(cache: str, hits: int, misses: int):
+    REGISTRY.cache_access(cache, hits, misses)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorator: run the function as stage `name` (tracers get the function name as `function`)."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return fn(*args, **kwargs)
+            with REGISTRY.stage(name, function=fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add_tracer(tracer: Callable[[Span], None]):
+    """Call `tracer(span)` after every stage while metrics are enabled (exceptions propagate)."""
+    REGISTRY.tracers.append(tracer)
+
+
+def remove_tracer(tracer: Callable[[Span], None]):
+    REGISTRY.tracers.remove(tracer)
+
+
+def snapshot() -> Dict[str, Any]:
+    return REGISTRY.snapshot()
+
+
+def to_prometheus(prefix: str = "pipeline") -> str:
+    return REGISTRY.to_prometheus(prefix)
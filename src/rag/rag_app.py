@@ -2,6 +2,20 @@
 Simple RAG (Retrieval-Augmented Generation) helper.
 - Uses local sentence-transformers for embeddings (all-MiniLM-L6-v2).
 - In-memory vector store (numpy) with cosine similarity retrieval.
+- Pluggable index backend (see src/rag/index.py): exact brute-force by default, IVF for approximate search,
+  ShardedIndex (src/rag/sharded.py) for exact search across worker processes.
+- Optional BM25 inverted index (see src/rag/lexical.py) for lexical, hybrid (RRF) and BM25-shortlisted retrieval.
+- Per-document metadata in columns and named namespaces (see src/rag/metadata.py); filters are
+  applied as boolean masks before scoring.
+- Stable document ids with upsert()/delete(): deleted rows are tombstoned and skipped, and
+  compaction (on demand or past a dead-row threshold) rewrites every per-row structure in the
+  background and swaps it in while readers keep searching.
+- Embeddings live in a growable EmbeddingStore (see src/rag/store.py); appends are amortized O(batch).
+- Optional compact storage (float16 / int8) with re-scoring of a shortlist against a full-precision on-disk copy.
+- Optional EmbeddingCache (see src/rag/cache.py) so unchanged documents and repeated queries are not re-encoded.
+- Streaming chunked ingestion with per-chunk provenance (see src/rag/ingest.py).
+- save()/load() persist the index to a memory-mapped on-disk format (see src/rag/storage.py).
+- Embedding and search are timed as pipeline stages when src/rag/metrics.py is enabled.
 - Pluggable generator function; a Gemini-based generator skeleton is provided.
 
 Notes:
@@ -9,17 +23,42 @@ Notes:
 - This module keeps generation calls isolated so you can replace the generator with any API.
 """
 
+import copy
 import os
-from typing import List, Dict, Any, Tuple
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Tuple, Union
 import numpy as np
 
+from src.rag import metrics
+from src.rag.index import ExactIndex, recall_at_k, top_k_indices, top_k_rows
+from src.rag.ingest import ProvenanceColumns
+from src.rag.lexical import BM25Index
+from src.rag.metadata import DEFAULT_NAMESPACE, NAMESPACE_FIELD, MetadataColumns
+from src.rag.storage import DiskIdList, read_array, read_header, read_index, write_index
+from src.rag.store import EmbeddingStore, grow_array
+
 try:
     from sentence_transformers import SentenceTransformer
 except Exception:
     SentenceTransformer = None
 
 
-def load_embedder(model_name: str = "all-MiniLM-L6-v2") -> Any:
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+RETRIEVE_MODES = ("dense", "lexical", "hybrid", "rerank")
+# reciprocal rank fusion constant: fused score = sum over retrievers of 1 / (RRF_K + rank)
+RRF_K = 60
+# filters matching more than this fraction of rows scan the whole matrix and mask the scores;
+# more selective filters gather and score only the matching rows
+FILTER_SCAN_FRACTION = 0.2
+# unfiltered searches over-fetch top_k + (deleted rows) from the index backend while there are at
+# most this many deleted rows; beyond that they mask the tombstones like a filter
+MAX_OVERFETCH_DEAD = 1024
+
+
+def load_embedder(model_name: str = DEFAULT_MODEL_NAME) -> Any:
     if SentenceTransformer is None:
         raise RuntimeError(
             "sentence-transformers is not installed. Install with: pip install sentence-transformers"
@@ -27,45 +66,741 @@ def load_embedder(model_name: str = "all-MiniLM-L6-v2") -> Any:
     return SentenceTransformer(model_name)
 
 
+class _ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers (no starvation)."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
 class SimpleRAG:
-    def __init__(self, embedder=None):
-        self.embedder = embedder or load_embedder()
+    """In-memory RAG index.
+
+    Parameters:
+        embedder: object with encode()/get_sentence_embedding_dimension() (default: SentenceTransformer)
+        index: search backend from src/rag/index.py (default: ExactIndex)
+        model_name: embedder name, recorded in saved indexes and cache keys
+        cache: optional EmbeddingCache
+        storage: "float32" (default), "float16" or "int8" storage of the embedding matrix
+        rescore_factor: with compact storage, search top_k * rescore_factor candidates and re-rank
+            them with full-precision vectors kept on disk (0 disables re-scoring)
+        full_precision_path: file for the full-precision copy (default: a temporary file)
+        lexical: optional BM25Index kept in sync with the documents; enables the lexical, hybrid
+            and rerank modes of retrieve()
+        compact_threshold: fraction of deleted rows that starts a background compact()
+            (None disables automatic compaction)
+
+    Row indices returned by retrieve() are positions in the current matrix and change when the
+    index is compacted; document ids (retrieve(..., return_ids=True)) are stable.
+    """
+
+    def __init__(self, embedder=None, index=None, model_name: str = DEFAULT_MODEL_NAME, cache=None,
+                 storage: str = "float32", rescore_factor: int = 0, full_precision_path: str = None,
+                 lexical: BM25Index = None, compact_threshold: float = 0.25):
+        self.model_name = model_name
+        self.embedder = embedder or load_embedder(model_name)
+        self.cache = cache
+        self.index = index or ExactIndex()
+        self.lexical = lexical
+        self.storage = storage
+        self.rescore_factor = rescore_factor
+        self.full_precision_path = full_precision_path
+        self._full_precision_tmp = None
         self.docs: List[str] = []
-        self.embeddings: np.ndarray = np.zeros((0, self.embedder.get_sentence_embedding_dimension()))
+        # Chunk(source, start, end) per row, for rows added with provenance (see src/rag/ingest.py)
+        self.provenance = ProvenanceColumns()
+        self.metadata = MetadataColumns()
+        self.ids: List[str] = []
+        self._row_index: Dict[str, int] = {}
+        self._deleted = np.zeros(0, dtype=bool)
+        self._n_dead = 0
+        self.compact_threshold = compact_threshold
+        # readers share _rw; writers are serialized by _write_mutex and take _rw only to swap state
+        self._rw = _ReadWriteLock()
+        self._write_mutex = threading.RLock()
+        self._compactor: threading.Thread = None
+        self.store, self.full_store = self._new_stores()
+
+    @property
+    def _row_of(self) -> Dict[str, int]:
+        """Row of every live document id; after load() it is built on first use, so processes
+        that only retrieve never hash every id."""
+        if self._row_index is None:
+            # concurrent first uses build equal dicts; writers only update it under the write lock
+            self._row_index = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        return self._row_index
+
+    @_row_of.setter
+    def _row_of(self, row_of: Dict[str, int]):
+        self._row_index = row_of
+
+    def _new_stores(self) -> Tuple[EmbeddingStore, EmbeddingStore]:
+        dim = self.embedder.get_sentence_embedding_dimension()
+        store = EmbeddingStore(dim, mode=self.storage)
+        if self.storage == "float32" or self.rescore_factor <= 0:
+            return store, None
+        return store, EmbeddingStore(dim, path=self._full_precision_file())
+
+    def _full_precision_file(self) -> str:
+        """File of the full-precision copy: full_precision_path, or a temporary file."""
+        if self.full_precision_path is not None:
+            return self.full_precision_path
+        if self._full_precision_tmp is None:
+            self._full_precision_tmp = tempfile.NamedTemporaryFile(suffix=".f32")
+        return self._full_precision_tmp.name
 
-    def index_documents(self, documents: List[str]):
-        """Index a list of documents (replace existing index)."""
-        self.docs = documents
-        embeddings = self.embedder.encode(documents, convert_to_numpy=True)
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Normalized embedding matrix in the storage dtype (filled rows of the store only)."""
+        return self.store.matrix
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes held by the search matrix in RAM and by the full-precision copy on disk."""
+        return {
+            "storage": self.storage,
+            "index_bytes": self.store.nbytes,
+            "full_precision_bytes": self.full_store.nbytes if self.full_store is not None else 0,
+            "deleted_rows": self._n_dead,
+        }
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
         # normalize for cosine similarity
         norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
         norms[norms == 0] = 1.0
-        self.embeddings = embeddings / norms
+        return (embeddings / norms).astype(np.float32, copy=False)
 
-    def add_documents(self, documents: List[str]):
-        """Append new documents to the existing index."""
-        new_embeddings = self.embedder.encode(documents, convert_to_numpy=True)
-        norms = np.linalg.norm(new_embeddings, axis=1, keepdims=True)
-        norms[norms == 0] = 1.0
-        new_embeddings = new_embeddings / norms
-        if self.embeddings.size == 0:
-            self.embeddings = new_embeddings
-        else:
-            self.embeddings = np.vstack([self.embeddings, new_embeddings])
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Raw embeddings for texts, served from the cache when one is configured."""
+        with metrics.stage("embed", batch_size=len(texts)):
+            if self.cache is not None:
+                return self.cache.encode(self.embedder, texts, self.model_name)
+            return self.embedder.encode(texts, convert_to_numpy=True)
+
+    def index_documents(self, documents: List[str], metadata: List[Dict[str, Any]] = None,
+                        namespace: str = DEFAULT_NAMESPACE, ids: List[str] = None):
+        """Index a list of documents (replace existing index).
+
+        metadata: optional dict per document, filterable in retrieve(where=...)
+        namespace: namespace of every document in this call
+        ids: optional unique document ids (default: random ids)
+        """
+        documents = list(documents)
+        ids = self._new_ids(ids, len(documents), existing={})
+        # validate the metadata before the current index is thrown away
+        MetadataColumns().append(self._metadata_records(len(documents), metadata, namespace))
+        embeddings = self._normalize(self._embed(documents))
+        with self._write_mutex, self._rw.write():
+            self.docs = []
+            self.provenance = ProvenanceColumns()
+            self.metadata = MetadataColumns()
+            self.ids = []
+            self._row_of = {}
+            self._deleted = np.zeros(0, dtype=bool)
+            self._n_dead = 0
+            self.store, self.full_store = self._new_stores()
+            if self.lexical is not None:
+                self.lexical.reset()
+            self._append_rows(documents, embeddings, ids, None, metadata, namespace)
+            self.index.build(self.store)
+
+    @staticmethod
+    def _new_ids(ids: List[str], n: int, existing: Dict[str, int]) -> List[str]:
+        if ids is None:
+            return [uuid.uuid4().hex for _ in range(n)]
+        ids = [str(i) for i in ids]
+        if len(ids) != n:
+            raise ValueError(f"Got {len(ids)} ids for {n} documents")
+        if len(set(ids)) != n:
+            raise ValueError("Document ids must be unique")
+        taken = [i for i in ids if i in existing]
+        if taken:
+            raise ValueError(f"Document ids already indexed (use upsert): {taken[:5]}")
+        return ids
+
+    def _metadata_records(self, n: int, metadata: List[Dict[str, Any]],
+                          namespace: Union[str, List[str]]) -> List[Dict[str, Any]]:
+        """Metadata rows with their namespace (one for all rows, or a list with one per row)."""
+        if metadata is not None and len(metadata) != n:
+            raise ValueError(f"Got {len(metadata)} metadata entries for {n} documents")
+        records = metadata if metadata is not None else [None] * n
+        namespaces = [namespace] * n if isinstance(namespace, str) else namespace
+        return [dict(record or {}, **{NAMESPACE_FIELD: ns}) for record, ns in zip(records, namespaces)]
+
+    def _append_metadata(self, n: int, metadata: List[Dict[str, Any]], namespace: Union[str, List[str]]):
+        self.metadata.append(self._metadata_records(n, metadata, namespace))
+
+    def _append_rows(self, documents: List[str], embeddings: np.ndarray, ids: List[str],
+                     provenance: List[Any], metadata: List[Dict[str, Any]],
+                     namespace: Union[str, List[str]]) -> int:
+        """Append rows to every per-row structure except the index backend; returns the first new row.
+
+        The caller holds the write lock.
+        """
+        start = len(self.store)
+        # metadata and provenance go first: they validate every value before changing anything
+        refs = self.provenance.encode(provenance, len(documents))
+        self._append_metadata(len(documents), metadata, namespace)
+        self.provenance.extend(refs)
+        self.store.append(embeddings)
+        if self.full_store is not None:
+            self.full_store.append(embeddings)
         self.docs.extend(documents)
+        self.ids.extend(ids)
+        self._row_of.update((doc_id, start + i) for i, doc_id in enumerate(ids))
+        self._deleted = grow_array(self._deleted, start + len(documents), False)
+        if self.lexical is not None:
+            self.lexical.add(documents, start)
+        return start
+
+    def add_documents(self, documents: List[str], provenance: List[Any] = None,
+                      metadata: List[Dict[str, Any]] = None, namespace: str = DEFAULT_NAMESPACE,
+                      ids: List[str] = None):
+        """Append new documents to the existing index.
+
+        provenance: optional Chunk(source, start, end) or None per document, returned by
+            source_of() and saved with the index
+        metadata / namespace / ids: as in index_documents(); ids must not be indexed already
+        """
+        embeddings = self._normalize(self._embed(documents))
+        with self._write_mutex:
+            ids = self._new_ids(ids, len(documents), self._row_of)
+            with self._rw.write():
+                start = self._append_rows(documents, embeddings, ids, provenance, metadata, namespace)
+                self.index.add(embeddings, start)
+
+    def upsert(self, doc_id: str, text: str, metadata: Dict[str, Any] = None,
+               namespace: str = None, provenance: Any = None) -> int:
+        """Insert or replace one document by id; see upsert_many()."""
+        return self.upsert_many([doc_id], [text], None if metadata is None else [metadata], namespace,
+                                None if provenance is None else [provenance])
+
+    def upsert_many(self, ids: List[str], documents: List[str], metadata: List[Dict[str, Any]] = None,
+                    namespace: str = None, provenance: List[Any] = None) -> int:
+        """Insert or replace documents by id. Returns how many texts were (re-)embedded.
+
+        A document with the same text and namespace and no new metadata is left alone. Otherwise
+        the document gets a new row and its old row is tombstoned. Only new or changed texts are
+        embedded; a metadata-only change reuses the stored vector. metadata=None / namespace=None /
+        provenance=None keep what an existing document already has (new ids go to the default
+        namespace).
+        """
+        ids = [str(i) for i in ids]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Document ids must be unique")
+        for name, values in (("documents", documents), ("metadata", metadata), ("provenance", provenance)):
+            if values is not None and len(values) != len(ids):
+                raise ValueError(f"Got {len(values)} {name} for {len(ids)} ids")
+        with self._write_mutex:
+            rows = [self._row_of.get(doc_id) for doc_id in ids]
+            spaces = [namespace if namespace is not None else
+                      self.namespace_of(row) if row is not None else DEFAULT_NAMESPACE for row in rows]
+            write, embed = [], []
+            for j, (row, text) in enumerate(zip(rows, documents)):
+                if row is None or self.docs[row] != text:
+                    write.append(j)
+                    embed.append(j)
+                elif metadata is not None or self.namespace_of(row) != spaces[j]:
+                    write.append(j)
+            if not write:
+                return 0
+            source = self.full_store if self.full_store is not None else self.store
+            embeddings = np.empty((len(write), self.store.dim), dtype=np.float32)
+            new = self._normalize(self._embed([documents[j] for j in embed])) if embed else None
+            fresh = {j: k for k, j in enumerate(embed)}
+            for k, j in enumerate(write):
+                embeddings[k] = new[fresh[j]] if j in fresh else source[rows[j]]
+            records, refs = [], []
+            for j in write:
+                row = rows[j]
+                records.append(metadata[j] if metadata is not None else
+                               self.metadata_of(row) if row is not None else None)
+                refs.append(provenance[j] if provenance is not None else self.provenance.get(row))
+            with self._rw.write():
+                for j in write:
+                    if rows[j] is not None:
+                        self._tombstone(rows[j])
+                start = self._append_rows([documents[j] for j in write], embeddings, [ids[j] for j in write],
+                                          refs, records, [spaces[j] for j in write])
+                self.index.add(embeddings, start)
+        self._maybe_compact()
+        return len(embed)
+
+    def _tombstone(self, row: int):
+        if not self._deleted[row]:
+            self._deleted[row] = True
+            self._n_dead += 1
+            del self._row_of[self.ids[row]]
+
+    def delete(self, doc_id: str) -> bool:
+        """Tombstone a document by id (retrieve skips it from now on). Returns False if unknown."""
+        with self._write_mutex:
+            row = self._row_of.get(str(doc_id))
+            if row is None:
+                return False
+            with self._rw.write():
+                self._tombstone(row)
+        self._maybe_compact()
+        return True
+
+    def __contains__(self, doc_id: str) -> bool:
+        return str(doc_id) in self._row_of
+
+    def get(self, doc_id: str) -> str:
+        """Text of a live document by id (KeyError if unknown or deleted)."""
+        with self._rw.read():
+            return self.docs[self._row_of[str(doc_id)]]
+
+    def id_of(self, index: int) -> str:
+        return self.ids[index]
+
+    def _maybe_compact(self):
+        if self.compact_threshold is None or not len(self.store):
+            return
+        if self._n_dead < self.compact_threshold * len(self.store):
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name="SimpleRAG-compact", daemon=True)
+        self._compactor.start()
+
+    def wait_for_compaction(self, timeout: float = None):
+        """Block until a background compaction started by delete()/upsert() has finished."""
+        if self._compactor is not None:
+            self._compactor.join(timeout)
+
+    def compact(self) -> int:
+        """Drop tombstoned rows. Returns the number of rows removed.
+
+        The compacted matrix, document list, ids, provenance, metadata, lexical postings and
+        index backend are all built next to the live ones (writers wait, readers do not) and
+        swapped in under the write lock in one step. Row indices change; ids do not.
+        """
+        with self._write_mutex:
+            removed = self._n_dead
+            if not removed:
+                return 0
+            keep = np.flatnonzero(~self._deleted[:len(self.store)])
+            store = self.store.take(keep)
+            full_store, tmp_file = None, None
+            if self.full_store is not None:
+                # never rewrite the file readers are mapping: write a new one and rename it later
+                if self.full_precision_path is not None:
+                    full_path = self.full_precision_path + ".compact"
+                else:
+                    tmp_file = tempfile.NamedTemporaryFile(suffix=".f32")
+                    full_path = tmp_file.name
+                full_store = self.full_store.take(keep, path=full_path)
+            docs = [self.docs[int(i)] for i in keep]
+            ids = [self.ids[int(i)] for i in keep]
+            provenance = self.provenance.take(keep)
+            metadata = self.metadata.take(keep)
+            lexical = self.lexical.take(keep) if self.lexical is not None else None
+            # a copy, so readers keep using the old backend until the swap
+            index = copy.copy(self.index)
+            index.build(store)
+
+            with self._rw.write():
+                self.store, self.full_store, self.index = store, full_store, index
+                self.docs, self.ids, self.provenance, self.metadata = docs, ids, provenance, metadata
+                self.lexical = lexical
+                self._row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+                self._deleted = np.zeros(len(keep), dtype=bool)
+                self._n_dead = 0
+                if full_store is not None and tmp_file is None:
+                    # readers that still map the old file keep its inode alive
+                    os.replace(full_store.path, self.full_precision_path)
+                    full_store.path = self.full_precision_path
+                elif tmp_file is not None:
+                    self._full_precision_tmp = tmp_file
+        return removed
 
-    def retrieve(self, query: str, top_k: int = 3) -> List[Tuple[int, float, str]]:
-        """Retrieve top_k documents for the query. Returns list of (index, score, doc_text)."""
-        q_emb = self.embedder.encode([query], convert_to_numpy=True)
-        q_emb = q_emb / (np.linalg.norm(q_emb, axis=1, keepdims=True) + 1e-12)
-        sims = (self.embeddings @ q_emb[0])
-        top_idx = np.argsort(-sims)[:top_k]
-        results = [(int(i), float(sims[i]), self.docs[i]) for i in top_idx]
+    def rebuild_index(self):
+        """Rebuild the index backend over every row (e.g. retrain IVF centroids after add_documents).
+
+        As in compact(), the new backend is built next to the live one (writers wait, readers do
+        not) and swapped in under the write lock.
+        """
+        with self._write_mutex:
+            index = copy.copy(self.index)
+            index.build(self.store)
+            with self._rw.write():
+                self.index = index
+
+    def source_of(self, index: int) -> Any:
+        """Provenance recorded for a row (None for documents added without it)."""
+        return self.provenance.get(index)
+
+    def metadata_of(self, index: int) -> Dict[str, Any]:
+        """Metadata recorded for a row (numeric values, including dates, come back as floats)."""
+        record = self.metadata.record(index)
+        record.pop(NAMESPACE_FIELD, None)
+        return record
+
+    def namespace_of(self, index: int) -> str:
+        return self.metadata.columns[NAMESPACE_FIELD].value(index)
+
+    def namespaces(self) -> List[str]:
+        return self.metadata.values(NAMESPACE_FIELD)
+
+    def save(self, path: str):
+        """Persist embeddings, documents and a header describing the embedder to the directory `path`.
+
+        Deleted rows are compacted away first.
+        """
+        with self._write_mutex:
+            self.compact()
+            self._save(path)
+
+    def _save(self, path: str):
+        header = {
+            "model_name": self.model_name,
+            "dim": self.embedder.get_sentence_embedding_dimension(),
+            "normalized": True,
+            "storage": self.storage,
+        }
+        arrays = {
+            "scale": self.store.scale,
+            "full": self.full_store.matrix if self.full_store is not None else None,
+        }
+        header["metadata"], metadata_arrays = self.metadata.to_arrays()
+        arrays.update(metadata_arrays)
+        arrays.update(self.provenance.to_arrays())
+        if hasattr(self.index, "to_arrays"):
+            # a trained backend (IVFIndex) is saved too, so load() does not retrain it
+            arrays.update(self.index.to_arrays())
+        arrays["ids"] = np.array(self.ids, dtype=str)
+        write_index(path, header, self.embeddings, self.docs, arrays=arrays)
+
+    @classmethod
+    def load(cls, path: str, embedder=None, index=None, model_name: str = DEFAULT_MODEL_NAME,
+             mmap: bool = True, cache=None, rescore_factor: int = 0, full_precision_path: str = None,
+             lexical: BM25Index = None) -> "SimpleRAG":
+        """Open an index written by save().
+
+        With mmap=True the embedding matrix, document blob, ids, metadata and provenance columns
+        are memory-mapped read-only, so several worker processes loading the same path share one
+        copy through the page cache. An IVFIndex reuses the centroids and lists saved with the
+        index (unless its n_lists differs) instead of retraining them.
+        Re-scoring (rescore_factor > 0) needs an index saved with its full-precision copy; it is
+        read from the index directory until the first append moves it to full_precision_path
+        (default: a temporary file), so appends never load it into memory.
+        A `lexical` index is rebuilt from the stored documents (postings are not persisted).
+        Raises ValueError if the index was built with a different embedder.
+        """
+        header = read_header(path)
+        if header["model_name"] != model_name:
+            raise ValueError(
+                f"Index at {path} was built with {header['model_name']!r}, not {model_name!r}"
+            )
+        storage = header.get("storage", "float32")
+        rag = cls(embedder=embedder, index=index, model_name=model_name, cache=cache, storage=storage,
+                  lexical=lexical)
+        dim = rag.embedder.get_sentence_embedding_dimension()
+        if header["dim"] != dim or not header.get("normalized", False):
+            raise ValueError(
+                f"Index at {path} has dim={header['dim']} normalized={header.get('normalized')}, "
+                f"embedder produces dim={dim} normalized vectors"
+            )
+        _, embeddings, rag.docs = read_index(path, mmap=mmap)
+        if "metadata" in header:
+            spec = header["metadata"]
+            arrays = {entry["array"]: read_array(path, entry["array"], mmap=mmap) for entry in spec}
+            rag.metadata = MetadataColumns.from_arrays(spec, arrays, len(rag.docs))
+        else:
+            # indexes saved before metadata support: every row is in the default namespace
+            rag._append_metadata(len(rag.docs), None, DEFAULT_NAMESPACE)
+        ids = read_array(path, "ids", mmap=mmap)
+        # indexes saved before stable ids: the row number is the id
+        rag.ids = DiskIdList(ids) if ids is not None else [str(i) for i in range(len(rag.docs))]
+        rag._row_of = None
+        rag._deleted = np.zeros(len(rag.docs), dtype=bool)
+        prov = {name: read_array(path, name, mmap=mmap) for name in ("prov_source", "prov_start", "prov_end")}
+        prov["prov_sources"] = read_array(path, "prov_sources", mmap=False)
+        rag.provenance = ProvenanceColumns.from_arrays(prov, len(rag.docs))
+        rag.store = EmbeddingStore.from_array(embeddings, mode=storage, scale=read_array(path, "scale", mmap=False))
+        full = read_array(path, "full", mmap=mmap)
+        if rescore_factor > 0 and full is None and storage != "float32":
+            raise ValueError(f"Index at {path} has no full-precision copy to re-score against")
+        if rescore_factor > 0 and full is not None:
+            rag.rescore_factor = rescore_factor
+            rag.full_precision_path = full_precision_path
+            rag.full_store = EmbeddingStore.from_array(full, path=rag._full_precision_file())
+        ivf = {name: read_array(path, name, mmap=mmap) for name in ("ivf_centroids", "ivf_rows", "ivf_indptr")}
+        if not (hasattr(rag.index, "restore") and rag.index.restore(ivf, len(rag.docs))):
+            rag.index.build(rag.store)
+        if lexical is not None:
+            lexical.reset()
+            lexical.add(rag.docs, 0)
+        return rag
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        q_emb = self._embed(queries)
+        return q_emb / (np.linalg.norm(q_emb, axis=1, keepdims=True) + 1e-12)
+
+    def _encode_query(self, query: str) -> np.ndarray:
+        return self._encode_queries([query])[0]
+
+    def _rescore(self, query: np.ndarray, candidates: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-rank a shortlist with full-precision vectors (only the shortlisted rows are read from disk)."""
+        candidates = candidates[candidates >= 0]
+        sims = self.full_store[candidates] @ query
+        best = top_k_indices(sims, top_k)
+        return candidates[best], sims[best]
+
+    def _search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.full_store is None:
+            return self.index.search(self.store, query, top_k)
+        candidates, _ = self.index.search(self.store, query, top_k * self.rescore_factor)
+        return self._rescore(query, candidates, top_k)
+
+    def _score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Dense scores of selected rows only (full precision when a full copy is kept)."""
+        store = self.full_store if self.full_store is not None else self.store
+        return store[rows] @ query
+
+    def _live_mask(self) -> np.ndarray:
+        """Mask of the rows that are not deleted (None when nothing is deleted)."""
+        if not self._n_dead:
+            return None
+        return ~self._deleted[:len(self.store)]
+
+    def _filter_mask(self, where: Dict[str, Any], namespace: str) -> np.ndarray:
+        """Boolean mask of the live rows passing the filter and namespace.
+
+        None when there is no filter and at most MAX_OVERFETCH_DEAD deleted rows (_dense then
+        over-fetches from the index backend instead).
+        """
+        if namespace is not None:
+            where = {"$and": [where, {NAMESPACE_FIELD: namespace}]} if where else {NAMESPACE_FIELD: namespace}
+        if not where:
+            return self._live_mask() if self._n_dead > MAX_OVERFETCH_DEAD else None
+        mask = self.metadata.mask(where)
+        if self._n_dead:
+            mask &= ~self._deleted[:len(mask)]
+        return mask
+
+    def _dense(self, query: np.ndarray, top_k: int, mask: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Dense search, restricted to the rows in `mask` before any scoring happens.
+
+        Filtered searches are exact: selective filters score only the matching rows; broad ones
+        scan the whole in-memory matrix and drop non-matching scores before the top-k selection
+        (with compact storage and re-scoring, the top_k * rescore_factor shortlist is re-scored
+        at full precision, as in unfiltered search).
+        """
+        if mask is None:
+            if not self._n_dead:
+                return self._search(query, top_k)
+            idx, sims = self._search(query, top_k + self._n_dead)
+            live = ~self._deleted[idx]
+            return idx[live][:top_k], sims[live][:top_k]
+        rows = np.flatnonzero(mask)
+        if len(rows) > FILTER_SCAN_FRACTION * len(mask):
+            sims = self.store.dot(query)
+            sims[~mask] = -np.inf
+            if self.full_store is None:
+                best = top_k_indices(sims, min(top_k, len(rows)))
+                return best, sims[best]
+            return self._rescore(query, top_k_indices(sims, min(top_k * self.rescore_factor, len(rows))), top_k)
+        sims = self._score_rows(query, rows)
+        best = top_k_indices(sims, top_k)
+        return rows[best], sims[best]
+
+    def _hybrid(self, query: str, q: np.ndarray, top_k: int, candidates: int,
+                mask: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Reciprocal rank fusion of the dense and BM25 top `candidates` lists."""
+        dense_idx, _ = self._dense(q, candidates, mask)
+        lexical_idx, _ = self.lexical.search(query, candidates, mask if mask is not None else self._live_mask())
+        fused: Dict[int, float] = {}
+        for ranked in (dense_idx, lexical_idx):
+            for rank, row in enumerate(ranked):
+                fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (RRF_K + rank + 1)
+        rows = np.fromiter(fused, dtype=np.int64, count=len(fused))
+        scores = np.fromiter(fused.values(), dtype=np.float32, count=len(fused))
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+    def _rerank(self, query: str, q: np.ndarray, top_k: int, candidates: int,
+                mask: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Dense scores on the BM25 shortlist only; full dense search if BM25 finds too few rows."""
+        shortlist, _ = self.lexical.search(query, candidates, mask if mask is not None else self._live_mask())
+        if len(shortlist) < top_k:
+            return self._dense(q, top_k, mask)
+        sims = self._score_rows(q, shortlist)
+        best = top_k_indices(sims, top_k)
+        return shortlist[best], sims[best]
+
+    def retrieve(self, query: str, top_k: int = 3, mode: str = "dense", candidates: int = None,
+                 where: Dict[str, Any] = None, namespace: str = None,
+                 return_ids: bool = False) -> List[Tuple[Any, float, str]]:
+        """Retrieve top_k documents for the query. Returns list of (index, score, doc_text).
+
+        mode (the last three need a `lexical` index):
+            "dense": embedding similarity (default)
+            "lexical": BM25 only; rows sharing no term with the query are never returned
+            "hybrid": reciprocal rank fusion of the dense and BM25 top `candidates`; scores are RRF scores
+            "rerank": BM25 picks `candidates` rows and only those are scored densely
+        candidates: shortlist depth for hybrid/rerank (default max(50, 4 * top_k))
+        where: metadata filter (see src/rag/metadata.py), e.g. {"client": "acme", "year": {"$gte": 2023}}
+        namespace: search only this namespace
+
+        return_ids: return stable document ids instead of row indices
+
+        Filters are applied before scoring, so a filtered search returns the best matching rows
+        (fewer than top_k only if fewer rows match). Filtered dense search bypasses the index
+        backend and only ever returns matching rows. Deleted documents are never
+        returned.
+        """
+        if mode not in RETRIEVE_MODES:
+            raise ValueError(f"Unknown retrieve mode {mode!r}; expected one of {RETRIEVE_MODES}")
+        if mode != "dense" and self.lexical is None:
+            raise ValueError(f"retrieve mode {mode!r} needs SimpleRAG(lexical=BM25Index())")
+        candidates = candidates or max(50, 4 * top_k)
+        # encode before taking the read lock, so a slow encoder call never delays writers
+        q = self._encode_query(query) if mode != "lexical" else None
+        with self._rw.read(), metrics.stage("search", mode=mode):
+            mask = self._filter_mask(where, namespace)
+            if mode == "dense":
+                top_idx, sims = self._dense(q, top_k, mask)
+            elif mode == "lexical":
+                top_idx, sims = self.lexical.search(query, top_k, mask if mask is not None else self._live_mask())
+            elif mode == "hybrid":
+                top_idx, sims = self._hybrid(query, q, top_k, candidates, mask)
+            else:
+                top_idx, sims = self._rerank(query, q, top_k, candidates, mask)
+            results = [(self._key(i, return_ids), float(s), self.docs[i]) for i, s in zip(top_idx, sims)]
         return results
 
+    def _key(self, row: int, return_ids: bool) -> Any:
+        return self.ids[row] if return_ids else int(row)
+
+    def _dense_batch(self, queries: np.ndarray, top_k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Filtered dense search for a chunk of queries (like _dense)."""
+        rows = np.flatnonzero(mask)
+        if len(rows) > FILTER_SCAN_FRACTION * len(mask):
+            sims = self.store.dot(queries.T).T
+            sims[:, ~mask] = -np.inf
+            if self.full_store is None:
+                best = top_k_rows(sims, min(top_k, len(rows)))
+                return best, np.take_along_axis(sims, best, axis=1)
+            shortlists = top_k_rows(sims, min(top_k * self.rescore_factor, len(rows)))
+            rescored = [self._rescore(q, shortlist, top_k) for q, shortlist in zip(queries, shortlists)]
+            return [r[0] for r in rescored], [r[1] for r in rescored]
+        store = self.full_store if self.full_store is not None else self.store
+        sims = queries @ store[rows].T
+        best = top_k_rows(sims, top_k)
+        return rows[best], np.take_along_axis(sims, best, axis=1)
+
+    def retrieve_batch(self, queries: List[str], top_k: int = 3, batch_size: int = 1024,
+                       where: Dict[str, Any] = None, namespace: str = None,
+                       return_ids: bool = False) -> List[List[Tuple[Any, float, str]]]:
+        """Retrieve top_k documents for many queries at once.
+
+        All queries are encoded in one encoder call; scoring runs as one matrix multiply per
+        chunk of `batch_size` queries so the (batch_size x n_docs) score matrix stays bounded.
+        where / namespace / return_ids as in retrieve().
+        Returns one list of (index, score, doc_text) per query, in input order.
+        """
+        if not queries:
+            return []
+        return self.retrieve_vectors(self._encode_queries(list(queries)), top_k, batch_size, where, namespace,
+                                     return_ids)
+
+    def retrieve_vectors(self, q_embs: np.ndarray, top_k: int = 3, batch_size: int = 1024,
+                         where: Dict[str, Any] = None, namespace: str = None,
+                         return_ids: bool = False) -> List[List[Tuple[Any, float, str]]]:
+        """retrieve_batch() for queries that are already encoded (L2-normalized rows of q_embs).
+
+        For callers that embed and cache query phrasings themselves (e.g. src/rag/gaps.py).
+        """
+        if not len(q_embs):
+            return []
+        with self._rw.read(), metrics.stage("search", batch_size=len(q_embs), mode="dense"):
+            return self._retrieve_batch(np.asarray(q_embs, dtype=np.float32), top_k, batch_size, where,
+                                        namespace, return_ids)
+
+    def _retrieve_batch(self, q_embs: np.ndarray, top_k: int, batch_size: int, where: Dict[str, Any],
+                        namespace: str, return_ids: bool) -> List[List[Tuple[Any, float, str]]]:
+        mask = self._filter_mask(where, namespace)
+        if mask is not None:
+            results = []
+            for start in range(0, len(q_embs), batch_size):
+                top_idx, sims = self._dense_batch(q_embs[start:start + batch_size], top_k, mask)
+                for row_idx, row_sims in zip(top_idx, sims):
+                    results.append([(self._key(i, return_ids), float(s), self.docs[i])
+                                    for i, s in zip(row_idx, row_sims)])
+            return results
+        results = []
+        # over-fetch past deleted rows, as _dense does
+        k = top_k + self._n_dead
+        shortlist = k * self.rescore_factor if self.full_store is not None else k
+        for start in range(0, len(q_embs), batch_size):
+            chunk = q_embs[start:start + batch_size]
+            top_idx, sims = self.index.search_batch(self.store, chunk, shortlist)
+            if self.full_store is not None:
+                rescored = [self._rescore(q, row_idx, k) for q, row_idx in zip(chunk, top_idx)]
+                top_idx, sims = [r[0] for r in rescored], [r[1] for r in rescored]
+            for row_idx, row_sims in zip(top_idx, sims):
+                hits = [(i, s) for i, s in zip(row_idx, row_sims) if i >= 0 and not self._deleted[i]]
+                results.append([(self._key(i, return_ids), float(s), self.docs[i]) for i, s in hits[:top_k]])
+        return results
+
+    def evaluate_recall(self, queries: List[str], top_k: int = 10) -> float:
+        """Mean recall@k of the configured index (and storage mode) against the exact brute-force path.
+
+        The reference is an exact search over float32 vectors: the matrix itself with float32
+        storage, otherwise the full-precision copy. Raises ValueError for compact storage without
+        one (rescore_factor=0), where the only reference would be the compact matrix itself.
+        """
+        if self.storage != "float32" and self.full_store is None:
+            raise ValueError(f"evaluate_recall needs a full-precision reference; {self.storage} storage "
+                             f"keeps one only with rescore_factor > 0")
+        exact = ExactIndex()
+        recalls = []
+        for query in queries:
+            q = self._encode_query(query)
+            with self._rw.read():
+                reference = self.full_store if self.full_store is not None else self.store
+                approx_idx, _ = self._search(q, top_k)
+                exact_idx, _ = exact.search(reference, q, top_k)
+            recalls.append(recall_at_k(approx_idx, exact_idx))
+        return float(np.mean(recalls)) if recalls else 1.0
+
 
 # ---- Gemini generator skeleton ----
-import requests
+from src.rag.generation import get_client
 
 
 def gemini_generate(prompt: str, api_key: str = None, model: str = "text-bison-001") -> str:
@@ -75,6 +810,10 @@ def gemini_generate(prompt: str, api_key: str = None, model: str = "text-bison-0
     This function is a best-effort skeleton. Set your key in GEMINI_API_KEY and verify the
     endpoint/model name against the current Google Generative AI docs.
 
+    Thin wrapper over a shared GeminiClient (src/rag/generation.py), which keeps a pooled
+    session and retries 429/5xx responses. Use GeminiClient.generate_many for batches, and
+    set `get_client().cache = ResponseCache(...)` to reuse responses for repeated prompts.
+
     Parameters:
         prompt: the full prompt text to send to the generative model
         api_key: optional, if None will read from environment variable GEMINI_API_KEY
@@ -83,44 +822,13 @@ def gemini_generate(prompt: str, api_key: str = None, model: str = "text-bison-0
     Returns:
         generated text (string)
     """
-    api_key = api_key or os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY not set in environment. Set it and retry.")
-
-    # Example endpoint - CHECK your cloud provider docs and update accordingly.
-    # Two common variants: (A) Google Cloud REST endpoint using API key, (B) HTTP with OAuth Bearer token.
-    # Below is a generic REST example that may require adjustments for your account.
-    endpoint = f"https://generativelanguage.googleapis.com/v1beta2/models/{model}:generate"
-
-    headers = {
-        "Content-Type": "application/json",
-        # If using API key in header (Bearer) — adjust if your setup requires different auth.
-        "Authorization": f"Bearer {api_key}",
-    }
-
-    body = {
-        "prompt": {"text": prompt},
-        # other parameters (temperature, maxOutputTokens) can be added here
-        "temperature": 0.2,
-        "maxOutputTokens": 512,
-    }
-
-    try:
-        resp = requests.post(endpoint, headers=headers, json=body, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        # parsing will depend on the exact API response shape
-        # Commonly generated text is under data['candidates'][0]['content'] or data['output'][0]['content']
-        # We'll try a couple of common paths:
-        if "candidates" in data and isinstance(data["candidates"], list) and data["candidates"]:
-            return data["candidates"][0].get("content", "")
-        if "output" in data and isinstance(data["output"], list) and data["output"]:
-            # sometimes content is nested differently
-            first = data["output"][0]
-            if isinstance(first, dict) and "content" in first:
-                return first["content"]
-        # fallback: return full json string
-        return json.dumps(data)
-    except Exception as e:
-        # surface the error so the caller can see what went wrong
-        return f"[GENERATION ERROR] {str(e)}"
+    return get_client(api_key, model).generate(prompt)
+
+
+def gemini_generate_stream(prompt: str, api_key: str = None, model: str = "text-bison-001") -> Iterator[str]:
+    """Streaming gemini_generate(): yields text pieces as they arrive (see GeminiClient.generate_stream).
+
+    Feed the pieces to src.rag.streaming.stream_findings() to get each missing_fields entry as soon
+    as it is complete.
+    """
+    return get_client(api_key, model).generate_stream(prompt)
@@ -0,0 +1,244 @@
+"""
+Sharded exact search across worker processes.
+
+ShardedIndex is an index backend (see src/rag/index.py) that returns the same rows and scores as
+ExactIndex, but splits every scan over `n_shards` worker processes:
+- The embedding matrix is copied, in its storage dtype, into one multiprocessing
+  shared_memory block. Workers map that block by name, so no process holds a pickled copy;
+  only the queries and the per-shard top-k lists cross process boundaries.
+- Each query (or batch of queries) is sent to all shards at once; every shard returns its own
+  top-k and the parent merges them into the global top-k.
+- Rows appended to the store since the last search are copied into the block before the next
+  query (capacity doubles, as in EmbeddingStore), so add_documents()/upsert() work unchanged.
+- Ties are broken by the lower row index, in every shard and in the merge, so results do not
+  depend on the number of shards.
+
+Corpora smaller than `min_rows` are searched in-process with the same selection rule; process
+start-up and IPC would cost more than the scan. Filtered searches bypass the index backend (see
+SimpleRAG._dense) and are not sharded.
+
+Usage:
+    rag = SimpleRAG(index=ShardedIndex(n_shards=8))
+"""
+
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.rag.store import STORAGE_MODES, EmbeddingStore
+
+# environment variables that cap the BLAS thread pool of each worker
+_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+# worker side: shared blocks mapped by this process, most recent last
+_attached: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+
+
+def top_k_stable(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, by descending score and then ascending index.
+
+    Unlike top_k_indices, which of several equal scores makes the cut is well defined, so
+    the result does not depend on how the rows were split up.
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))[:k]
+    return candidates[order]
+
+
+def _merge(idx: np.ndarray, sims: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Global top-k of concatenated per-shard lists (row-wise for 2-D input)."""
+    order = np.lexsort((idx, -sims), axis=-1)[..., :k]
+    return np.take_along_axis(idx, order, axis=-1), np.take_along_axis(sims, order, axis=-1)
+
+
+def _scores(matrix: np.ndarray, mode: str, scale: Optional[np.ndarray], x: np.ndarray) -> np.ndarray:
+    return EmbeddingStore.from_array(matrix, mode=mode, scale=scale).dot(x)
+
+
+def _search_rows(matrix: np.ndarray, mode: str, scale: Optional[np.ndarray], lo: int, hi: int,
+                 queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k of rows lo..hi-1 for each query in a (m, dim) matrix; returns global row ids, (m, k')."""
+    if len(queries) == 1:
+        # a matrix-vector product, as in ExactIndex.search (its rounding can differ from a 1-column GEMM)
+        sims = _scores(matrix[lo:hi], mode, scale, queries[0])[None, :]
+    else:
+        sims = _scores(matrix[lo:hi], mode, scale, queries.T).T
+    k = min(k, hi - lo)
+    idx = np.empty((len(queries), k), dtype=np.int64)
+    out = np.empty((len(queries), k), dtype=np.float32)
+    for row, row_sims in enumerate(sims):
+        best = top_k_stable(row_sims, k)
+        idx[row] = best + lo
+        out[row] = row_sims[best]
+    return idx, out
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = _attached.get(name)
+    if shm is None:
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+        # only the two newest blocks can still be searched (the parent swaps, never edits in place)
+        while len(_attached) > 2:
+            _attached.popitem(last=False)[1].close()
+    return shm
+
+
+def _search_shard(name: str, capacity: int, dim: int, mode: str, scale: Optional[np.ndarray], lo: int,
+                  hi: int, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Worker task: search one shard of the shared block `name`."""
+    shm = _attach(name)
+    matrix = np.ndarray((capacity, dim), dtype=STORAGE_MODES[mode], buffer=shm.buf)
+    return _search_rows(matrix, mode, scale, lo, hi, queries, k)
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+class _SharedMatrix:
+    """Growable (capacity, dim) matrix in a shared memory block, unlinked when garbage collected."""
+
+    def __init__(self, capacity: int, dim: int, dtype: np.dtype):
+        capacity = max(capacity, 1)
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity * dim * dtype.itemsize)
+        self.array = np.ndarray((capacity, dim), dtype=dtype, buffer=self.shm.buf)
+        self.count = 0
+        self._finalizer = weakref.finalize(self, _release, self.shm)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def capacity(self) -> int:
+        return self.array.shape[0]
+
+
+def _release(shm: shared_memory.SharedMemory):
+    # the mapping itself goes away with the last array viewing it; processes that still map the
+    # block keep it alive after unlink()
+    shm.unlink()
+
+
+class ShardedIndex:
+    """Exact search split over worker processes that share one copy of the matrix.
+
+    Parameters:
+        n_shards: number of row shards and worker processes (default: os.cpu_count())
+        min_rows: below this many rows, search in-process instead
+        threads_per_worker: BLAS threads per worker (n_shards * threads_per_worker should not
+            exceed the number of cores)
+        start_method: multiprocessing start method of the workers ("spawn" is safe with the
+            threads SimpleRAG runs, e.g. background compaction)
+    """
+
+    def __init__(self, n_shards: int = None, min_rows: int = 50_000, threads_per_worker: int = 1,
+                 start_method: str = "spawn"):
+        self.n_shards = n_shards or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self.threads_per_worker = threads_per_worker
+        self.start_method = start_method
+        self._shared: _SharedMatrix = None
+        self._source = None
+        self._pool: ProcessPoolExecutor = None
+        self._lock = threading.Lock()
+
+    def build(self, embeddings):
+        """Start over from `embeddings` (an EmbeddingStore or float32 matrix); rows are copied on the next search."""
+        # drop the block rather than reuse it: an index copied before build() may still be searching it
+        with self._lock:
+            self._shared, self._source = None, embeddings
+
+    def add(self, embeddings: np.ndarray, start: int):
+        # the new rows are copied from the store itself (already encoded) on the next search
+        pass
+
+    def _sync(self, embeddings) -> _SharedMatrix:
+        """Shared block holding every row of `embeddings`; call with self._lock held."""
+        matrix = getattr(embeddings, "matrix", embeddings)
+        if embeddings is not self._source:
+            self._shared, self._source = None, embeddings
+        shared = self._shared
+        n = matrix.shape[0]
+        if shared is None or n > shared.capacity:
+            capacity = shared.capacity if shared is not None else 1
+            while capacity < n:
+                capacity *= 2
+            grown = _SharedMatrix(capacity, matrix.shape[1], matrix.dtype)
+            if shared is not None:
+                grown.array[:shared.count] = shared.array[:shared.count]
+                grown.count = shared.count
+            shared = self._shared = grown
+        if n > shared.count:
+            shared.array[shared.count:n] = matrix[shared.count:n]
+            shared.count = n
+        return shared
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        """Worker pool, started with capped BLAS threads (call with self._lock held)."""
+        if self._pool is None:
+            saved = {name: os.environ.get(name) for name in _THREAD_ENV}
+            os.environ.update({name: str(self.threads_per_worker) for name in _THREAD_ENV})
+            try:
+                pool = ProcessPoolExecutor(self.n_shards, mp_context=get_context(self.start_method))
+                # workers are spawned inside submit(), while the capped environment is in place
+                pending = [pool.submit(_worker_pid) for _ in range(self.n_shards)]
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+            for future in pending:
+                future.result()
+            self._pool = pool
+        return self._pool
+
+    def close(self):
+        """Stop the worker processes (they are restarted by the next sharded search)."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _search(self, embeddings, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        mode = getattr(embeddings, "mode", "float32")
+        scale = getattr(embeddings, "scale", None)
+        n = embeddings.shape[0]
+        if n < self.min_rows or self.n_shards == 1:
+            return _search_rows(getattr(embeddings, "matrix", embeddings), mode, scale, 0, n, queries, top_k)
+        with self._lock:
+            # this reference keeps the block alive until every shard has answered
+            shared = self._sync(embeddings)
+            pool = self._start_pool()
+        bounds = np.linspace(0, n, self.n_shards + 1).astype(np.int64)
+        futures = [pool.submit(_search_shard, shared.name, shared.capacity, embeddings.shape[1], mode, scale,
+                               int(lo), int(hi), queries, top_k)
+                   for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        parts = [future.result() for future in futures]
+        idx = np.concatenate([p[0] for p in parts], axis=1)
+        sims = np.concatenate([p[1] for p in parts], axis=1)
+        return _merge(idx, sims, top_k)
+
+    def search(self, embeddings, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (indices, scores) of the top_k rows for a single normalized query vector."""
+        idx, sims = self._search(embeddings, np.asarray(query, dtype=np.float32)[None, :], top_k)
+        return idx[0], sims[0]
+
+    def search_batch(self, embeddings, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """All queries are sent to every shard in one message. Returns (indices, scores), each (n_queries, k)."""
+        return self._search(embeddings, np.asarray(queries, dtype=np.float32), top_k)
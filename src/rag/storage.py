@@ -0,0 +1,163 @@
+"""
+On-disk index format for SimpleRAG.
+
+Layout of an index directory:
+- header.json: format version, embedder model name, embedding dimension, normalization flag, row count
+- embeddings.npy: (count, dim) matrix, opened with np.load(mmap_mode="r") so the OS page cache
+  is shared by every process that loads the same index
+- docs.offsets.npy: int64 byte offsets (count + 1 entries) into docs.blob
+- docs.blob: UTF-8 document texts, concatenated; texts are decoded lazily on access
+- <name>.npy: optional extra arrays listed under "arrays" in the header (e.g. the int8 scale
+  vector, the full-precision copy of a quantized index, document ids and a trained IVF index)
+
+Files are written to a temporary name and renamed into place, so a process that still has
+the previous version mapped keeps reading a consistent copy.
+"""
+
+import json
+import mmap as _mmap
+import os
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+
+FORMAT_VERSION = 1
+
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+OFFSETS_FILE = "docs.offsets.npy"
+BLOB_FILE = "docs.blob"
+
+
+class DiskDocStore:
+    """Read-only, lazily decoded document list backed by an offsets array and a text blob.
+
+    Documents appended after loading are kept in memory (`extend`), so SimpleRAG.add_documents
+    keeps working on a loaded index.
+    """
+
+    def __init__(self, blob_path: str, offsets: np.ndarray):
+        self.offsets = offsets
+        self._file = open(blob_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._blob = _mmap.mmap(self._file.fileno(), 0, access=_mmap.ACCESS_READ) if size else b""
+        self._tail: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1 + len(self._tail)
+
+    def __getitem__(self, i: int) -> str:
+        n_disk = len(self.offsets) - 1
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+        if i >= n_disk:
+            return self._tail[i - n_disk]
+        return self._blob[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def extend(self, documents: Iterable[str]):
+        self._tail.extend(documents)
+
+
+class DiskIdList:
+    """Read-only document id list backed by a (memory-mapped) numpy string array.
+
+    Ids appended after loading are kept in memory (`extend`), as in DiskDocStore.
+    """
+
+    def __init__(self, ids: np.ndarray):
+        self._ids = ids
+        self._tail: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._tail)
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+        if i >= len(self._ids):
+            return self._tail[i - len(self._ids)]
+        return str(self._ids[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def extend(self, ids: Iterable[str]):
+        self._tail.extend(ids)
+
+
+def write_index(path: str, header: Dict[str, Any], embeddings: np.ndarray, docs: Iterable[str],
+                arrays: Dict[str, np.ndarray] = None):
+    """Write embeddings, documents, optional extra arrays and the header into the directory `path`."""
+    os.makedirs(path, exist_ok=True)
+    count = embeddings.shape[0]
+    arrays = {name: arr for name, arr in (arrays or {}).items() if arr is not None}
+    for name, arr in arrays.items():
+        with open(os.path.join(path, name + ".npy.tmp"), "wb") as f:
+            np.save(f, np.ascontiguousarray(arr))
+
+    emb_tmp = os.path.join(path, EMBEDDINGS_FILE + ".tmp")
+    with open(emb_tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(embeddings))
+
+    blob_tmp = os.path.join(path, BLOB_FILE + ".tmp")
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    written = 0
+    with open(blob_tmp, "wb") as f:
+        for i, doc in enumerate(docs):
+            data = doc.encode("utf-8")
+            f.write(data)
+            written += len(data)
+            offsets[i + 1] = written
+    offsets_tmp = os.path.join(path, OFFSETS_FILE + ".tmp")
+    with open(offsets_tmp, "wb") as f:
+        np.save(f, offsets)
+
+    header = dict(header, format_version=FORMAT_VERSION, count=count, dtype=str(embeddings.dtype),
+                  arrays=sorted(arrays))
+    header_tmp = os.path.join(path, HEADER_FILE + ".tmp")
+    with open(header_tmp, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+
+    os.replace(emb_tmp, os.path.join(path, EMBEDDINGS_FILE))
+    os.replace(blob_tmp, os.path.join(path, BLOB_FILE))
+    os.replace(offsets_tmp, os.path.join(path, OFFSETS_FILE))
+    for name in arrays:
+        os.replace(os.path.join(path, name + ".npy.tmp"), os.path.join(path, name + ".npy"))
+    # header last: a reader never sees a header that describes files not yet in place
+    os.replace(header_tmp, os.path.join(path, HEADER_FILE))
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, HEADER_FILE), encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported index format version {header.get('format_version')!r} (expected {FORMAT_VERSION})"
+        )
+    return header
+
+
+def read_index(path: str, mmap: bool = True) -> Tuple[Dict[str, Any], np.ndarray, DiskDocStore]:
+    """Open an index directory. Returns (header, embeddings, docs)."""
+    header = read_header(path)
+    embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r" if mmap else None)
+    offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r" if mmap else None)
+    if embeddings.shape[0] != header["count"] or len(offsets) != header["count"] + 1:
+        raise ValueError(f"Index at {path} is inconsistent with its header (count={header['count']})")
+    docs = DiskDocStore(os.path.join(path, BLOB_FILE), offsets)
+    return header, embeddings, docs
+
+
+def read_array(path: str, name: str, mmap: bool = True) -> np.ndarray:
+    """Open an extra array written by write_index(arrays=...); None if the index has no such array."""
+    if name not in read_header(path).get("arrays", []):
+        return None
+    return np.load(os.path.join(path, name + ".npy"), mmap_mode="r" if mmap else None)
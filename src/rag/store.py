@@ -0,0 +1,182 @@
+"""
+Growable embedding storage for SimpleRAG.
+
+EmbeddingStore keeps the (n_docs, dim) matrix in a preallocated buffer whose capacity doubles
+when full, so appending a batch costs amortized O(batch) instead of copying the whole matrix
+(np.vstack) on every add_documents call. Readers only ever see the filled region (`matrix`).
+
+Storage modes:
+- float32: rows stored as-is (default).
+- float16: half the memory; rows are upcast block by block while scoring.
+- int8: scalar quantization with a per-dimension scale (a quarter of the memory). The scale is
+  fitted on the first appended batch; later values outside that range are clipped, so index the
+  full corpus with index_documents() when possible.
+
+The store can also live in a file (`path`), which is how SimpleRAG keeps the full-precision
+on-disk copy used to re-score shortlists found on a compact store.
+"""
+
+from typing import Tuple
+import numpy as np
+
+STORAGE_MODES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def grow_array(buf: np.ndarray, needed: int, fill) -> np.ndarray:
+    """1-D buffer with room for `needed` items: `buf` itself, or a doubled copy padded with `fill`."""
+    if needed <= len(buf):
+        return buf
+    capacity = max(len(buf), 16)
+    while capacity < needed:
+        capacity *= 2
+    out = np.full(capacity, fill, dtype=buf.dtype)
+    out[:len(buf)] = buf
+    return out
+
+
+class EmbeddingStore:
+    """Append-only row buffer with capacity doubling and optional compact storage.
+
+    Besides `matrix`, a store behaves like a read-only float32 matrix for the index backends:
+    `shape`, `dot(x)` (scores computed on the compact rows) and `store[rows]` (decoded rows).
+    """
+
+    def __init__(self, dim: int, mode: str = "float32", initial_capacity: int = 1024,
+                 path: str = None, block_rows: int = 65536):
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode {mode!r}; expected one of {sorted(STORAGE_MODES)}")
+        self.dim = dim
+        self.mode = mode
+        self.dtype = np.dtype(STORAGE_MODES[mode])
+        self.path = path
+        self.block_rows = block_rows
+        self.scale: np.ndarray = None
+        self.count = 0
+        if path is not None:
+            # start from an empty file; _allocate() extends it as the store grows
+            open(path, "wb").close()
+        self._owns_file = path is not None
+        self._buf = self._allocate(initial_capacity)
+
+    @classmethod
+    def from_array(cls, embeddings: np.ndarray, mode: str = "float32", scale: np.ndarray = None,
+                   path: str = None) -> "EmbeddingStore":
+        """Wrap an existing matrix (e.g. a read-only memmap) without copying it.
+
+        `embeddings` must already be in the storage dtype of `mode` (int8 codes need their `scale`).
+        The first append after wrapping moves the rows into a private, growable buffer: the file
+        `path` when one is given (the store owns it from then on), otherwise memory.
+        """
+        store = cls(embeddings.shape[1], mode=mode, initial_capacity=0)
+        store.path = path
+        store._buf = embeddings
+        store.count = embeddings.shape[0]
+        store.scale = scale
+        return store
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        if not self._owns_file or capacity == 0:
+            return np.empty((capacity, self.dim), dtype=self.dtype)
+        with open(self.path, "r+b") as f:
+            f.truncate(capacity * self.dim * self.dtype.itemsize)
+        return np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.count, self.dim)
+
+    @property
+    def capacity(self) -> int:
+        return self._buf.shape[0]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """View of the filled rows in the storage dtype (no copy)."""
+        return self._buf[:self.count]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the filled rows (plus the int8 scale vector)."""
+        scale_bytes = self.scale.nbytes if self.scale is not None else 0
+        return self.count * self.dim * self.dtype.itemsize + scale_bytes
+
+    def _grow(self, needed: int):
+        capacity = max(self.capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        if self._owns_file and isinstance(self._buf, np.memmap):
+            # the file is extended in place, so the rows already written are kept
+            self._buf.flush()
+            self._buf = self._allocate(capacity)
+            return
+        if self.path is not None and not self._owns_file:
+            # first append to a wrapped matrix (from_array): move it into the file at `path`
+            open(self.path, "wb").close()
+            self._owns_file = True
+        buf = self._allocate(capacity)
+        for start in range(0, self.count, self.block_rows):
+            stop = min(start + self.block_rows, self.count)
+            buf[start:stop] = self._buf[start:stop]
+        self._buf = buf
+
+    def _encode(self, rows: np.ndarray) -> np.ndarray:
+        if self.mode != "int8":
+            return rows.astype(self.dtype, copy=False)
+        if self.scale is None:
+            scale = np.abs(rows).max(axis=0).astype(np.float32) / 127.0
+            scale[scale == 0] = 1.0 / 127.0
+            self.scale = scale
+        return np.clip(np.rint(rows / self.scale), -127, 127).astype(np.int8)
+
+    def _decode(self, codes: np.ndarray) -> np.ndarray:
+        if self.mode == "int8":
+            return codes.astype(np.float32) * self.scale
+        return codes.astype(np.float32, copy=False)
+
+    def append(self, rows: np.ndarray):
+        n = rows.shape[0]
+        if n == 0:
+            return
+        if self.count + n > self.capacity or not self._buf.flags.writeable:
+            self._grow(self.count + n)
+        self._buf[self.count:self.count + n] = self._encode(rows)
+        self.count += n
+
+    def take(self, rows: np.ndarray, path: str = None) -> "EmbeddingStore":
+        """New store holding only `rows`, in order (used by compaction).
+
+        Stored values are copied as they are (int8 codes keep their scale, nothing is re-quantized),
+        `block_rows` at a time so a file-backed store is never loaded into memory at once.
+        """
+        store = EmbeddingStore(self.dim, mode=self.mode, initial_capacity=max(len(rows), 1), path=path,
+                               block_rows=self.block_rows)
+        store.scale = self.scale
+        for start in range(0, len(rows), self.block_rows):
+            block = rows[start:start + self.block_rows]
+            store._buf[start:start + len(block)] = self.matrix[block]
+        store.count = len(rows)
+        return store
+
+    def __getitem__(self, rows) -> np.ndarray:
+        """Decoded float32 rows."""
+        return self._decode(self.matrix[rows])
+
+    def dot(self, x: np.ndarray) -> np.ndarray:
+        """Scores of every stored row against x ((dim,) or (dim, m)), as float32.
+
+        Compact rows are upcast `block_rows` at a time, so scoring never materializes a
+        full-precision copy of the matrix. For int8 the scale is folded into x instead.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        if self.mode == "float32":
+            return self.matrix.dot(x)
+        if self.mode == "int8":
+            x = x * (self.scale if x.ndim == 1 else self.scale[:, None])
+        out = np.empty((self.count,) + x.shape[1:], dtype=np.float32)
+        for start in range(0, self.count, self.block_rows):
+            block = self.matrix[start:start + self.block_rows].astype(np.float32)
+            out[start:start + len(block)] = block.dot(x)
+        return out
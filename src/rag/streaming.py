@@ -0,0 +1,141 @@
+"""
+Incremental parsing of a streamed investigation report.
+
+The model returns one JSON object ({missing_fields: [...], summary, remediation_steps}, see
+SYSTEM_PROMPT), which is only parseable once the whole response has arrived. MissingFieldsParser
+scans the text as it streams in and emits every missing_fields entry the moment its closing brace
+arrives, so the first finding can be shown after the first entry instead of the whole report.
+
+- The scanner tracks strings (with escapes) and nesting only; text around the JSON (e.g. a
+  ```json fence) is ignored, and a "missing_fields" array nested in another object (the CoT
+  variant's final_json) is found too.
+- Each entry is checked against the schema (MISSING_FIELD_KEYS / PRIORITIES in
+  src/prompting/prompts.py); problems are reported with the entry rather than dropping it.
+- report() parses the complete text like the evaluation runner does (parse_prediction).
+
+Usage:
+    client = get_client()
+    for finding in stream_findings(client.generate_stream(prompt)):
+        show(finding.entry, finding.problems)
+"""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple
+
+from src.prompting.prompts import MISSING_FIELD_KEYS, PRIORITIES
+from src.rag.evaluate import parse_prediction
+
+_STRING_KEYS = ("name", "why_missing", "required_information")
+
+
+class Finding(NamedTuple):
+    """One missing_fields entry, in stream order; entry is None if its text was not valid JSON."""
+    index: int
+    entry: Any
+    problems: List[str]
+
+
+def check_missing_field(entry: Any) -> List[str]:
+    """Schema problems of one missing_fields entry (an empty list means it is valid)."""
+    if not isinstance(entry, dict):
+        return ["entry is not a JSON object"]
+    problems = [f"missing key {key!r}" for key in MISSING_FIELD_KEYS if key not in entry]
+    problems += [f"unexpected key {key!r}" for key in entry if key not in MISSING_FIELD_KEYS]
+    for key in _STRING_KEYS:
+        if key in entry and not isinstance(entry[key], str):
+            problems.append(f"{key} must be a string")
+    if isinstance(entry.get("name"), str) and not entry["name"].strip():
+        problems.append("name is empty")
+    if "evidence_span" in entry and not isinstance(entry["evidence_span"], (str, type(None))):
+        problems.append("evidence_span must be a string or null")
+    if "priority" in entry and entry["priority"] not in PRIORITIES:
+        problems.append(f"priority must be one of {list(PRIORITIES)}")
+    if "confidence" in entry:
+        confidence = entry["confidence"]
+        if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+            problems.append("confidence must be a number")
+        elif not 0.0 <= confidence <= 1.0:
+            problems.append("confidence must be between 0.0 and 1.0")
+    return problems
+
+
+class MissingFieldsParser:
+    """Feed streamed text in; get back the missing_fields entries completed by each piece."""
+
+    def __init__(self):
+        self.text = ""
+        self.findings: List[Finding] = []
+        self._pos = 0
+        # open containers: "{", "[", or "F" for a missing_fields array
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._key = None
+        self._entry_start = None
+
+    def feed(self, chunk: str) -> List[Finding]:
+        """Append a piece of the response; returns the entries it completed."""
+        self.text += chunk
+        text, stack = self.text, self._stack
+        found = []
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i]
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif c == ":":
+                self._key = self._last_string
+            elif c == "[" or c == "{":
+                if c == "[" and self._key == "missing_fields" and stack and stack[-1] == "{":
+                    stack.append("F")
+                else:
+                    if c == "{" and stack and stack[-1] == "F":
+                        self._entry_start = i
+                    stack.append(c)
+                self._key = None
+            elif c == "]" or c == "}":
+                if stack:
+                    stack.pop()
+                if c == "}" and stack and stack[-1] == "F" and self._entry_start is not None:
+                    finding = self._finding(text[self._entry_start:i + 1])
+                    self.findings.append(finding)
+                    found.append(finding)
+                    self._entry_start = None
+                self._key = None
+            elif c == ",":
+                self._key = None
+        self._pos = len(text)
+        return found
+
+    def _finding(self, raw: str) -> Finding:
+        index = len(self.findings)
+        try:
+            entry = json.loads(raw)
+        except ValueError as e:
+            return Finding(index, None, [f"invalid JSON: {e}"])
+        return Finding(index, entry, check_missing_field(entry))
+
+    def report(self) -> Dict[str, Any]:
+        """The complete report (raises ValueError if the text received so far does not parse)."""
+        return parse_prediction(self.text)
+
+
+def stream_findings(chunks: Iterable[str], parser: MissingFieldsParser = None) -> Iterator[Finding]:
+    """Yield missing_fields entries as soon as they are complete in a stream of text pieces.
+
+    Pass a parser to keep the full text (parser.text / parser.report()) after the stream ends.
+    """
+    parser = parser if parser is not None else MissingFieldsParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
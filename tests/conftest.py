@@ -0,0 +1,18 @@
+import pytest
+
+from benchmarks.fakes import HashingEmbedder, synthetic_corpus, synthetic_queries
+
+
+@pytest.fixture(scope="session")
+def embedder():
+    return HashingEmbedder(dim=32, buckets=4096)
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    return [doc for batch in synthetic_corpus(600, batch_size=600) for doc in batch]
+
+
+@pytest.fixture(scope="session")
+def queries(corpus):
+    return synthetic_queries(corpus, 25)
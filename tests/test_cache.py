@@ -0,0 +1,59 @@
+"""EmbeddingCache counters and encoding."""
+
+import threading
+
+import numpy as np
+
+from src.rag.cache import EmbeddingCache
+
+
+class CountingEmbedder:
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.encoded = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.encoded.extend(texts)
+        return self.embedder.encode(texts, convert_to_numpy=convert_to_numpy)
+
+    def get_sentence_embedding_dimension(self):
+        return self.embedder.get_sentence_embedding_dimension()
+
+
+def test_repeats_within_a_call_are_not_hits(embedder):
+    counting = CountingEmbedder(embedder)
+    cache = EmbeddingCache()
+    out = cache.encode(counting, ["a b", "c d", "a b", " a  b"], "hashing")
+    assert counting.encoded == ["a b", "c d"]
+    assert (cache.hits, cache.misses) == (0, 2)
+    np.testing.assert_array_equal(out[0], out[2])
+
+    cache.encode(counting, ["c d", "c d", "e f"], "hashing")
+    assert counting.encoded == ["a b", "c d", "e f"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_disk_hits(tmp_path, embedder):
+    path = str(tmp_path / "embeddings.sqlite")
+    EmbeddingCache(path=path).encode(embedder, ["a b", "c d"], "hashing")
+    cache = EmbeddingCache(path=path)
+    counting = CountingEmbedder(embedder)
+    cache.encode(counting, ["a b", "a b", "x y"], "hashing")
+    assert counting.encoded == ["x y"]
+    assert (cache.hits, cache.disk_hits, cache.misses) == (1, 1, 1)
+
+
+def test_counters_are_consistent_across_threads(embedder):
+    cache = EmbeddingCache()
+    texts = [f"text {i}" for i in range(50)]
+
+    def work():
+        for _ in range(20):
+            cache.encode(embedder, texts, "hashing")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.hits + cache.misses == 8 * 20 * len(texts)
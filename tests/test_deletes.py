@@ -0,0 +1,66 @@
+"""Deleted documents are never returned, before and after compaction."""
+
+import pytest
+
+from src.rag import rag_app
+from src.rag.index import IVFIndex
+from src.rag.lexical import BM25Index
+from src.rag.rag_app import SimpleRAG
+
+
+def _returned_ids(rag, queries):
+    ids = set()
+    for query in queries:
+        for mode in ("dense", "lexical", "hybrid"):
+            ids.update(doc_id for doc_id, _, _ in rag.retrieve(query, top_k=20, mode=mode, return_ids=True))
+        ids.update(doc_id for doc_id, _, _ in rag.retrieve(query, top_k=20, where={"part": 1}, return_ids=True))
+    for hits in rag.retrieve_batch(queries, top_k=20, return_ids=True):
+        ids.update(doc_id for doc_id, _, _ in hits)
+    return ids
+
+
+def _build(embedder, corpus, **kwargs):
+    rag = SimpleRAG(embedder=embedder, model_name="hashing", lexical=BM25Index(), **kwargs)
+    rag.index_documents(corpus, ids=[f"id-{i}" for i in range(len(corpus))],
+                        metadata=[{"part": i % 2} for i in range(len(corpus))])
+    return rag
+
+
+@pytest.mark.parametrize("overfetch_limit", [1024, 10])  # over-fetch from the index / live mask
+def test_deleted_ids_are_never_returned(embedder, corpus, queries, monkeypatch, overfetch_limit):
+    monkeypatch.setattr(rag_app, "MAX_OVERFETCH_DEAD", overfetch_limit)
+    rag = _build(embedder, corpus, compact_threshold=None)
+    # delete the documents the queries find first, so the deletions matter
+    deleted = {doc_id for query in queries for doc_id, _, _ in rag.retrieve(query, top_k=3, return_ids=True)}
+    for doc_id in deleted:
+        assert rag.delete(doc_id)
+    assert not rag.delete(next(iter(deleted)))
+    assert not _returned_ids(rag, queries) & deleted
+    assert all(doc_id not in rag for doc_id in deleted)
+
+
+def test_results_are_unchanged_by_background_compaction(embedder, corpus, queries):
+    rag = _build(embedder, corpus, compact_threshold=0.25, index=IVFIndex(n_lists=8, nprobe=8))
+    deleted = {f"id-{i}" for i in range(0, len(corpus), 3)}
+    survivors = [i for i in range(len(corpus)) if f"id-{i}" not in deleted]
+    # reference: a fresh index over the surviving documents only
+    fresh = SimpleRAG(embedder=embedder, model_name="hashing", lexical=BM25Index())
+    fresh.index_documents([corpus[i] for i in survivors], ids=[f"id-{i}" for i in survivors],
+                          metadata=[{"part": i % 2} for i in survivors])
+
+    for doc_id in sorted(deleted):
+        rag.delete(doc_id)
+    rag.wait_for_compaction()
+    # compaction ran once 25% of the rows were dead; the later deletes are still tombstones
+    assert len(survivors) < len(rag.docs) < len(corpus)
+    for _ in range(2):
+        assert not _returned_ids(rag, queries) & deleted
+        for query in queries:
+            assert rag.retrieve(query, top_k=5, where={"part": 0}, return_ids=True) == \
+                fresh.retrieve(query, top_k=5, where={"part": 0}, return_ids=True)
+        rag.compact()
+    assert len(rag.docs) == len(survivors)
+    for doc_id in ("id-1", "id-599"):
+        assert rag.get(doc_id) == corpus[int(doc_id[3:])]
+    rag.upsert("id-1", "replaced text")
+    assert rag.get("id-1") == "replaced text" and "id-0" not in rag
@@ -0,0 +1,144 @@
+"""Equivalence of judge_compare / judge_batch with the original linear-scan judge."""
+
+import copy
+import random
+from typing import Any, Dict, List
+
+import pytest
+
+from src.rag.judge import judge_batch, judge_compare
+
+NAMES = ["Date", "date", "DATE", "Signature", "Total amount", "Approver", "Budget", "", "Deadline"]
+SPANS = [None, "", "signed on", "Signed on 3 March", "the total", "THE TOTAL AMOUNT IS", "budget"]
+WORDS = ["the", "document", "is", "missing", "a", "date", "signature", "and", "total", "budget"]
+
+
+def _get_names(j: Dict[str, Any]) -> List[str]:
+    return [f.get("name", "").lower() for f in j.get("missing_fields", [])]
+
+
+def reference_judge_compare(predicted: Dict[str, Any], expected: Dict[str, Any]) -> Dict[str, Any]:
+    """judge_compare as it was before names were indexed (kept verbatim)."""
+    exp_names = _get_names(expected)
+    pred_names = _get_names(predicted)
+
+    max_points = len(exp_names) * 1.0 + 0.2  # 1.0 per expected item (0.6+0.2) + 0.2 for summary/remediation.
+    points = 0.0
+    details = []
+
+    for name in exp_names:
+        item_detail = {"name": name, "matched_name": False, "evidence_partial": False, "points": 0.0}
+        if name in pred_names:
+            item_detail["matched_name"] = True
+            item_detail["points"] += 0.6
+            # check evidence substring overlap as simple heuristic
+            # find expected evidence
+            exp_item = next((it for it in expected["missing_fields"] if it["name"].lower() == name), None)
+            pred_item = next((it for it in predicted.get("missing_fields", []) if it["name"].lower() == name), None)
+            if exp_item and pred_item:
+                exp_e = (exp_item.get("evidence_span") or "").lower()
+                pred_e = (pred_item.get("evidence_span") or "").lower()
+                if exp_e and pred_e and (exp_e in pred_e or pred_e in exp_e):
+                    item_detail["evidence_partial"] = True
+                    item_detail["points"] += 0.2
+        details.append(item_detail)
+        points += item_detail["points"]
+
+    # summary/remediation simple check
+    summary_bonus = 0.0
+    if expected.get("summary") and predicted.get("summary"):
+        if expected["summary"].split()[0:3] == predicted["summary"].split()[0:3]:
+            summary_bonus = 0.2
+        else:
+            # small credit if they share any word
+            if set(expected["summary"].split()) & set(predicted["summary"].split()):
+                summary_bonus = 0.1
+    points += summary_bonus
+
+    score = min(1.0, points / max_points) if max_points > 0 else 1.0
+    passed = score >= 0.8
+
+    return {"score": score, "pass": passed, "points": points, "max_points": max_points, "details": details}
+
+
+def random_report(rng: random.Random, allow_nameless: bool = False) -> Dict[str, Any]:
+    fields = []
+    for _ in range(rng.randint(0, 8)):
+        item = {"name": rng.choice(NAMES), "evidence_span": rng.choice(SPANS)}
+        if allow_nameless and rng.random() < 0.2:
+            del item["name"]
+        fields.append(item)
+    report: Dict[str, Any] = {"missing_fields": fields}
+    if rng.random() < 0.8:
+        report["summary"] = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 6)))
+    if rng.random() < 0.1:
+        del report["missing_fields"]
+    return report
+
+
+def with_names(report: Dict[str, Any]) -> Dict[str, Any]:
+    """The report with every nameless item given name "" (how the indexed judge treats it)."""
+    report = copy.deepcopy(report)
+    for item in report.get("missing_fields", []):
+        item.setdefault("name", "")
+    return report
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_judge_compare_matches_reference_on_random_reports(seed):
+    rng = random.Random(seed)
+    for _ in range(400):
+        predicted, expected = random_report(rng), random_report(rng)
+        assert judge_compare(predicted, expected) == reference_judge_compare(predicted, expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_judge_batch_matches_reference_with_shared_expected(seed):
+    rng = random.Random(seed)
+    expected = [random_report(rng) for _ in range(20)]
+    # every expected object is reused across several pairs
+    pairs = [(random_report(rng), rng.choice(expected)) for _ in range(300)]
+    assert judge_batch(pairs) == [reference_judge_compare(p, e) for p, e in pairs]
+    assert judge_batch(pairs) == [judge_compare(p, e) for p, e in pairs]
+
+
+def test_nameless_items_score_like_empty_names():
+    # the reference raises KeyError once it looks up an item without "name"; where it does not,
+    # results are identical, and nameless items always score like items named ""
+    rng = random.Random(42)
+    compared = 0
+    for _ in range(400):
+        predicted, expected = random_report(rng, allow_nameless=True), random_report(rng, allow_nameless=True)
+        verdict = judge_compare(predicted, expected)
+        assert verdict == reference_judge_compare(with_names(predicted), with_names(expected))
+        assert judge_batch([(predicted, expected)]) == [verdict]
+        try:
+            reference = reference_judge_compare(predicted, expected)
+        except KeyError:
+            continue
+        assert verdict == reference
+        compared += 1
+    assert compared > 0
+
+
+def test_duplicate_names_use_the_first_item():
+    expected = {"missing_fields": [{"name": "Date", "evidence_span": "signed on"},
+                                   {"name": "date", "evidence_span": "unrelated"}]}
+    predicted = {"missing_fields": [{"name": "DATE", "evidence_span": "nothing"},
+                                    {"name": "Date", "evidence_span": "Signed on 3 March"}]}
+    verdict = judge_compare(predicted, expected)
+    assert verdict == reference_judge_compare(predicted, expected)
+    assert [d["evidence_partial"] for d in verdict["details"]] == [False, False]
+
+
+@pytest.mark.parametrize("predicted, expected", [
+    ({}, {}),
+    ({"missing_fields": []}, {"missing_fields": [], "summary": ""}),
+    ({"summary": ""}, {"summary": "Date is missing"}),
+    ({"summary": "   "}, {"summary": " "}),
+    ({"summary": "Date is missing here"}, {"summary": "Date is missing"}),
+    ({"missing_fields": [{"name": "Date"}]}, {"missing_fields": [{"name": "date", "evidence_span": None}]}),
+])
+def test_edge_cases_match_reference(predicted, expected):
+    assert judge_compare(predicted, expected) == reference_judge_compare(predicted, expected)
+    assert judge_batch([(predicted, expected), (predicted, expected)]) == [reference_judge_compare(predicted, expected)] * 2
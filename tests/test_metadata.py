@@ -0,0 +1,62 @@
+"""Metadata columns and filtered retrieval."""
+
+import numpy as np
+import pytest
+
+from src.rag import rag_app
+from src.rag.index import IVFIndex
+from src.rag.metadata import MetadataColumns
+from src.rag.rag_app import SimpleRAG
+
+SELECTIVE = {"bucket": 3}                                      # 10% of the rows: gather them
+BROAD = {"$or": [{"bucket": {"$lt": 6}}, {"client": "acme"}]}  # ~80%: scan and mask
+
+
+@pytest.mark.parametrize("value", [("acme", 1), ["acme"], {"name": "acme"}, object()])
+def test_category_values_must_be_json_scalars(value):
+    columns = MetadataColumns()
+    columns.append([{"client": "acme"}])
+    with pytest.raises(ValueError, match="'client'.*str, int, float or bool"):
+        columns.append([{"client": "beta"}, {"client": value}])
+    # nothing was appended, not even the valid value before the bad one
+    assert len(columns) == 1 and columns.values("client") == ["acme"]
+
+
+def test_category_values_survive_save_and_load(tmp_path, embedder, corpus):
+    metadata = [{"client": ["acme", "beta"][i % 2], "flag": i % 3 == 0, "tier": 1 if i % 5 == 4 else "gold"}
+                for i in range(30)]
+    rag = SimpleRAG(embedder=embedder, model_name="hashing")
+    rag.index_documents(corpus[:30], metadata=metadata)
+    rag.save(str(tmp_path / "index"))
+    loaded = SimpleRAG.load(str(tmp_path / "index"), embedder=embedder, model_name="hashing")
+    assert [loaded.metadata_of(row) for row in range(30)] == [rag.metadata_of(row) for row in range(30)]
+    flagged = {"flag": True}
+    assert loaded.retrieve(corpus[3], top_k=30, where=flagged) == rag.retrieve(corpus[3], top_k=30, where=flagged)
+
+
+def _brute_force(rag, query, mask, top_k):
+    """Rows of the exact top_k among the rows in `mask`, found by scoring every row."""
+    sims = rag.store.matrix @ rag._encode_query(query)
+    rows = np.flatnonzero(mask)
+    return rows[np.argsort(-sims[rows], kind="stable")[:top_k]]
+
+
+@pytest.mark.parametrize("where", [SELECTIVE, BROAD], ids=["gather", "scan"])
+@pytest.mark.parametrize("index", [None, IVFIndex(n_lists=24, nprobe=1)], ids=["exact", "ivf"])
+def test_filtered_retrieval_is_exact(embedder, corpus, queries, where, index):
+    metadata = [{"bucket": i % 10, "client": "acme" if i % 7 == 0 else "beta"} for i in range(len(corpus))]
+    rag = SimpleRAG(embedder=embedder, model_name="hashing", index=index)
+    rag.index_documents(corpus, metadata=metadata)
+    for row in range(0, len(corpus), 11):
+        rag.delete(rag.id_of(row))
+    mask = rag.metadata.mask(where) & ~rag._deleted[:len(corpus)]
+    # each filter exercises the strategy it is named after
+    assert (mask.mean() > rag_app.FILTER_SCAN_FRACTION) == (where is BROAD)
+
+    batch = rag.retrieve_batch(queries, top_k=10, where=where)
+    for query, batch_hits in zip(queries, batch):
+        hits = rag.retrieve(query, top_k=10, where=where)
+        expected = _brute_force(rag, query, mask, 10)
+        assert [row for row, _, _ in hits] == list(expected)
+        assert [row for row, _, _ in batch_hits] == list(expected)
+        np.testing.assert_allclose([score for _, score, _ in batch_hits], [score for _, score, _ in hits], rtol=1e-5)
@@ -0,0 +1,111 @@
+"""save()/load() round trips of SimpleRAG."""
+
+import os
+
+import numpy as np
+import pytest
+
+from src.rag.index import IVFIndex
+from src.rag.ingest import Chunk, ingest
+from src.rag.lexical import BM25Index
+from src.rag.rag_app import SimpleRAG
+from src.rag.storage import DiskIdList
+
+
+def test_provenance_survives_save_and_load(tmp_path, embedder, corpus):
+    rag = SimpleRAG(embedder=embedder, model_name="hashing")
+    ingest(rag, [(f"doc-{i}.txt", text) for i, text in enumerate(corpus[:40])], window=200, overlap=50)
+    rag.add_documents(["no provenance here"])
+    before = [rag.source_of(row) for row in range(len(rag.docs))]
+    assert before[0] == Chunk("doc-0.txt", 0, before[0].end)
+    assert before[-1] is None
+
+    rag.save(str(tmp_path / "index"))
+    loaded = SimpleRAG.load(str(tmp_path / "index"), embedder=embedder, model_name="hashing")
+    assert [loaded.source_of(row) for row in range(len(loaded.docs))] == before
+
+    # appending after load copies the memory-mapped columns
+    loaded.add_documents(["more"], provenance=[Chunk("new.txt", 3, 7)])
+    assert loaded.source_of(len(before)) == Chunk("new.txt", 3, 7)
+    assert loaded.source_of(0) == before[0]
+
+
+def test_ivf_index_is_restored_not_retrained(tmp_path, embedder, corpus, queries, monkeypatch):
+    rag = SimpleRAG(embedder=embedder, model_name="hashing", index=IVFIndex(n_lists=16, nprobe=4))
+    rag.index_documents(corpus, ids=[f"id-{i}" for i in range(len(corpus))])
+    expected = rag.retrieve_batch(queries, top_k=5, return_ids=True)
+    rag.save(str(tmp_path / "index"))
+
+    def no_training(self, embeddings):
+        raise AssertionError("load() retrained the IVF index")
+
+    monkeypatch.setattr(IVFIndex, "build", no_training)
+    loaded = SimpleRAG.load(str(tmp_path / "index"), embedder=embedder, model_name="hashing",
+                            index=IVFIndex(n_lists=16, nprobe=4))
+    assert loaded.retrieve_batch(queries, top_k=5, return_ids=True) == expected
+    monkeypatch.undo()
+
+    # ids stay memory-mapped; lookups, deletes and appends still work on them
+    assert isinstance(loaded.ids, DiskIdList)
+    assert "id-7" in loaded and loaded.get("id-7") == corpus[7]
+    assert loaded.delete("id-7")
+    loaded.add_documents(["fresh text"], ids=["id-new"])
+    assert loaded.get("id-new") == "fresh text"
+    assert loaded.id_of(len(corpus)) == "id-new"
+
+    # a different list count retrains instead of reusing the saved lists
+    other = SimpleRAG.load(str(tmp_path / "index"), embedder=embedder, model_name="hashing",
+                           index=IVFIndex(n_lists=8, nprobe=4))
+    assert len(other.index.centroids) == 8
+
+
+def test_loaded_full_precision_copy_moves_to_its_own_file_on_append(tmp_path, embedder, corpus):
+    rag = SimpleRAG(embedder=embedder, model_name="hashing", storage="int8", rescore_factor=4)
+    rag.index_documents(corpus[:200])
+    rag.save(str(tmp_path / "index"))
+
+    full_path = str(tmp_path / "full.f32")
+    loaded = SimpleRAG.load(str(tmp_path / "index"), embedder=embedder, model_name="hashing",
+                            rescore_factor=4, full_precision_path=full_path)
+    before = loaded.full_store[np.arange(200)]
+    loaded.add_documents(corpus[200:210])
+    assert isinstance(loaded.full_store._buf, np.memmap) and loaded.full_store.path == full_path
+    assert os.path.getsize(full_path) >= 210 * embedder.get_sentence_embedding_dimension() * 4
+    np.testing.assert_array_equal(loaded.full_store[np.arange(200)], before)
+    assert loaded.evaluate_recall(corpus[:5], top_k=5) > 0
+
+
+def test_evaluate_recall_refuses_a_compact_reference(embedder, corpus):
+    rag = SimpleRAG(embedder=embedder, model_name="hashing", storage="int8")
+    rag.index_documents(corpus[:50])
+    with pytest.raises(ValueError, match="full-precision"):
+        rag.evaluate_recall(corpus[:2])
+
+
+@pytest.mark.parametrize("storage, rescore_factor", [("float32", 0), ("int8", 4)])
+def test_loaded_index_returns_the_same_results(tmp_path, embedder, corpus, queries, storage, rescore_factor):
+    rag = SimpleRAG(embedder=embedder, model_name="hashing", storage=storage, rescore_factor=rescore_factor,
+                    lexical=BM25Index(), compact_threshold=None)
+    rag.index_documents(corpus[:300], metadata=[{"bucket": i % 4} for i in range(300)])
+    rag.add_documents(corpus[300:], namespace="other", ids=[f"other-{i}" for i in range(300, len(corpus))])
+    for i in range(300, len(corpus), 5):
+        rag.delete(f"other-{i}")
+
+    def results(index):
+        out = [index.retrieve_batch(queries, top_k=8, return_ids=True),
+               index.retrieve_batch(queries, top_k=8, where={"bucket": {"$gte": 1}}, return_ids=True),
+               index.retrieve_batch(queries, top_k=8, namespace="other", return_ids=True)]
+        for mode in ("dense", "lexical", "hybrid"):
+            out.append([index.retrieve(query, top_k=8, mode=mode, return_ids=True) for query in queries])
+        return out
+
+    # save() compacts the deleted rows away; dense ids, texts and scores must not change (BM25
+    # statistics still count tombstoned rows until then, so lexical scores are compared after it)
+    before = results(rag)
+    rag.save(str(tmp_path / "index"))
+    expected = results(rag)
+    assert expected[:4] == before[:4]
+    loaded = SimpleRAG.load(str(tmp_path / "index"), embedder=embedder, model_name="hashing",
+                            rescore_factor=rescore_factor, lexical=BM25Index())
+    assert results(loaded) == expected
+    assert loaded.namespaces() == rag.namespaces()
@@ -0,0 +1,45 @@
+"""ShardedIndex returns what ExactIndex returns."""
+
+import numpy as np
+import pytest
+
+from src.rag.index import ExactIndex
+from src.rag.rag_app import SimpleRAG
+from src.rag.sharded import ShardedIndex
+
+
+@pytest.fixture(scope="module")
+def rag(embedder, corpus):
+    # min_rows=0: search in worker processes even for this small corpus
+    rag = SimpleRAG(embedder=embedder, model_name="hashing", index=ShardedIndex(n_shards=3, min_rows=0))
+    rag.index_documents(corpus)
+    yield rag
+    rag.index.close()
+
+
+def test_single_queries_match_exact_index(rag, queries):
+    exact = ExactIndex()
+    exact.build(rag.store)
+    for query in queries:
+        q = rag._encode_query(query)
+        idx, sims = rag.index.search(rag.store, q, 10)
+        exact_idx, exact_sims = exact.search(rag.store, q, 10)
+        np.testing.assert_array_equal(idx, exact_idx)
+        np.testing.assert_allclose(sims, exact_sims, rtol=1e-6)
+    assert rag.index._pool is not None  # the shards were searched by the workers
+
+
+def test_batches_match_exact_index(rag, queries):
+    exact = ExactIndex()
+    exact.build(rag.store)
+    q = rag._encode_queries(queries)
+    idx, sims = rag.index.search_batch(rag.store, q, 10)
+    exact_idx, exact_sims = exact.search_batch(rag.store, q, 10)
+    np.testing.assert_array_equal(idx, exact_idx)
+    np.testing.assert_allclose(sims, exact_sims, rtol=1e-6)
+
+
+def test_appended_rows_are_searched(rag, embedder, queries):
+    rag.add_documents([queries[0]], ids=["appended"])
+    assert rag.retrieve(queries[0], top_k=1, return_ids=True)[0][0] == "appended"
+    assert rag.retrieve_batch(queries[:1], top_k=1, return_ids=True)[0][0][0] == "appended"